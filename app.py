@@ -34,12 +34,18 @@ st.markdown("""
 # ========== IMPORTAR BANCO DE DADOS ==========
 try:
     from src.database_postgres import get_database
+    from src.utils import expandir_intervalos
     
+    # Singleton do processo: os reruns do Streamlit reaproveitam o mesmo pool
     db = get_database()
 except Exception as e:
     st.error(f"❌ Erro ao conectar ao banco: {e}")
     st.stop()
 
+if not db.verificar_saude():
+    st.error("❌ Erro ao conectar ao banco: veja logs/database.log")
+    st.stop()
+
 # ========== HEADER ==========
 st.title("📊 ML Crawler - Monitorador de Preços")
 st.markdown("Dashboard para acompanhar variações de preço no Mercado Livre")
@@ -261,6 +267,10 @@ if produtos_filtrados:
                     # Preço atual
                     st.markdown(f"<div style='font-size: 24px; font-weight: 700; color: #00a650; margin: 8px 0;'>R$ {produto['preco_atual']:.2f}</div>", unsafe_allow_html=True)
                     
+                    # Visto por último (produtos_vistos) e última mudança de preço/dados (ultima_atualizacao)
+                    st.caption(f"👀 Visto em {produto['visto_em']:%d/%m %H:%M} · "
+                               f"✏️ Alterado em {produto['ultima_atualizacao']:%d/%m %H:%M}")
+                    
                     # Preço original e economia
                     if produto.get('preco_original') and produto['preco_original'] > produto['preco_atual']:
                         economia = produto['preco_original'] - produto['preco_atual']
@@ -282,15 +292,35 @@ if produtos_filtrados:
                             
                             historico = db.obter_historico_preco(produto["id"], 30)
                             if historico:
+                                # Faixa mínima-máxima de cada dia (resumo diário) e o fechamento do dia
                                 df = pd.DataFrame(historico)
-                                fig = px.line(
-                                    df,
-                                    x="data",
-                                    y="preco",
-                                    labels={"preco": "Preço (R$)", "data": "Data"},
-                                    markers=True
-                                )
-                                fig.update_layout(height=250, showlegend=False)
+                                df["data"] = pd.to_datetime(df["data"])
+                                tracos = [
+                                    go.Scatter(x=df["data"], y=df["maxima"], mode="lines",
+                                               line=dict(width=0), hoverinfo="skip"),
+                                    go.Scatter(x=df["data"], y=df["minima"], mode="lines",
+                                               line=dict(width=0), fill="tonexty",
+                                               fillcolor="rgba(52, 131, 250, 0.15)", hoverinfo="skip"),
+                                    go.Scatter(x=df["data"], y=df["preco"], mode="markers",
+                                               marker=dict(color="#3483fa"),
+                                               customdata=df[["minima", "maxima"]],
+                                               hovertemplate="%{x|%d/%m}: R$ %{y:.2f}<br>"
+                                                             "Mín R$ %{customdata[0]:.2f} · Máx R$ %{customdata[1]:.2f}"
+                                                             "<extra></extra>"),
+                                ]
+                                
+                                # Preço exato em degraus, dos intervalos do histórico (cada mudança no momento em que foi vista)
+                                pontos = expandir_intervalos(db.obter_intervalos_preco(produto["id"], 30))
+                                if pontos:
+                                    precos = pd.DataFrame(pontos)
+                                    # Um intervalo aberto antes da janela começa no primeiro dia do gráfico
+                                    precos["data"] = pd.to_datetime(precos["data"]).clip(lower=df["data"].min())
+                                    tracos.append(go.Scatter(x=precos["data"], y=precos["preco"], mode="lines",
+                                                             line=dict(color="#3483fa", shape="hv"),
+                                                             hovertemplate="%{x|%d/%m %H:%M}: R$ %{y:.2f}<extra></extra>"))
+                                fig = go.Figure(tracos)
+                                fig.update_layout(height=250, showlegend=False,
+                                                  xaxis_title="Data", yaxis_title="Preço (R$)")
                                 st.plotly_chart(fig, use_container_width=True)
                     
                     st.markdown("---")
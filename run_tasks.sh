@@ -33,6 +33,14 @@ fi
 echo "✅ PostgreSQL OK"
 echo ""
 
+# Aplicar migrações pendentes do schema
+echo "🔧 Aplicando migrações..."
+if ! python3 -m src.migrate; then
+    echo "❌ Erro: falha ao aplicar as migrações"
+    exit 1
+fi
+echo ""
+
 # Informar sobre o agendamento
 echo "📅 Configuração de agendamento:"
 echo "   • Frequência: A cada 10 minutos"
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Script para verificar o motor de fetch assíncrono (FETCH_ENGINE=async).
+
+Sobe um servidor HTTP local que serve as páginas de scripts/fixtures/ como
+listagens de várias categorias (a última página é a busca sem resultados) e
+conta as requisições simultâneas. Então:
+- roda o pipeline de páginas de cada categoria, todas ao mesmo tempo, com o
+  cliente requests e com o FetchEngine, e falha se as páginas ou os produtos
+  divergirem ou se o FetchEngine passar de FETCH_CONCURRENCY_PER_HOST
+  requisições simultâneas no host
+- roda scrape_categorias_async contra um banco descartável e falha se alguma
+  categoria não terminar com sucesso ou se os totais não baterem
+
+Uso:
+    python3 scripts/check_fetch_engine.py
+    python3 scripts/check_fetch_engine.py --categorias 6 --por-host 3
+"""
+
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from dotenv import load_dotenv
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from check_query_plans import criar_banco, remover_banco
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+FIXTURES = Path(__file__).parent / "fixtures"
+PAGINAS = ["listagem_grade.html", "listagem_classica.html", "sem_preco.html", "sem_resultados.html"]
+
+
+class ServidorListagens(BaseHTTPRequestHandler):
+    """Serve /<categoria>?_Paging=N com as fixtures e registra o pico de requisições simultâneas"""
+
+    lock = threading.Lock()
+    em_andamento = 0
+    pico = 0
+    atraso = 0.2
+
+    def do_GET(self):
+        pagina = int(parse_qs(urlparse(self.path).query).get("_Paging", ["1"])[0])
+        corpo = (FIXTURES / PAGINAS[min(pagina, len(PAGINAS)) - 1]).read_bytes()
+
+        cls = type(self)
+        with cls.lock:
+            cls.em_andamento += 1
+            cls.pico = max(cls.pico, cls.em_andamento)
+        try:
+            time.sleep(cls.atraso)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+        finally:
+            with cls.lock:
+                cls.em_andamento -= 1
+
+    @classmethod
+    def zerar_pico(cls):
+        with cls.lock:
+            cls.pico = 0
+
+    def log_message(self, *args):
+        pass
+
+
+def coletar_paginas(categorias, buscar, motor):
+    """Roda o pipeline de páginas de todas as categorias ao mesmo tempo; devolve {categoria: [(página, produtos)]}"""
+    from src.scraper import paginas_em_pipeline
+
+    resultados = {}
+
+    def coletar(categoria, url):
+        # A ordem da cascata de preço aprende por categoria: cada motor começa sem estatísticas
+        paginas = paginas_em_pipeline(url, f"{categoria}@{motor}", len(PAGINAS) + 1, {}, buscar=buscar)
+        resultados[categoria] = [(pagina, produtos) for pagina, _, produtos, erro in paginas if erro is None]
+
+    threads = [threading.Thread(target=coletar, args=(categoria, config["url"])) for categoria, config in categorias.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return resultados
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Falha se o motor de fetch assíncrono divergir do cliente requests')
+    parser.add_argument('--categorias', type=int, default=4,
+                       help='Categorias coletadas ao mesmo tempo (padrão: 4)')
+    parser.add_argument('--por-host', type=int, default=2,
+                       help='FETCH_CONCURRENCY_PER_HOST usado no teste (padrão: 2)')
+
+    args = parser.parse_args()
+
+    # Antes de importar src.config: sem cache, arquivo ou espera do rate limiter, parsing no próprio processo
+    os.environ.update({
+        "HTTP_CACHE_ENABLED": "false",
+        "ARCHIVE_ENABLED": "false",
+        "RATE_LIMIT_RATE": "1000",
+        "RATE_LIMIT_MAX_RATE": "1000",
+        "RATE_LIMIT_BURST": "1000",
+        "PARSE_WORKERS": "0",
+        "FETCH_CONCURRENCY_PER_HOST": str(args.por_host),
+    })
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), ServidorListagens)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_address[1]}"
+    categorias = {
+        f"categoria-{i}": {"url": f"{base}/categoria-{i}", "max_paginas": len(PAGINAS) + 1}
+        for i in range(1, args.categorias + 1)
+    }
+
+    from src.fetcher import get_fetch_engine
+    from src.http_client import get_http_client
+
+    falhas = []
+
+    esperado = coletar_paginas(categorias, get_http_client().buscar, "requests")
+    ServidorListagens.zerar_pico()
+    obtido = coletar_paginas(categorias, get_fetch_engine().buscar_bloqueante, "async")
+    pico = ServidorListagens.pico
+
+    for categoria in categorias:
+        if obtido.get(categoria) != esperado.get(categoria):
+            falhas.append(f"{categoria}: páginas do FetchEngine diferem das do cliente requests")
+    if pico > args.por_host:
+        falhas.append(f"FetchEngine fez {pico} requisições simultâneas no host (limite {args.por_host})")
+    print(f"📄 Pipeline: {sum(len(p) for p in esperado.values())} páginas por motor, "
+          f"pico de {pico} requisições simultâneas com o FetchEngine")
+
+    nome_banco = f"{os.getenv('DB_NAME', 'ml_crawler')}_fetch"
+    criar_banco(nome_banco, recriar=True)
+    os.environ["DB_NAME"] = nome_banco
+
+    import asyncio
+    from src.database_postgres import get_database, preparar_banco
+    from src.scraper import scrape_categorias_async
+
+    try:
+        preparar_banco()
+        resultados = asyncio.run(scrape_categorias_async(categorias))
+        for categoria, resultado in resultados.items():
+            total = sum(len(produtos) for _, produtos in esperado[categoria])
+            if resultado["status"] != "sucesso":
+                falhas.append(f"{categoria}: coleta assíncrona terminou com erro: {resultado.get('erro')}")
+            elif resultado["total_produtos"] != total:
+                falhas.append(f"{categoria}: {resultado['total_produtos']} produtos na coleta assíncrona (esperado {total})")
+    finally:
+        get_database().close_pool()
+        remover_banco(nome_banco)
+        servidor.shutdown()
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if not falhas:
+        print("✅ FetchEngine equivalente ao cliente requests e dentro do limite por host")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
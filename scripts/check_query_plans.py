@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Script para verificar os planos das consultas quentes do DatabasePostgres.
+
+Cria um banco descartável, aplica as migrações, popula com um volume realista
+(partições do histórico criadas por garantir_particoes_historico, na
+granularidade de HISTORICO_PARTICAO) e chama os métodos do DatabasePostgres
+interceptando cada instrução: antes de executá-la, roda EXPLAIN. Falha se
+alguma consulta cair em Seq Scan ou se um método não usar os índices que
+deveria usar.
+
+Uso:
+    python3 scripts/check_query_plans.py
+    python3 scripts/check_query_plans.py --produtos 100000 --manter
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import psycopg2
+from dotenv import load_dotenv
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+INSTRUCOES_EXPLICAVEIS = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+class CursorExplicado:
+    """Cursor que registra o plano (EXPLAIN) de cada instrução antes de executá-la"""
+
+    def __init__(self, cursor, conn, planos):
+        self._cursor = cursor
+        self._conn = conn
+        self._planos = planos
+
+    def execute(self, sql, params=None):
+        # execute_values manda a instrução já montada, em bytes
+        texto = sql.decode() if isinstance(sql, bytes) else sql
+        if texto.lstrip().split(None, 1)[0].upper() in INSTRUCOES_EXPLICAVEIS:
+            explain = self._conn.cursor()
+            explain.execute("EXPLAIN (FORMAT JSON) " + texto, params)
+            self._planos.append((" ".join(texto.split()), explain.fetchone()[0][0]["Plan"]))
+        return self._cursor.execute(sql, params)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class ConexaoExplicada:
+    def __init__(self, conn, planos):
+        self.conn = conn
+        self._planos = planos
+
+    def cursor(self, *args, **kwargs):
+        return CursorExplicado(self.conn.cursor(*args, **kwargs), self.conn, self._planos)
+
+    def __getattr__(self, nome):
+        return getattr(self.conn, nome)
+
+
+def criar_banco(nome: str, recriar: bool):
+    conn = psycopg2.connect(database="postgres", **_config_servidor())
+    conn.autocommit = True
+    try:
+        cursor = conn.cursor()
+        if recriar:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{nome}"')
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", (nome,))
+        if not cursor.fetchone():
+            cursor.execute(f"CREATE DATABASE \"{nome}\" ENCODING 'UTF8' TEMPLATE template0")
+    finally:
+        conn.close()
+
+
+def remover_banco(nome: str):
+    conn = psycopg2.connect(database="postgres", **_config_servidor())
+    conn.autocommit = True
+    try:
+        conn.cursor().execute(f'DROP DATABASE IF EXISTS "{nome}"')
+    finally:
+        conn.close()
+
+
+def _config_servidor():
+    return {
+        "host": os.getenv("DB_HOST", "localhost"),
+        "port": int(os.getenv("DB_PORT", 5432)),
+        "user": os.getenv("DB_USER", "postgres"),
+        "password": os.getenv("DB_PASSWORD", "postgres"),
+    }
+
+
+def popular(db, total_produtos: int, registros_por_produto: int, meses: int):
+    """Insere produtos, histórico espalhado pelos últimos meses, coletas e fingerprints"""
+    from src.config import CATEGORIAS
+
+    categorias = list(CATEGORIAS)
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT count(*) FROM produtos")
+        if cursor.fetchone()[0]:
+            return
+        cursor.execute("SELECT LOCALTIMESTAMP - make_interval(months => %s)", (meses,))
+        desde = cursor.fetchone()[0]
+    finally:
+        db.release_connection(conn)
+
+    # Partições passadas para o histórico semeado, como o banco as cria (granularidade de HISTORICO_PARTICAO)
+    db.garantir_particoes_historico(desde=desde)
+
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO produtos (nome, link, categoria, produto_id_ml, preco_atual, preco_original,
+                                  ultima_atualizacao)
+            SELECT 'Produto ' || g, 'https://produto.mercadolivre.com.br/MLB-' || g,
+                   (%s::text[])[1 + g %% array_length(%s::text[], 1)], 'MLB' || g,
+                   (random() * 5000)::numeric(10, 2), NULL,
+                   LOCALTIMESTAMP - random() * INTERVAL '10 days'
+            FROM generate_series(1, %s) g
+        """, (categorias, categorias, total_produtos))
+        cursor.execute("INSERT INTO produtos_vistos (produto_id, visto_em) SELECT id, ultima_atualizacao FROM produtos")
+
+        # Histórico em ordem de data (como chega em produção), para o BRIN ficar representativo
+        cursor.execute("""
+            INSERT INTO precos_historico (produto_id, preco, data)
+            SELECT p.id, (random() * 5000)::numeric(10, 2),
+                   LOCALTIMESTAMP - make_interval(months => %s) * random() AS data
+            FROM produtos p, generate_series(1, %s)
+            ORDER BY data
+        """, (meses, registros_por_produto))
+
+        cursor.execute("""
+            INSERT INTO coletas (categoria, data_inicio, data_fim, total_produtos, status)
+            SELECT c, LOCALTIMESTAMP - make_interval(hours => g), LOCALTIMESTAMP - make_interval(hours => g),
+                   100, 'sucesso'
+            FROM unnest(%s::text[]) c, generate_series(1, 24 * 30) g
+        """, (categorias,))
+
+        cursor.execute("""
+            INSERT INTO paginas_fingerprint (categoria, pagina, hash_conteudo, hash_produtos,
+                                             produto_ids, total_produtos)
+            SELECT c, g, md5(c || g), md5(g || c), ARRAY[g, g + 1, g + 2], 3
+            FROM unnest(%s::text[]) c, generate_series(1, 10) g
+        """, (categorias,))
+        conn.commit()
+    finally:
+        db.release_connection(conn)
+
+    conn = db.get_connection()
+    try:
+        conn.autocommit = True
+        conn.cursor().execute("VACUUM ANALYZE")
+    finally:
+        conn.autocommit = False
+        db.release_connection(conn)
+
+
+def consultas_quentes(db):
+    """(nome, chamada, índices esperados) de cada método do DatabasePostgres usado no caminho da coleta ou
+    no dashboard. Os índices são os da tabela particionada (o das partições conta como o dela)"""
+    from src.config import CATEGORIAS
+
+    categoria = next(iter(CATEGORIAS))
+    return [
+        ("obter_produto_por_id_ml", lambda: db.obter_produto_por_id_ml("MLB42"), {"idx_produto_id_ml"}),
+        ("obter_produto_por_link", lambda: db.obter_produto_por_link("https://produto.mercadolivre.com.br/MLB-42"),
+         {"produtos_link_key"}),
+        # paginas_fingerprint tem poucas linhas por categoria: Seq Scan é a escolha certa
+        ("obter_fingerprints_categoria", lambda: db.obter_fingerprints_categoria(categoria), set()),
+        ("carregar_identidades", lambda: db.carregar_identidades(categoria), {"idx_categoria"}),
+        ("tocar_pagina", lambda: db.tocar_pagina(categoria, 1, "hash"), {"paginas_fingerprint_pkey"}),
+        ("gravar_paginas", lambda: db.gravar_paginas([
+            {"tipo": "upsert", "categoria": categoria, "pagina": 1, "hash_conteudo": "novo", "hash_produtos": "novo",
+             "produtos": [{"nome": "Produto 44", "link": "https://produto.mercadolivre.com.br/MLB-44",
+                           "produto_id_ml": "MLB44", "preco": 10.5}],
+             "inalterados": [45, 46], "total": 3},
+            {"tipo": "tocar", "categoria": categoria, "pagina": 2, "hash_conteudo": "hash", "total": 3},
+        ]), {"idx_produto_id_ml", "produtos_link_key", "paginas_fingerprint_pkey"}),
+        ("obter_historico_preco", lambda: db.obter_historico_preco(42, 30), {"precos_diarios_pkey"}),
+        ("obter_intervalos_preco", lambda: db.obter_intervalos_preco(42, 30), {"idx_historico_produto_data"}),
+        ("obter_relatorio_categoria", lambda: db.obter_relatorio_categoria(categoria),
+         {"idx_categoria", "idx_coleta_categoria_inicio"}),
+        ("obter_estatisticas_produto", lambda: db.obter_estatisticas_produto(42),
+         {"produtos_pkey", "precos_diarios_pkey"}),
+        ("finalizar_coleta", lambda: db.finalizar_coleta(
+            db.iniciar_coleta(categoria), 50, 0, 50, True, produto_ids=list(range(1, 51))),
+         {"idx_historico_produto_data", "produtos_vistos_pkey"}),
+    ]
+
+
+def paginas_por_relacao(db):
+    """Páginas de cada tabela do schema public (pg_class.relpages, atualizado pelo VACUUM ANALYZE)"""
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT c.relname, c.relpages FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'public' AND c.relkind = 'r'
+        """)
+        return dict(cursor.fetchall())
+    finally:
+        db.release_connection(conn)
+
+
+def indices_das_particoes(db):
+    """Índice de cada partição -> índice da tabela particionada de que ele faz parte"""
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT c.relname, p.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE c.relkind = 'i'
+        """)
+        return dict(cursor.fetchall())
+    finally:
+        db.release_connection(conn)
+
+
+def indices_usados(plano, pais):
+    """Índices lidos em qualquer nó do plano, com os das partições trocados pelo da tabela particionada"""
+    usados = set()
+    if plano.get("Index Name"):
+        usados.add(pais.get(plano["Index Name"], plano["Index Name"]))
+    for filho in plano.get("Plans", []):
+        usados |= indices_usados(filho, pais)
+    return usados
+
+
+def varreduras_sequenciais(plano):
+    """Relações lidas por Seq Scan em qualquer nó do plano"""
+    encontradas = []
+    if plano.get("Node Type") == "Seq Scan":
+        encontradas.append(plano.get("Relation Name"))
+    for filho in plano.get("Plans", []):
+        encontradas.extend(varreduras_sequenciais(filho))
+    return encontradas
+
+
+def varreduras_proibidas(plano, paginas, paginas_minimas):
+    """Seq Scans em tabelas grandes; catálogos e tabelas pequenas (ex.: partições futuras vazias) são
+    varridos de propósito pelo planejador"""
+    return [r for r in varreduras_sequenciais(plano)
+            if not r.startswith("pg_") and paginas.get(r, 0) >= paginas_minimas]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Falha se alguma consulta quente do banco usar Seq Scan '
+                                                 'ou deixar de usar seus índices')
+    parser.add_argument('--produtos', type=int, default=50000,
+                       help='Produtos semeados no banco descartável (padrão: 50000)')
+    parser.add_argument('--historico', type=int, default=10,
+                       help='Registros de histórico por produto (padrão: 10)')
+    parser.add_argument('--meses', type=int, default=6,
+                       help='Meses de histórico semeados (padrão: 6)')
+    parser.add_argument('--paginas-minimas', type=int, default=10,
+                       help='Seq Scan só reprova em tabelas com pelo menos estas páginas (padrão: 10)')
+    parser.add_argument('--manter', action='store_true',
+                       help='Não remove o banco descartável ao final (reaproveitado na próxima execução)')
+    parser.add_argument('--verbose', action='store_true',
+                       help='Mostra o plano de cada instrução')
+
+    args = parser.parse_args()
+
+    nome_banco = f"{os.getenv('DB_NAME', 'ml_crawler')}_planos"
+    criar_banco(nome_banco, recriar=not args.manter)
+    os.environ["DB_NAME"] = nome_banco
+
+    from src.database_postgres import DatabasePostgres
+
+    db = DatabasePostgres(minconn=1, maxconn=2)
+    falhas = 0
+    try:
+        db.garantir_schema()
+        print(f"🌱 Populando {nome_banco} ({args.produtos} produtos)...")
+        popular(db, args.produtos, args.historico, args.meses)
+
+        paginas = paginas_por_relacao(db)
+        pais = indices_das_particoes(db)
+        planos = []
+        conexao_real = db.get_connection
+        liberar_real = db.release_connection
+        db.get_connection = lambda: ConexaoExplicada(conexao_real(), planos)
+        db.release_connection = lambda conn: liberar_real(getattr(conn, "conn", conn))
+
+        for nome, chamada, esperados in consultas_quentes(db):
+            planos.clear()
+            chamada()
+            reprovadas = 0
+            usados = set()
+            for sql, plano in planos:
+                seq = varreduras_proibidas(plano, paginas, args.paginas_minimas)
+                usados |= indices_usados(plano, pais)
+                if args.verbose:
+                    print(f"\n{nome}: {sql}\n{json.dumps(plano, indent=2)}")
+                if seq:
+                    reprovadas += 1
+                    print(f"❌ {nome}: Seq Scan em {', '.join(seq)}\n   {sql[:200]}")
+            faltando = esperados - usados
+            if faltando:
+                reprovadas += 1
+                print(f"❌ {nome}: não usou {', '.join(sorted(faltando))} (usou {', '.join(sorted(usados)) or 'nenhum índice'})")
+            if not reprovadas:
+                print(f"✅ {nome}: {len(planos)} instrução(ões) sem Seq Scan em tabelas grandes, "
+                      f"usando {', '.join(sorted(esperados)) or 'nenhum índice esperado'}")
+            falhas += reprovadas
+    finally:
+        db.close_pool()
+        if not args.manter:
+            remover_banco(nome_banco)
+
+    print(f"\n📊 {falhas} falha(s): instruções com Seq Scan ou métodos sem os índices esperados")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
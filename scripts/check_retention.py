@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Script para verificar a retenção do histórico de preços (limpar_dados_antigos).
+
+Cria um banco descartável com uma partição antiga que guarda um intervalo aberto
+antes do corte e ainda vigente, um intervalo já encerrado e uma partição só com
+intervalos encerrados. Roda a retenção e falha se:
+- alguma das partições antigas ficar (o intervalo vigente não pode segurá-la)
+- o intervalo vigente sumir ou não começar na primeira partição mantida
+- os encerrados ficarem ou o resumo diário mudar
+- a próxima coleta abrir um intervalo novo em vez de estender o vigente
+
+Uso:
+    python3 scripts/check_retention.py
+    python3 scripts/check_retention.py --dias 30
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from check_query_plans import criar_banco, remover_banco
+
+# Carregar variáveis de ambiente
+load_dotenv()
+
+
+def semear(db, dias: int):
+    """Cria as partições antigas e os intervalos; devolve (id do produto vigente, partições antigas)"""
+    from src.database_postgres import inicio_particao
+
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT date_trunc('month', LOCALTIMESTAMP - make_interval(days => %s)) - INTERVAL '2 months',
+                   date_trunc('month', LOCALTIMESTAMP - make_interval(days => %s)) - INTERVAL '1 month'
+        """, (dias, dias))
+        encerrada, vigente = cursor.fetchone()
+        # Partições contíguas desde a mais antiga, na granularidade configurada
+        db._criar_particoes_historico(cursor, desde=encerrada)
+
+        cursor.execute("""
+            INSERT INTO produtos (nome, link, categoria, produto_id_ml, preco_atual)
+            VALUES ('Vigente', 'https://produto.mercadolivre.com.br/MLB-1', 'celular', 'MLB1', 100),
+                   ('Encerrado', 'https://produto.mercadolivre.com.br/MLB-2', 'celular', 'MLB2', 200)
+            RETURNING id
+        """)
+        produto_vigente, produto_encerrado = [linha[0] for linha in cursor.fetchall()]
+
+        # Vigente: aberto na partição antiga e estendido até agora (o preço não mudou desde então)
+        cursor.execute("""
+            INSERT INTO precos_historico (produto_id, preco, data, valido_ate, observacoes) VALUES
+                (%s, 90, %s, %s::timestamp + INTERVAL '1 day', 2),
+                (%s, 100, %s::timestamp + INTERVAL '2 days', LOCALTIMESTAMP, 50),
+                (%s, 200, %s, %s::timestamp + INTERVAL '3 days', 4)
+        """, (produto_vigente, vigente, vigente, produto_vigente, vigente,
+              produto_encerrado, encerrada, encerrada))
+        conn.commit()
+        antigas = {f"precos_historico_p{inicio_particao(inicio):%Y%m%d}" for inicio in (encerrada, vigente)}
+        return produto_vigente, antigas
+    finally:
+        db.release_connection(conn)
+
+
+def intervalos(db, produto_id: int):
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT preco::float8, observacoes FROM precos_historico WHERE produto_id = %s ORDER BY data",
+                       (produto_id,))
+        return cursor.fetchall()
+    finally:
+        db.release_connection(conn)
+
+
+def consultar(db, sql: str, params: tuple = ()):
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        db.release_connection(conn)
+
+
+def primeira_particao(db):
+    conn = db.get_connection()
+    try:
+        return db._particoes_historico(conn.cursor())[0][1]
+    finally:
+        db.release_connection(conn)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Falha se a retenção apagar intervalos vigentes ou mantiver partições antigas')
+    parser.add_argument('--dias', type=int, default=90,
+                       help='Dias mantidos pela retenção (padrão: 90)')
+
+    args = parser.parse_args()
+
+    nome_banco = f"{os.getenv('DB_NAME', 'ml_crawler')}_retencao"
+    criar_banco(nome_banco, recriar=True)
+    os.environ["DB_NAME"] = nome_banco
+
+    from src.database_postgres import DatabasePostgres
+
+    db = DatabasePostgres(minconn=1, maxconn=2)
+    falhas = []
+    try:
+        db.garantir_schema()
+        produto_id, antigas = semear(db, args.dias)
+        resumo = consultar(db, "SELECT * FROM precos_diarios ORDER BY produto_id, dia")
+
+        removidas = db.limpar_dados_antigos(args.dias)
+        for nome in sorted(antigas - set(removidas)):
+            falhas.append(f"{nome}, anterior ao corte, não foi removida")
+        restantes = intervalos(db, produto_id)
+        if restantes != [(100.0, 50)]:
+            falhas.append(f"intervalos do produto vigente após a retenção: {restantes} (esperado [(100.0, 50)])")
+
+        # O intervalo vigente foi cortado na fronteira: começa na primeira partição mantida
+        fronteira = primeira_particao(db)
+        inicio = consultar(db, "SELECT min(data) FROM precos_historico WHERE produto_id = %s", (produto_id,))[0][0]
+        if inicio != fronteira:
+            falhas.append(f"intervalo vigente começa em {inicio} (esperado {fronteira}, início da primeira partição)")
+        if consultar(db, "SELECT * FROM precos_diarios ORDER BY produto_id, dia") != resumo:
+            falhas.append("o resumo diário mudou com a retenção")
+
+        # A próxima coleta com o mesmo preço estende o intervalo vigente
+        db.finalizar_coleta(db.iniciar_coleta("celular"), 1, 0, 0, True, produto_ids=[produto_id])
+        restantes = intervalos(db, produto_id)
+        if restantes != [(100.0, 51)]:
+            falhas.append(f"intervalos após a coleta seguinte: {restantes} (esperado [(100.0, 51)])")
+    finally:
+        db.close_pool()
+        remover_banco(nome_banco)
+
+    for falha in falhas:
+        print(f"❌ {falha}")
+    if not falhas:
+        print("✅ Retenção removeu as partições antigas e manteve o intervalo vigente, cortado na fronteira")
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """
-Script para remover produtos que não foram atualizados há muito tempo.
+Script para remover produtos que não foram vistos há muito tempo.
 
 Remove produtos onde:
-- ultima_atualizacao > X dias (padrão: 5 dias)
+- visto por último (produtos_vistos.visto_em) > X dias (padrão: 5 dias)
 
 Isso limpa produtos que saíram das primeiras páginas ou não estão mais disponíveis.
 """
@@ -24,23 +24,25 @@ load_dotenv()
 
 
 def identificar_produtos_desatualizados(db, dias: int = 5):
-    """Identifica produtos que não foram atualizados há X dias"""
+    """Identifica produtos que não foram vistos há X dias"""
     conn = db.get_connection()
     try:
         cursor = conn.cursor()
         
         # Query para encontrar produtos desatualizados
+        # ultima_atualizacao só muda quando o preço muda; quem foi visto sem mudança está em produtos_vistos
         cursor.execute("""
             SELECT 
-                id, 
-                nome, 
-                preco_atual, 
-                categoria,
-                ultima_atualizacao,
-                link
-            FROM produtos
-            WHERE ultima_atualizacao < NOW() - INTERVAL '%s days'
-            ORDER BY ultima_atualizacao ASC
+                p.id, 
+                p.nome, 
+                p.preco_atual, 
+                p.categoria,
+                COALESCE(v.visto_em, p.ultima_atualizacao) AS visto_em,
+                p.link
+            FROM produtos p
+            LEFT JOIN produtos_vistos v ON v.produto_id = p.id
+            WHERE COALESCE(v.visto_em, p.ultima_atualizacao) < NOW() - INTERVAL '%s days'
+            ORDER BY visto_em ASC
         """, (dias,))
         
         produtos = cursor.fetchall()
@@ -56,18 +58,18 @@ def exibir_produtos(produtos, dias: int):
         print(f"✅ Nenhum produto desatualizado há mais de {dias} dias!")
         return False
     
-    print(f"\n🔍 Encontrados {len(produtos)} produtos sem atualização há mais de {dias} dias:\n")
+    print(f"\n🔍 Encontrados {len(produtos)} produtos não vistos há mais de {dias} dias:\n")
     print("-" * 140)
-    print(f"{'ID':<6} {'Última Atualização':<20} {'Preço':<12} {'Categoria':<20} {'Nome':<60}")
+    print(f"{'ID':<6} {'Visto por Último':<20} {'Preço':<12} {'Categoria':<20} {'Nome':<60}")
     print("-" * 140)
     
     for produto in produtos:
-        id_prod, nome, preco_atual, categoria, ultima_atualizacao, link = produto
+        id_prod, nome, preco_atual, categoria, visto_em, link = produto
         nome_truncado = nome[:57] + "..." if len(nome) > 60 else nome
         
-        # Calcular há quantos dias foi atualizado
-        dias_atras = (datetime.now() - ultima_atualizacao).days
-        data_str = f"{ultima_atualizacao.strftime('%Y-%m-%d %H:%M')} ({dias_atras}d)"
+        # Calcular há quantos dias foi visto
+        dias_atras = (datetime.now() - visto_em).days
+        data_str = f"{visto_em.strftime('%Y-%m-%d %H:%M')} ({dias_atras}d)"
         
         print(f"{id_prod:<6} {data_str:<20} R$ {preco_atual:<9.2f} {categoria:<20} {nome_truncado:<60}")
     
@@ -116,7 +118,7 @@ def main():
     
     parser = argparse.ArgumentParser(description='Remove produtos desatualizados do banco de dados')
     parser.add_argument('--dias', type=int, default=5, 
-                       help='Número de dias sem atualização para considerar produto desatualizado (padrão: 5)')
+                       help='Número de dias sem ser visto em uma coleta para considerar produto desatualizado (padrão: 5)')
     parser.add_argument('--auto', action='store_true',
                        help='Executar automaticamente sem confirmação (use com cuidado!)')
     
@@ -135,7 +137,7 @@ def main():
         return 1
     
     # Identificar produtos desatualizados
-    print(f"\n🔍 Buscando produtos sem atualização há mais de {args.dias} dias...")
+    print(f"\n🔍 Buscando produtos não vistos há mais de {args.dias} dias...")
     produtos = identificar_produtos_desatualizados(db, args.dias)
     
     # Exibir produtos
@@ -149,7 +151,7 @@ def main():
         # Confirmar remoção
         print("\n⚠️  ATENÇÃO: Esta ação é IRREVERSÍVEL!")
         print("   Os produtos e todo seu histórico de preços serão removidos permanentemente.")
-        print(f"   Estes produtos não foram atualizados há mais de {args.dias} dias.")
+        print(f"   Estes produtos não foram vistos há mais de {args.dias} dias.")
         print("   Provavelmente saíram das primeiras 4 páginas ou não estão mais disponíveis.")
         
         resposta = input("\n❓ Deseja prosseguir com a remoção? (sim/não): ").strip().lower()
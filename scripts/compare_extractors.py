@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Script para verificar a equivalência entre os caminhos de extração.
+
+Para cada página e cada limite de produtos, compara com o BeautifulSoup:
+- o lxml sobre o HTML decodificado (str)
+- o lxml incremental sobre os bytes (HTMLPullParser), alimentado em blocos
+  pequenos para exercitar cortes no meio de tags e de caracteres UTF-8
+
+Falha se algum produto divergir. Sem origens, usa as páginas de exemplo em
+scripts/fixtures/ (layouts grade e clássico, página vazia, itens sem preço,
+página em latin-1 declarada só no <meta> e títulos com <script>/<style>/<template>). Arquivos .html não têm Content-Type:
+o encoding fica para o extrator descobrir, como numa resposta sem charset.
+Aceita:
+- arquivos .html
+- diretórios (todos os .html e .warc.gz dentro deles)
+- segmentos do arquivo de páginas (.warc.gz)
+
+Uso:
+    python3 scripts/compare_extractors.py
+    python3 scripts/compare_extractors.py archive/ paginas_salvas/ --limites 1 10 50
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.archive import ler_segmento
+from src.extractor import (
+    ESTRATEGIAS_PRECO,
+    TAMANHO_BLOCO,
+    _LxmlBackend,
+    _blocos,
+    _extrair_itens,
+    _novas_metricas,
+    extract_products_bs4,
+    extract_products_lxml,
+)
+from src.utils import encoding_do_corpo
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def carregar_paginas(origens):
+    """Gera (nome, conteúdo em bytes, encoding) para cada página encontrada nas origens"""
+    for origem in map(Path, origens):
+        if origem.is_dir():
+            arquivos = sorted(origem.rglob("*.html")) + sorted(origem.rglob("*.warc.gz"))
+        else:
+            arquivos = [origem]
+
+        for arquivo in arquivos:
+            if arquivo.name.endswith(".warc.gz"):
+                for i, registro in enumerate(ler_segmento(arquivo)):
+                    if registro["status"] == 200:
+                        yield (f"{arquivo.name}#{i} ({registro['url']})",
+                               registro["conteudo"], registro["encoding"])
+            else:
+                yield str(arquivo), arquivo.read_bytes(), None
+
+
+def extrair_incremental(conteudo, encoding, limite, tamanho):
+    """Caminho de produção para bytes: parser incremental do lxml alimentado em blocos de `tamanho`"""
+    # Sem encoding conhecido, o mesmo de extrair_pagina: o declarado na página
+    itens = _LxmlBackend.itens_incrementais(_blocos(conteudo, tamanho), encoding or encoding_do_corpo(conteudo))
+    return _extrair_itens(itens, limite, _LxmlBackend, list(ESTRATEGIAS_PRECO), _novas_metricas())
+
+
+def comparar(nome, conteudo, encoding, limite, tamanhos, tempos):
+    """Compara os caminhos em uma página com um limite; retorna True se todos batem com o bs4"""
+    html = conteudo.decode(encoding or encoding_do_corpo(conteudo), errors="replace")
+
+    caminhos = [("lxml", lambda: extract_products_lxml(html, limit=limite))]
+    for tamanho in tamanhos:
+        caminhos.append((f"lxml incremental ({tamanho} B)",
+                         lambda t=tamanho: extrair_incremental(conteudo, encoding, limite, t)))
+
+    inicio = time.perf_counter()
+    esperado = extract_products_bs4(html, limit=limite)
+    tempos["bs4"] = tempos.get("bs4", 0.0) + time.perf_counter() - inicio
+
+    ok = True
+    for caminho, extrair in caminhos:
+        inicio = time.perf_counter()
+        obtido = extrair()
+        tempos[caminho] = tempos.get(caminho, 0.0) + time.perf_counter() - inicio
+
+        if obtido == esperado:
+            continue
+
+        ok = False
+        print(f"\n❌ Divergência em {nome} (limite {limite}): "
+              f"bs4={len(esperado)} produtos, {caminho}={len(obtido)} produtos")
+        for i, (a, b) in enumerate(zip(esperado, obtido)):
+            if a != b:
+                print(f"   item {i}:")
+                print(f"     bs4:  {a}")
+                print(f"     {caminho}: {b}")
+                break
+    return ok
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compara os caminhos de extração (bs4, lxml e lxml incremental)')
+    parser.add_argument('origens', nargs='*', default=[str(FIXTURES)],
+                       help='Arquivos .html, segmentos .warc.gz ou diretórios com eles (padrão: scripts/fixtures/)')
+    parser.add_argument('--limites', type=int, nargs='+', default=[1, 3, 50],
+                       help='Limites de produtos por página passados aos extratores (padrão: 1 3 50)')
+    parser.add_argument('--blocos', type=int, nargs='+', default=[1, 61, TAMANHO_BLOCO],
+                       help=f'Tamanhos de bloco do parser incremental, em bytes (padrão: 1 61 {TAMANHO_BLOCO})')
+
+    args = parser.parse_args()
+
+    total = 0
+    divergentes = 0
+    tempos = {}
+
+    for nome, conteudo, encoding in carregar_paginas(args.origens):
+        total += 1
+        resultados = [comparar(nome, conteudo, encoding, limite, args.blocos, tempos)
+                      for limite in args.limites]
+        divergentes += 0 if all(resultados) else 1
+
+    if total == 0:
+        print("⚠️  Nenhuma página encontrada.")
+        return 1
+
+    print(f"\n📊 {total} páginas comparadas com limites {args.limites}, {divergentes} divergentes")
+    for caminho, tempo in tempos.items():
+        print(f"   {caminho}: {tempo:.3f}s")
+
+    return 1 if divergentes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import gzip
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+from .config import ARCHIVE_DIR, ARCHIVE_ENABLED, ARCHIVE_SEGMENT_BYTES, ARCHIVE_MAX_BYTES, ARCHIVE_RETENCAO_DIAS
+
+# Headers que deixam de valer porque o corpo é gravado já descomprimido, e os que carregam sessão/credenciais
+HEADERS_DESCARTADOS = {"content-encoding", "content-length", "transfer-encoding"}
+HEADERS_SENSIVEIS = {"set-cookie", "set-cookie2", "cookie", "authorization", "proxy-authorization",
+                     "www-authenticate", "proxy-authenticate"}
+
+
+class HtmlArchive:
+    # Segmentos append-only no formato WARC/1.0: um membro gzip por registro "response"
+    def __init__(self, diretorio: Path = ARCHIVE_DIR, tamanho_segmento: int = ARCHIVE_SEGMENT_BYTES,
+                 max_bytes: int = ARCHIVE_MAX_BYTES, retencao_dias: float = ARCHIVE_RETENCAO_DIAS):
+        self.diretorio = Path(diretorio)
+        self.tamanho_segmento = tamanho_segmento
+        self.max_bytes = max_bytes
+        self.retencao_dias = retencao_dias
+        self._lock = threading.Lock()
+        self._segmento: Optional[Path] = None
+
+    def _novo_segmento(self) -> Path:
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        carimbo = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        return self.diretorio / f"ml-crawler-{carimbo}-{os.getpid()}.warc.gz"
+
+    def _podar(self):
+        # Roda a cada segmento novo: apaga os segmentos fechados mais antigos que a retenção e, do mais
+        # antigo para o mais novo, os que passam de max_bytes (o total pode exceder em até um segmento)
+        segmentos = []
+        for caminho in self.diretorio.glob("*.warc.gz"):
+            try:
+                info = caminho.stat()
+            except OSError:
+                continue
+            segmentos.append((info.st_mtime, info.st_size, caminho))
+        segmentos.sort()
+
+        total = sum(tamanho for _, tamanho, _ in segmentos)
+        limite_idade = time.time() - self.retencao_dias * 86400 if self.retencao_dias else None
+        for mtime, tamanho, caminho in segmentos:
+            if caminho == self._segmento:
+                continue
+            if not ((limite_idade and mtime < limite_idade) or (self.max_bytes and total > self.max_bytes)):
+                break
+            try:
+                caminho.unlink()
+            except OSError:
+                continue
+            total -= tamanho
+
+    def gravar(self, url: str, status: int, headers: Dict[str, str], conteudo: bytes,
+               encoding: Optional[str] = None, categoria: Optional[str] = None,
+               pagina: Optional[int] = None, data: Optional[datetime] = None):
+        data = data or datetime.now(timezone.utc)
+
+        linhas_http = [f"HTTP/1.1 {status}"]
+        linhas_http += [f"{k}: {v}" for k, v in headers.items()
+                        if k.lower() not in HEADERS_DESCARTADOS and k.lower() not in HEADERS_SENSIVEIS]
+        bloco = ("\r\n".join(linhas_http) + "\r\n\r\n").encode("utf-8") + conteudo
+
+        cabecalho = [
+            "WARC/1.0",
+            "WARC-Type: response",
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>",
+            f"WARC-Date: {data.strftime('%Y-%m-%dT%H:%M:%SZ')}",
+            f"WARC-Target-URI: {url}",
+            "Content-Type: application/http; msgtype=response",
+        ]
+        if encoding:
+            cabecalho.append(f"X-Encoding: {encoding}")
+        if categoria:
+            cabecalho.append(f"X-Categoria: {categoria}")
+        if pagina is not None:
+            cabecalho.append(f"X-Pagina: {pagina}")
+        cabecalho.append(f"Content-Length: {len(bloco)}")
+
+        registro = ("\r\n".join(cabecalho) + "\r\n\r\n").encode("utf-8") + bloco + b"\r\n\r\n"
+        comprimido = gzip.compress(registro, compresslevel=6)
+
+        with self._lock:
+            if (self._segmento is None or not self._segmento.exists()
+                    or self._segmento.stat().st_size >= self.tamanho_segmento):
+                self._segmento = self._novo_segmento()
+                self._podar()
+            with open(self._segmento, "ab") as f:
+                f.write(comprimido)
+
+
+def _ler_cabecalhos(stream) -> Optional[Dict[str, str]]:
+    linha = stream.readline()
+    while linha in (b"\r\n", b"\n"):
+        linha = stream.readline()
+    if not linha:
+        return None
+
+    cabecalhos = {"_versao": linha.decode("utf-8").strip()}
+    for linha in iter(stream.readline, b""):
+        linha = linha.decode("utf-8").rstrip("\r\n")
+        if not linha:
+            break
+        chave, _, valor = linha.partition(":")
+        cabecalhos[chave.strip().lower()] = valor.strip()
+    return cabecalhos
+
+
+def ler_segmento(caminho: Union[str, Path]) -> Iterator[Dict]:
+    with gzip.open(caminho, "rb") as stream:
+        while True:
+            cabecalhos = _ler_cabecalhos(stream)
+            if cabecalhos is None:
+                return
+
+            bloco = stream.read(int(cabecalhos.get("content-length", 0)))
+            if cabecalhos.get("warc-type") != "response":
+                continue
+
+            bruto, _, conteudo = bloco.partition(b"\r\n\r\n")
+            linhas = bruto.decode("utf-8").split("\r\n")
+            headers = dict(l.split(": ", 1) for l in linhas[1:] if ": " in l)
+            pagina = cabecalhos.get("x-pagina")
+
+            yield {
+                "url": cabecalhos.get("warc-target-uri"),
+                "data": datetime.strptime(cabecalhos["warc-date"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc),
+                "status": int(linhas[0].split()[1]),
+                "headers": headers,
+                "conteudo": conteudo,
+                "encoding": cabecalhos.get("x-encoding"),
+                "categoria": cabecalhos.get("x-categoria"),
+                "pagina": int(pagina) if pagina else None,
+            }
+
+
+def ler_arquivo(origem: Union[str, Path]) -> Iterator[Dict]:
+    origem = Path(origem)
+    segmentos = sorted(origem.glob("*.warc.gz")) if origem.is_dir() else [origem]
+    for segmento in segmentos:
+        yield from ler_segmento(segmento)
+
+
+_html_archive: Optional[HtmlArchive] = None
+_html_archive_lock = threading.Lock()
+
+
+def get_html_archive() -> Optional[HtmlArchive]:
+    global _html_archive
+    if not ARCHIVE_ENABLED:
+        return None
+    with _html_archive_lock:
+        if _html_archive is None:
+            _html_archive = HtmlArchive()
+        return _html_archive
@@ -140,6 +140,8 @@ PROJECT_ROOT = Path(__file__).parent.parent
 LOG_DIR = PROJECT_ROOT / "logs"
 REPORT_DIR = PROJECT_ROOT / "reports"
 
+CACHE_DIR = PROJECT_ROOT / "cache"
+
 LOG_DIR.mkdir(exist_ok=True)
 REPORT_DIR.mkdir(exist_ok=True)
 
@@ -148,8 +150,56 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 }
 
-DELAY_BETWEEN_REQUESTS = 5
-DELAY_BETWEEN_CATEGORIES = 10
+# Token bucket por host (requisições/segundo), ajustado em AIMD pelas respostas
+RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", 0.5))
+RATE_LIMIT_MIN_RATE = float(os.getenv("RATE_LIMIT_MIN_RATE", 0.05))
+RATE_LIMIT_MAX_RATE = float(os.getenv("RATE_LIMIT_MAX_RATE", 4.0))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", 2))
+RATE_LIMIT_INCREASE = float(os.getenv("RATE_LIMIT_INCREASE", 0.05))
+RATE_LIMIT_DECREASE = float(os.getenv("RATE_LIMIT_DECREASE", 0.5))
+RATE_LIMIT_LATENCY_TARGET = float(os.getenv("RATE_LIMIT_LATENCY_TARGET", 3.0))
+RATE_LIMIT_STATE_DIR = os.getenv("RATE_LIMIT_STATE_DIR") or None
+
+# Motor de fetch: "requests" (sessão com pool, uma requisição por thread do pipeline) ou "async"
+# (FetchEngine em httpx, com fila limitada e limite de requisições simultâneas global e por host)
+FETCH_ENGINE = os.getenv("FETCH_ENGINE", "requests").lower()
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", 8))
+FETCH_CONCURRENCY_PER_HOST = int(os.getenv("FETCH_CONCURRENCY_PER_HOST", 4))
+FETCH_QUEUE_SIZE = int(os.getenv("FETCH_QUEUE_SIZE", 32))
+
+# Páginas em espera entre as etapas fetch → parse → persistência de uma categoria
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 2))
+
+# Write-behind: páginas aguardando gravação (0 = gravação síncrona), páginas por lote e
+# segundos máximos que uma página espera o lote encher
+WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", 16))
+WRITE_BEHIND_BATCH_PAGES = int(os.getenv("WRITE_BEHIND_BATCH_PAGES", 5))
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", 2.0))
+
+# Carrega os produtos da categoria no início da coleta e grava só os novos/alterados
+IDENTITY_MAP_ENABLED = os.getenv("IDENTITY_MAP_ENABLED", "true").lower() == "true"
+
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", CACHE_DIR / "http"))
+HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", 24 * 3600))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# "lxml" (XPath pré-compilado, com fallback para BeautifulSoup) ou "bs4"
+EXTRACTOR = os.getenv("EXTRACTOR", "lxml").lower()
+# Lê os resultados do JSON embutido (__PRELOADED_STATE__) antes de percorrer o HTML
+EXTRACTOR_EMBEDDED_JSON = os.getenv("EXTRACTOR_EMBEDDED_JSON", "true").lower() == "true"
+
+# Processos dedicados ao parsing (0 = parsing no próprio processo) e páginas aguardando na fila
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", max((os.cpu_count() or 1) - 1, 0)))
+PARSE_QUEUE_SIZE = int(os.getenv("PARSE_QUEUE_SIZE", 64))
+
+# Arquivo das páginas baixadas (WARC) para replay; desligado por padrão. Segmentos além de ARCHIVE_MAX_BYTES
+# ou mais velhos que ARCHIVE_RETENCAO_DIAS (0 = sem limite) são apagados, do mais antigo para o mais novo
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", PROJECT_ROOT / "archive"))
+ARCHIVE_SEGMENT_BYTES = int(os.getenv("ARCHIVE_SEGMENT_BYTES", 64 * 1024 * 1024))
+ARCHIVE_MAX_BYTES = int(os.getenv("ARCHIVE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+ARCHIVE_RETENCAO_DIAS = float(os.getenv("ARCHIVE_RETENCAO_DIAS", 30))
 
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 LOG_FILE = LOG_DIR / "ml_crawler.log"
@@ -157,12 +207,28 @@ LOG_FILE = LOG_DIR / "ml_crawler.log"
 SCHEDULE_CRON = "*/10 * * * *"
 SCHEDULE_TIMEZONE = "America/Sao_Paulo"
 
+# Categorias coletadas ao mesmo tempo pelo flow agendado (todas dividem o token bucket de cada host)
+# e segundos que um ciclo tem para buscar páginas, abaixo do intervalo do agendamento
+CATEGORIAS_CONCORRENTES = int(os.getenv("CATEGORIAS_CONCORRENTES", 4))
+COLETA_PRAZO = float(os.getenv("COLETA_PRAZO", 8 * 60))
+
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "ml_crawler")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
 
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 20))
+
+# Granularidade das partições de precos_historico ("day", "week", "month" ou "year")
+# e quantos períodos à frente ficam criados
+HISTORICO_PARTICAO = os.getenv("HISTORICO_PARTICAO", "month").lower()
+HISTORICO_PARTICOES_FUTURAS = int(os.getenv("HISTORICO_PARTICOES_FUTURAS", 2))
+
+# work_mem da transação de importação em massa: as ordenações do merge cabem em memória
+IMPORTACAO_WORK_MEM = os.getenv("IMPORTACAO_WORK_MEM", "256MB")
+
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 ECHO_SQL = False
 
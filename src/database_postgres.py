@@ -1,14 +1,20 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
-from datetime import datetime
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from datetime import datetime, timedelta
+from itertools import islice
 from pathlib import Path
+import atexit
+import csv
+import io
 import logging
 import os
-from typing import List, Optional, Dict
-import streamlit as st
+import re
+import threading
+from typing import Iterable, List, Optional, Dict, Tuple
 
-from .config import LOG_DIR
+from .config import LOG_DIR, DB_POOL_MIN, DB_POOL_MAX, HISTORICO_PARTICAO, HISTORICO_PARTICOES_FUTURAS, \
+    IMPORTACAO_WORK_MEM
 from .models import Produto, PrecosHistorico, RelatorioColeta
 
 logging.basicConfig(
@@ -21,11 +27,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Colunas aceitas na carga em massa (importar_produtos), na ordem do COPY
+CAMPOS_IMPORTACAO = ("nome", "link", "categoria", "produto_id_ml", "preco", "preco_original",
+                     "percentual_desconto", "imagem_url", "visto_em")
+
+# Espaço livre nas partições do histórico: estender o intervalo atual (valido_ate/observacoes, sem índice)
+# vira update HOT, sem entradas novas nos índices
+FILLFACTOR_HISTORICO = 90
+
+LIMITES_PARTICAO = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def proximo_limite_particao(inicio: datetime, granularidade: str = HISTORICO_PARTICAO) -> datetime:
+    dia = datetime(inicio.year, inicio.month, inicio.day)
+    if granularidade == "day":
+        return dia + timedelta(days=1)
+    if granularidade == "week":
+        return dia - timedelta(days=dia.weekday()) + timedelta(weeks=1)
+    if granularidade == "month":
+        return datetime(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+    if granularidade == "year":
+        return datetime(inicio.year + 1, 1, 1)
+    raise ValueError(f"Granularidade de partição inválida: {granularidade}")
+
+
+def inicio_particao(momento: datetime, granularidade: str = HISTORICO_PARTICAO) -> datetime:
+    dia = datetime(momento.year, momento.month, momento.day)
+    if granularidade == "day":
+        return dia
+    if granularidade == "week":
+        return dia - timedelta(days=dia.weekday())
+    if granularidade == "month":
+        return datetime(momento.year, momento.month, 1)
+    if granularidade == "year":
+        return datetime(momento.year, 1, 1)
+    raise ValueError(f"Granularidade de partição inválida: {granularidade}")
+
 
 class DatabasePostgres:
-    def __init__(self):
+    def __init__(self, minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX):
+        # O pool só é criado na primeira conexão pedida
         self.pool = None
-        self.init_connection_pool()
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self._lock = threading.Lock()
+        # ThreadedConnectionPool levanta PoolError quando esgota; o semáforo faz a thread esperar uma conexão livre
+        self._vagas = threading.BoundedSemaphore(maxconn)
+        self._schema_lock = threading.Lock()
+        self._schema_pronto = False
     
     @staticmethod
     def get_db_config():
@@ -73,144 +122,607 @@ class DatabasePostgres:
 
     
     def init_connection_pool(self):
-        try:
-            config = self.get_db_config()
-            self.pool = SimpleConnectionPool(1, 20, **config)
-            logger.info("✅ Pool de conexões criado")
-        except Exception as e:
-            logger.error(f"❌ Erro ao criar pool: {e}")
-            raise
+        with self._lock:
+            if self.pool:
+                return self.pool
+            try:
+                config = self.get_db_config()
+                self.pool = ThreadedConnectionPool(self.minconn, self.maxconn, **config)
+                logger.info(f"✅ Pool de conexões criado ({self.minconn}-{self.maxconn})")
+            except Exception as e:
+                logger.error(f"❌ Erro ao criar pool: {e}")
+                raise
+            return self.pool
     
     def get_connection(self):
-        if not self.pool:
-            self.init_connection_pool()
-        return self.pool.getconn()
+        pool = self.pool or self.init_connection_pool()
+        self._vagas.acquire()
+        try:
+            conn = pool.getconn()
+            if conn.closed:
+                # Conexão derrubada pelo servidor enquanto estava no pool: descarta e abre outra
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+            return conn
+        except Exception:
+            self._vagas.release()
+            raise
     
     def release_connection(self, conn):
-        if self.pool:
-            self.pool.putconn(conn)
+        # putconn faz rollback de transação pendente e fecha conexões em estado desconhecido
+        try:
+            if self.pool:
+                self.pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._vagas.release()
+    
+    def verificar_saude(self, tentativas: int = 2) -> bool:
+        # Uma conexão que o servidor derrubou só falha no uso; ela é descartada e a próxima tentativa usa outra
+        erro = None
+        for _ in range(tentativas):
+            try:
+                conn = self.get_connection()
+            except Exception as e:
+                erro = e
+                continue
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+                return True
+            except psycopg2.Error as e:
+                erro = e
+            finally:
+                self.release_connection(conn)
+        logger.error(f"❌ Banco indisponível: {erro}")
+        return False
+    
+    def garantir_schema(self):
+        # DDL uma vez por processo, em vez de a cada get_database()
+        with self._schema_lock:
+            if not self._schema_pronto:
+                self.initialize_db()
+                self.garantir_particoes_historico()
+                self._schema_pronto = True
     
     def initialize_db(self):
+        # O schema vive em src/migrations/; aqui só se aplicam as migrações ainda pendentes
+        from .migrate import aplicar_migracoes
+        
+        try:
+            aplicadas = aplicar_migracoes()
+        except Exception as e:
+            logger.error(f"❌ Erro ao inicializar BD: {e}")
+            raise
+        
+        if aplicadas:
+            logger.info(f"✅ Banco de dados PostgreSQL inicializado (migrações {aplicadas})")
+    
+    def _particoes_historico(self, cursor) -> List[Tuple[str, datetime, datetime]]:
+        cursor.execute("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'precos_historico'::regclass
+        """)
+        particoes = []
+        for nome, limites in cursor.fetchall():
+            match = LIMITES_PARTICAO.search(limites or "")
+            if match:
+                particoes.append((nome, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+        return sorted(particoes, key=lambda p: p[1])
+    
+    def _particao_padrao(self, cursor) -> Optional[str]:
+        cursor.execute("""
+            SELECT partdefid::regclass::text FROM pg_partitioned_table
+            WHERE partrelid = 'precos_historico'::regclass AND partdefid <> 0
+        """)
+        linha = cursor.fetchone()
+        return linha[0] if linha else None
+    
+    def _criar_particoes_historico(self, cursor, desde: Optional[datetime] = None,
+                                   ate: Optional[datetime] = None) -> List[str]:
+        # Partições contíguas a partir do fim da última existente até HISTORICO_PARTICOES_FUTURAS períodos à frente
+        # (ou até `ate`). Começar do fim da última evita sobreposição e buracos mesmo se a granularidade mudar.
+        # `desde` cria também as anteriores à primeira partição, para cargas de histórico antigo.
+        # Linhas na partição padrão (dados da migração 0004, gravações fora das faixas) também ganham faixa.
+        padrao = self._particao_padrao(cursor)
+        if padrao:
+            cursor.execute(f"SELECT min(data), max(data) FROM {padrao}")
+            minimo, maximo = cursor.fetchone()
+            if minimo:
+                desde = min(desde or minimo, minimo)
+                ate = max(ate or maximo, maximo)
+        
+        particoes = self._particoes_historico(cursor)
+        cursor.execute("SELECT LOCALTIMESTAMP")
+        agora = cursor.fetchone()[0]
+        
+        horizonte = agora
+        for _ in range(HISTORICO_PARTICOES_FUTURAS):
+            horizonte = proximo_limite_particao(horizonte)
+        if ate:
+            horizonte = max(horizonte, ate)
+        
+        faixas = []
+        if particoes and desde and desde < particoes[0][1]:
+            inicio = inicio_particao(desde)
+            while inicio < particoes[0][1]:
+                fim = min(proximo_limite_particao(inicio), particoes[0][1])
+                faixas.append((inicio, fim))
+                inicio = fim
+        
+        inicio = particoes[-1][2] if particoes else inicio_particao(min(desde or agora, agora))
+        while inicio <= horizonte:
+            fim = proximo_limite_particao(inicio)
+            faixas.append((inicio, fim))
+            inicio = fim
+        
+        criadas = []
+        for inicio, fim in faixas:
+            nome = f"precos_historico_p{inicio:%Y%m%d}"
+            movidas = self._mover_da_padrao(cursor, padrao, inicio, fim) if padrao else None
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {nome}
+                PARTITION OF precos_historico FOR VALUES FROM (%s) TO (%s)
+                WITH (fillfactor = {FILLFACTOR_HISTORICO})
+            """, (inicio, fim))
+            if movidas:
+                # Direto na partição: os triggers do resumo diário são da tabela particionada e não contam de novo
+                cursor.execute(f"INSERT INTO {nome} SELECT * FROM {movidas}")
+                cursor.execute(f"DROP TABLE {movidas}")
+            criadas.append(nome)
+        return criadas
+    
+    def _mover_da_padrao(self, cursor, padrao: str, inicio: datetime, fim: datetime) -> Optional[str]:
+        # Uma faixa não pode ser criada com linhas dela na partição padrão: saem para uma tabela temporária
+        # e voltam para a partição nova depois de criada
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {padrao} WHERE data >= %s AND data < %s)", (inicio, fim))
+        if not cursor.fetchone()[0]:
+            return None
+        cursor.execute("CREATE TEMP TABLE historico_movido (LIKE precos_historico) ON COMMIT DROP")
+        cursor.execute(f"""
+            WITH movidas AS (DELETE FROM {padrao} WHERE data >= %s AND data < %s RETURNING *)
+            INSERT INTO historico_movido SELECT * FROM movidas
+        """, (inicio, fim))
+        return "historico_movido"
+    
+    def garantir_particoes_historico(self, desde: Optional[datetime] = None) -> List[str]:
         conn = self.get_connection()
         try:
-            cursor = conn.cursor()
+            criadas = self._criar_particoes_historico(conn.cursor(), desde=desde)
+            conn.commit()
+            if criadas:
+                logger.info(f"🧱 Partições de histórico criadas: {', '.join(criadas)}")
+            return criadas
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release_connection(conn)
+    
+    def _upsert_produtos(self, cursor, categoria: str, produtos: List[Dict]) -> Dict[str, int]:
+        linhas_com_id = []
+        linhas_sem_id = []
+        vistos = set()
+        
+        for prod in produtos:
+            try:
+                produto = Produto(categoria=categoria, **prod)
+            except ValueError as e:
+                logger.warning(f"⚠️ Produto inválido ignorado ({prod.get('link')}): {e}")
+                continue
             
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS produtos (
-                    id SERIAL PRIMARY KEY,
-                    nome TEXT NOT NULL UNIQUE,
-                    link TEXT NOT NULL UNIQUE,
-                    categoria TEXT NOT NULL,
-                    produto_id_ml TEXT,
-                    preco_atual NUMERIC(10, 2),
-                    preco_original NUMERIC(10, 2),
-                    percentual_desconto NUMERIC(5, 2),
-                    imagem_url TEXT,
-                    primeira_coleta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ultima_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            chaves = {("link", produto.link), ("nome", produto.nome)}
+            if produto.produto_id_ml:
+                chaves.add(("id", produto.produto_id_ml))
+            if vistos & chaves:
+                continue
+            vistos |= chaves
+            
+            linha = (produto.nome, produto.link, produto.categoria, produto.produto_id_ml,
+                     produto.preco, produto.preco_original, produto.percentual_desconto, produto.imagem_url)
+            if produto.produto_id_ml:
+                linhas_com_id.append(linha)
+            else:
+                linhas_sem_id.append(linha)
+        
+        # identidades: produto_id_ml (ou link) → (id, preco_atual, preco_original, percentual_desconto,
+        # imagem_url) como ficaram no banco, só para as linhas gravadas ou confirmadas; alimenta o IdentityMap
+        resultado = {"novos": 0, "atualizados": 0, "inalterados": 0, "ids": [], "identidades": {}}
+        
+        for linhas, conflito, outro_dono in (
+            (linhas_com_id, "produto_id_ml",
+             "(p.nome = d.nome OR p.link = d.link) AND p.produto_id_ml IS DISTINCT FROM d.produto_id_ml"),
+            (linhas_sem_id, "link",
+             "p.nome = d.nome AND p.link <> d.link"),
+        ):
+            if not linhas:
+                continue
+            
+            marcadores = execute_values(cursor, f"""
+                WITH dados (nome, link, categoria, produto_id_ml, preco, preco_original, percentual_desconto, imagem_url) AS (
+                    VALUES %s
+                ),
+                upsert AS (
+                    INSERT INTO produtos (nome, link, categoria, produto_id_ml, preco_atual, preco_original, percentual_desconto, imagem_url)
+                    SELECT d.nome, d.link, d.categoria, d.produto_id_ml, d.preco, d.preco_original, d.percentual_desconto, d.imagem_url
+                    FROM dados d
+                    WHERE NOT EXISTS (SELECT 1 FROM produtos p WHERE {outro_dono})
+                      -- Sem mudança a linha nem chega ao ON CONFLICT, que bloquearia (e gravaria no WAL) a linha
+                      AND NOT EXISTS (
+                          SELECT 1 FROM produtos igual
+                          WHERE igual.{conflito} = d.{conflito}
+                            AND (igual.preco_atual, igual.preco_original, igual.percentual_desconto, igual.imagem_url)
+                                IS NOT DISTINCT FROM
+                                (d.preco, COALESCE(d.preco_original, igual.preco_original),
+                                 COALESCE(d.percentual_desconto, igual.percentual_desconto),
+                                 COALESCE(d.imagem_url, igual.imagem_url))
+                      )
+                    ON CONFLICT ({conflito}) DO UPDATE SET
+                        preco_atual = EXCLUDED.preco_atual,
+                        preco_original = COALESCE(EXCLUDED.preco_original, produtos.preco_original),
+                        percentual_desconto = COALESCE(EXCLUDED.percentual_desconto, produtos.percentual_desconto),
+                        imagem_url = COALESCE(EXCLUDED.imagem_url, produtos.imagem_url),
+                        ultima_atualizacao = CURRENT_TIMESTAMP
+                    -- Repete a comparação para linhas gravadas por outra transação depois do nosso snapshot
+                    WHERE (produtos.preco_atual, produtos.preco_original, produtos.percentual_desconto, produtos.imagem_url)
+                          IS DISTINCT FROM
+                          (EXCLUDED.preco_atual, COALESCE(EXCLUDED.preco_original, produtos.preco_original),
+                           COALESCE(EXCLUDED.percentual_desconto, produtos.percentual_desconto),
+                           COALESCE(EXCLUDED.imagem_url, produtos.imagem_url))
+                    RETURNING id, (xmax = 0) AS inserido, {conflito} AS chave, preco_atual, preco_original,
+                              percentual_desconto, imagem_url
                 )
-            """)
+                SELECT id, inserido, TRUE AS alterado, chave, preco_atual::float8, preco_original::float8,
+                       percentual_desconto::float8, imagem_url
+                FROM upsert
+                UNION ALL
+                -- Inalterados: o id, para o histórico e produtos_vistos em finalizar_coleta, e os valores atuais
+                SELECT atual.id, FALSE, FALSE, atual.{conflito}, atual.preco_atual::float8, atual.preco_original::float8,
+                       atual.percentual_desconto::float8, atual.imagem_url
+                FROM dados d
+                JOIN produtos atual ON atual.{conflito} = d.{conflito}
+                WHERE NOT EXISTS (SELECT 1 FROM upsert u WHERE u.chave = d.{conflito})
+                  AND NOT EXISTS (SELECT 1 FROM produtos p WHERE {outro_dono})
+            """, linhas,
+                template="(%s, %s, %s, %s, %s::numeric(10, 2), %s::numeric(10, 2), %s::numeric(5, 2), %s)",
+                page_size=len(linhas), fetch=True)
             
+            for produto_id, inserido, alterado, chave, *valores in marcadores:
+                resultado["novos" if inserido else "atualizados" if alterado else "inalterados"] += 1
+                resultado["ids"].append(produto_id)
+                resultado["identidades"][chave] = (produto_id, *valores)
+        
+        return resultado
+    
+    def importar_produtos(self, produtos: Iterable[Dict], categoria: Optional[str] = None,
+                          tamanho_bloco: int = 100000) -> Dict[str, int]:
+        # Carga em massa: COPY FROM STDIN para uma tabela temporária (sem WAL, só desta sessão), em blocos
+        # montados em memória, e uma única instrução que faz o merge em produtos e precos_historico.
+        # Cada linha é uma observação (CAMPOS_IMPORTACAO); visto_em ausente vale como agora. visto_em com fuso
+        # (ex.: a data UTC de um registro WARC) é convertido para o horário local do banco; sem fuso, já é local.
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT set_config('work_mem', %s, true)", (IMPORTACAO_WORK_MEM,))
             cursor.execute("""
-                ALTER TABLE produtos 
-                ADD COLUMN IF NOT EXISTS preco_original NUMERIC(10, 2),
-                ADD COLUMN IF NOT EXISTS percentual_desconto NUMERIC(5, 2),
-                ADD COLUMN IF NOT EXISTS imagem_url TEXT
+                CREATE TEMP TABLE importacao (
+                    nome TEXT, link TEXT, categoria TEXT, produto_id_ml TEXT, preco NUMERIC(10, 2),
+                    preco_original NUMERIC(10, 2), percentual_desconto NUMERIC(5, 2), imagem_url TEXT,
+                    visto_em TIMESTAMPTZ
+                ) ON COMMIT DROP
             """)
             
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS precos_historico (
-                    id SERIAL PRIMARY KEY,
-                    produto_id INTEGER NOT NULL,
-                    preco NUMERIC(10, 2) NOT NULL,
-                    data TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (produto_id) REFERENCES produtos(id) ON DELETE CASCADE
+            linhas = 0
+            produtos = iter(produtos)
+            while True:
+                bloco = list(islice(produtos, tamanho_bloco))
+                if not bloco:
+                    break
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(
+                    tuple(p.get(campo) for campo in CAMPOS_IMPORTACAO) for p in bloco
                 )
-            """)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY importacao ({', '.join(CAMPOS_IMPORTACAO)}) FROM STDIN WITH (FORMAT csv)",
+                                   buffer)
+                linhas += len(bloco)
             
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS coletas (
-                    id SERIAL PRIMARY KEY,
-                    categoria TEXT NOT NULL,
-                    data_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    data_fim TIMESTAMP,
-                    total_produtos INTEGER,
-                    total_novos INTEGER DEFAULT 0,
-                    total_atualizados INTEGER DEFAULT 0,
-                    status TEXT DEFAULT 'em_progresso',
-                    mensagem_erro TEXT
-                )
-            """)
+            resultado = {"linhas": linhas, "validas": 0, "novos": 0, "atualizados": 0, "historicos": 0, "estendidos": 0}
+            if not linhas:
+                conn.commit()
+                return resultado
             
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_categoria 
-                ON produtos(categoria)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_produto_id 
-                ON precos_historico(produto_id)
-            """)
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_data 
-                ON precos_historico(data)
-            """)
+                UPDATE importacao SET
+                    categoria = COALESCE(NULLIF(categoria, ''), %s),
+                    visto_em = COALESCE(visto_em, CURRENT_TIMESTAMP)
+            """, (categoria,))
+            cursor.execute("SELECT min(visto_em)::timestamp, max(visto_em)::timestamp FROM importacao")
+            self._criar_particoes_historico(cursor, *cursor.fetchone())
+            cursor.execute("ANALYZE importacao")
+            
+            # Mesmas regras do upsert de gravar_paginas. Por produto vale a observação mais recente, e só se não for
+            # mais antiga que a última vez que o produto foi visto (produtos_vistos). O histórico recebe as
+            # observações posteriores ao último intervalo do produto: sequências de preço igual viram um
+            # intervalo, e a primeira estende o intervalo atual quando o preço não mudou.
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_coleta_categoria 
-                ON coletas(categoria)
+                WITH base AS (
+                    SELECT i.nome, i.link, i.categoria, i.produto_id_ml, i.preco, i.preco_original,
+                           i.percentual_desconto, i.imagem_url, i.visto_em::timestamp AS visto_em,
+                           COALESCE(i.produto_id_ml, i.link) AS chave
+                    FROM importacao i
+                    WHERE i.preco > 0 AND btrim(i.nome) <> '' AND i.link LIKE 'http%%' AND i.categoria IS NOT NULL
+                ),
+                ultimos AS (
+                    SELECT * FROM (
+                        SELECT d.*,
+                               row_number() OVER (PARTITION BY d.link ORDER BY d.visto_em DESC) AS por_link,
+                               row_number() OVER (PARTITION BY d.nome ORDER BY d.visto_em DESC) AS por_nome
+                        FROM (
+                            SELECT DISTINCT ON (chave) b.*, min(b.visto_em) OVER (PARTITION BY chave) AS primeira
+                            FROM base b
+                            ORDER BY chave, visto_em DESC
+                        ) d
+                    ) u
+                    WHERE por_link = 1 AND por_nome = 1
+                ),
+                com_id AS (
+                    INSERT INTO produtos (nome, link, categoria, produto_id_ml, preco_atual, preco_original,
+                                          percentual_desconto, imagem_url, primeira_coleta, ultima_atualizacao)
+                    SELECT d.nome, d.link, d.categoria, d.produto_id_ml, d.preco, d.preco_original,
+                           d.percentual_desconto, d.imagem_url, d.primeira, d.visto_em
+                    FROM ultimos d
+                    WHERE d.produto_id_ml IS NOT NULL
+                      -- Dois NOT EXISTS em vez de um com OR: cada um usa o índice único de nome/link
+                      AND NOT EXISTS (SELECT 1 FROM produtos p WHERE p.nome = d.nome
+                                      AND p.produto_id_ml IS DISTINCT FROM d.produto_id_ml)
+                      AND NOT EXISTS (SELECT 1 FROM produtos p WHERE p.link = d.link
+                                      AND p.produto_id_ml IS DISTINCT FROM d.produto_id_ml)
+                    ON CONFLICT (produto_id_ml) DO UPDATE SET
+                        preco_atual = EXCLUDED.preco_atual,
+                        preco_original = COALESCE(EXCLUDED.preco_original, produtos.preco_original),
+                        percentual_desconto = COALESCE(EXCLUDED.percentual_desconto, produtos.percentual_desconto),
+                        imagem_url = COALESCE(EXCLUDED.imagem_url, produtos.imagem_url),
+                        ultima_atualizacao = CASE
+                            WHEN (produtos.preco_atual, produtos.preco_original, produtos.percentual_desconto,
+                                  produtos.imagem_url)
+                                 IS DISTINCT FROM
+                                 (EXCLUDED.preco_atual, COALESCE(EXCLUDED.preco_original, produtos.preco_original),
+                                  COALESCE(EXCLUDED.percentual_desconto, produtos.percentual_desconto),
+                                  COALESCE(EXCLUDED.imagem_url, produtos.imagem_url))
+                            THEN EXCLUDED.ultima_atualizacao ELSE produtos.ultima_atualizacao END
+                    WHERE COALESCE(GREATEST(produtos.ultima_atualizacao,
+                                            (SELECT v.visto_em FROM produtos_vistos v WHERE v.produto_id = produtos.id))
+                                   <= EXCLUDED.ultima_atualizacao, TRUE)
+                    RETURNING id, produto_id_ml AS chave, (xmax = 0) AS inserido
+                ),
+                sem_id AS (
+                    INSERT INTO produtos (nome, link, categoria, produto_id_ml, preco_atual, preco_original,
+                                          percentual_desconto, imagem_url, primeira_coleta, ultima_atualizacao)
+                    SELECT d.nome, d.link, d.categoria, d.produto_id_ml, d.preco, d.preco_original,
+                           d.percentual_desconto, d.imagem_url, d.primeira, d.visto_em
+                    FROM ultimos d
+                    WHERE d.produto_id_ml IS NULL
+                      AND NOT EXISTS (SELECT 1 FROM produtos p WHERE p.nome = d.nome AND p.link <> d.link)
+                    ON CONFLICT (link) DO UPDATE SET
+                        preco_atual = EXCLUDED.preco_atual,
+                        preco_original = COALESCE(EXCLUDED.preco_original, produtos.preco_original),
+                        percentual_desconto = COALESCE(EXCLUDED.percentual_desconto, produtos.percentual_desconto),
+                        imagem_url = COALESCE(EXCLUDED.imagem_url, produtos.imagem_url),
+                        ultima_atualizacao = CASE
+                            WHEN (produtos.preco_atual, produtos.preco_original, produtos.percentual_desconto,
+                                  produtos.imagem_url)
+                                 IS DISTINCT FROM
+                                 (EXCLUDED.preco_atual, COALESCE(EXCLUDED.preco_original, produtos.preco_original),
+                                  COALESCE(EXCLUDED.percentual_desconto, produtos.percentual_desconto),
+                                  COALESCE(EXCLUDED.imagem_url, produtos.imagem_url))
+                            THEN EXCLUDED.ultima_atualizacao ELSE produtos.ultima_atualizacao END
+                    WHERE COALESCE(GREATEST(produtos.ultima_atualizacao,
+                                            (SELECT v.visto_em FROM produtos_vistos v WHERE v.produto_id = produtos.id))
+                                   <= EXCLUDED.ultima_atualizacao, TRUE)
+                    RETURNING id, link AS chave, (xmax = 0) AS inserido
+                ),
+                gravados AS (
+                    SELECT * FROM com_id UNION ALL SELECT * FROM sem_id
+                ),
+                vistos AS (
+                    INSERT INTO produtos_vistos (produto_id, visto_em)
+                    SELECT g.id, max(b.visto_em)
+                    FROM base b
+                    JOIN gravados g ON g.chave = b.chave
+                    GROUP BY g.id
+                    ON CONFLICT (produto_id) DO UPDATE SET visto_em = EXCLUDED.visto_em
+                    WHERE produtos_vistos.visto_em < EXCLUDED.visto_em
+                ),
+                atual AS (
+                    SELECT g.id AS produto_id, h.id AS historico_id, h.data, h.preco, h.valido_ate
+                    FROM gravados g
+                    LEFT JOIN LATERAL (
+                        SELECT u.id, u.data, u.preco, u.valido_ate
+                        FROM precos_historico u
+                        WHERE u.produto_id = g.id
+                        ORDER BY u.data DESC
+                        LIMIT 1
+                    ) h ON TRUE
+                ),
+                marcadas AS (
+                    SELECT g.id AS produto_id, b.preco, b.visto_em,
+                           (COALESCE(lag(b.preco) OVER w, a.preco) IS DISTINCT FROM b.preco)::int AS abre
+                    FROM base b
+                    JOIN gravados g ON g.chave = b.chave
+                    JOIN atual a ON a.produto_id = g.id
+                    WHERE a.valido_ate IS NULL OR b.visto_em > a.valido_ate
+                    WINDOW w AS (PARTITION BY g.id ORDER BY b.visto_em)
+                ),
+                intervalos AS (
+                    SELECT produto_id, grupo, min(preco) AS preco, min(visto_em) AS data,
+                           max(visto_em) AS valido_ate, count(*) AS observacoes
+                    FROM (
+                        SELECT m.*, sum(abre) OVER (PARTITION BY produto_id ORDER BY visto_em) AS grupo
+                        FROM marcadas m
+                    ) x
+                    GROUP BY produto_id, grupo
+                ),
+                estendidos AS (
+                    UPDATE precos_historico h
+                    SET valido_ate = i.valido_ate, observacoes = h.observacoes + i.observacoes
+                    FROM intervalos i
+                    JOIN atual a ON a.produto_id = i.produto_id
+                    WHERE i.grupo = 0 AND h.id = a.historico_id AND h.data = a.data
+                    RETURNING 1
+                ),
+                novos_intervalos AS (
+                    INSERT INTO precos_historico (produto_id, preco, data, valido_ate, observacoes)
+                    SELECT produto_id, preco, data, valido_ate, observacoes
+                    FROM intervalos
+                    WHERE grupo > 0
+                    RETURNING 1
+                )
+                SELECT (SELECT count(*) FROM base),
+                       (SELECT count(*) FROM gravados WHERE inserido),
+                       (SELECT count(*) FROM gravados WHERE NOT inserido),
+                       (SELECT count(*) FROM novos_intervalos),
+                       (SELECT count(*) FROM estendidos)
             """)
-            
+            (resultado["validas"], resultado["novos"], resultado["atualizados"],
+             resultado["historicos"], resultado["estendidos"]) = cursor.fetchone()
             conn.commit()
-            logger.info("✅ Banco de dados PostgreSQL inicializado")
-            
+            logger.info(f"📥 Importação: {linhas} linhas, {resultado['novos']} novos, {resultado['atualizados']} atualizados, "
+                        f"{resultado['historicos']} intervalos de histórico")
+            return resultado
         except Exception as e:
             conn.rollback()
-            logger.error(f"❌ Erro ao inicializar BD: {e}")
+            logger.error(f"❌ Erro na importação em massa: {e}")
             raise
         finally:
             self.release_connection(conn)
     
-    def adicionar_produto(self, produto: Produto) -> Optional[int]:
+    def obter_fingerprint_pagina(self, categoria: str, pagina: int) -> Optional[Dict]:
         conn = self.get_connection()
         try:
-            cursor = conn.cursor()
-            
-            if produto.produto_id_ml:
-                cursor.execute(
-                    "SELECT id FROM produtos WHERE produto_id_ml = %s",
-                    (produto.produto_id_ml,)
-                )
-                resultado = cursor.fetchone()
-                if resultado:
-                    produto_id = resultado[0]
-                    logger.warning(f"⚠️ Produto duplicado (ID ML: {produto.produto_id_ml}): {produto.nome}")
-                    return produto_id
-            
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute("""
-                INSERT INTO produtos (nome, link, categoria, preco_atual, preco_original, percentual_desconto, imagem_url, produto_id_ml)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (produto.nome, produto.link, produto.categoria, produto.preco, 
-                  produto.preco_original, produto.percentual_desconto, produto.imagem_url, produto.produto_id_ml))
-            
-            produto_id = cursor.fetchone()[0]
+                SELECT hash_conteudo, hash_produtos, total_produtos, atualizado_em
+                FROM paginas_fingerprint
+                WHERE categoria = %s AND pagina = %s
+            """, (categoria, pagina))
+            return cursor.fetchone()
+        finally:
+            self.release_connection(conn)
+    
+    def obter_fingerprints_categoria(self, categoria: str) -> Dict[int, Dict]:
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("""
+                SELECT pagina, hash_conteudo, hash_produtos, total_produtos, atualizado_em
+                FROM paginas_fingerprint
+                WHERE categoria = %s
+            """, (categoria,))
+            return {row.pop("pagina"): row for row in cursor.fetchall()}
+        finally:
+            self.release_connection(conn)
+
+    def carregar_identidades(self, categoria: str, itersize: int = 5000) -> Dict[str, Tuple]:
+        # Chave da página (produto_id_ml, ou link sem ele) → (id, preco_atual, preco_original,
+        # percentual_desconto, imagem_url). Cursor nomeado: as linhas chegam do servidor em blocos,
+        # e viram tuplas de float em vez de RealDictRow com Decimal.
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor(name="identidades")
+            cursor.itersize = itersize
+            cursor.execute("""
+                SELECT COALESCE(produto_id_ml, link), id, preco_atual::float8, preco_original::float8,
+                       percentual_desconto::float8, imagem_url
+                FROM produtos
+                WHERE categoria = %s
+            """, (categoria,))
+            identidades = {chave: tuple(valores) for chave, *valores in cursor}
+            cursor.close()
             conn.commit()
-            logger.info(f"✅ Produto adicionado: {produto.nome} (ID: {produto_id})")
-            return produto_id
-            
-        except psycopg2.IntegrityError:
+            return identidades
+        except Exception:
             conn.rollback()
-            logger.warning(f"⚠️ Produto duplicado (por constraint): {produto.nome}")
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM produtos WHERE link = %s", (produto.link,))
-            resultado = cursor.fetchone()
-            return resultado[0] if resultado else None
+            raise
+        finally:
+            self.release_connection(conn)
+
+    def _salvar_fingerprint_pagina(self, cursor, categoria: str, pagina: int, hash_conteudo: str,
+                                   hash_produtos: str, produto_ids: List[int], total_produtos: int):
+        cursor.execute("""
+            INSERT INTO paginas_fingerprint (categoria, pagina, hash_conteudo, hash_produtos, produto_ids, total_produtos)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (categoria, pagina) DO UPDATE SET
+                hash_conteudo = EXCLUDED.hash_conteudo,
+                hash_produtos = EXCLUDED.hash_produtos,
+                produto_ids = EXCLUDED.produto_ids,
+                total_produtos = EXCLUDED.total_produtos,
+                atualizado_em = CURRENT_TIMESTAMP
+        """, (categoria, pagina, hash_conteudo, hash_produtos, produto_ids, total_produtos))
+    
+    def tocar_pagina(self, categoria: str, pagina: int, hash_conteudo: str) -> List[int]:
+        conn = self.get_connection()
+        try:
+            tocados = self._tocar_pagina(conn.cursor(), categoria, pagina, hash_conteudo)
+            conn.commit()
+            return tocados
         except Exception as e:
             conn.rollback()
-            logger.error(f"❌ Erro ao adicionar produto: {e}")
-            return None
+            logger.error(f"❌ Erro ao atualizar página inalterada: {e}")
+            raise
         finally:
             self.release_connection(conn)
     
+    def _tocar_pagina(self, cursor, categoria: str, pagina: int, hash_conteudo: str) -> List[int]:
+        cursor.execute("""
+            UPDATE paginas_fingerprint
+            SET hash_conteudo = %s, atualizado_em = CURRENT_TIMESTAMP
+            WHERE categoria = %s AND pagina = %s
+            RETURNING produto_ids
+        """, (hash_conteudo, categoria, pagina))
+        # Os ids voltam para a coleta: produtos vistos no mesmo preço estendem o intervalo do histórico e
+        # são marcados como vistos em finalizar_coleta; a página inalterada não escreve em produtos
+        linha = cursor.fetchone()
+        return list(linha[0] or []) if linha else []
+    
+    def gravar_paginas(self, paginas: List[Dict], conn=None) -> List[Dict]:
+        # Várias páginas (planejadas por scraper.planejar_pagina) em uma transação só: um commit por lote.
+        # Com `conn`, usa a conexão de quem chama (ex.: a thread do write-behind) em vez de uma do pool.
+        propria = conn is None
+        if propria:
+            conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            contagens = []
+            for pagina in paginas:
+                if pagina["tipo"] == "tocar":
+                    ids = self._tocar_pagina(cursor, pagina["categoria"], pagina["pagina"], pagina["hash_conteudo"])
+                    contagem = {"novos": 0, "atualizados": 0, "inalterados": pagina["total"], "ids": ids}
+                else:
+                    contagem = self._upsert_produtos(cursor, pagina["categoria"], pagina["produtos"])
+                    # Produtos que o IdentityMap já sabia inalterados: nada a gravar, só os ids
+                    inalterados = pagina.get("inalterados", [])
+                    contagem["ids"].extend(inalterados)
+                    contagem["inalterados"] += len(inalterados)
+                    if pagina["pagina"]:
+                        self._salvar_fingerprint_pagina(cursor, pagina["categoria"], pagina["pagina"],
+                                                        pagina["hash_conteudo"], pagina["hash_produtos"],
+                                                        contagem["ids"], pagina["total"])
+                contagem["total"] = pagina["total"]
+                contagens.append(contagem)
+            conn.commit()
+            return contagens
+        except Exception as e:
+            if not conn.closed:
+                conn.rollback()
+            logger.error(f"❌ Erro ao gravar {len(paginas)} página(s): {e}")
+            raise
+        finally:
+            if propria:
+                self.release_connection(conn)
+    
     def obter_produto_por_link(self, link: str) -> Optional[Dict]:
         conn = self.get_connection()
         try:
@@ -223,13 +735,16 @@ class DatabasePostgres:
         conn = self.get_connection()
         try:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
+            # ultima_atualizacao é a última mudança; "visto por último" vem de produtos_vistos
             cursor.execute("""
-                SELECT id, nome, link, categoria, produto_id_ml, preco_atual, 
-                       preco_original, percentual_desconto, imagem_url,
-                       primeira_coleta, ultima_atualizacao
-                FROM produtos 
-                WHERE categoria = %s 
-                ORDER BY nome
+                SELECT p.id, p.nome, p.link, p.categoria, p.produto_id_ml, p.preco_atual, 
+                       p.preco_original, p.percentual_desconto, p.imagem_url,
+                       p.primeira_coleta, p.ultima_atualizacao,
+                       COALESCE(v.visto_em, p.ultima_atualizacao) AS visto_em
+                FROM produtos p
+                LEFT JOIN produtos_vistos v ON v.produto_id = p.id
+                WHERE p.categoria = %s 
+                ORDER BY p.nome
             """, (categoria,))
             return cursor.fetchall()
         finally:
@@ -246,33 +761,29 @@ class DatabasePostgres:
         try:
             cursor = conn.cursor()
             
-            updates = ["preco_atual = %s", "ultima_atualizacao = CURRENT_TIMESTAMP"]
-            params = [novo_preco]
-            
-            if preco_original is not None:
-                updates.append("preco_original = %s")
-                params.append(preco_original)
-            
-            if percentual_desconto is not None:
-                updates.append("percentual_desconto = %s")
-                params.append(percentual_desconto)
-            
-            if imagem_url is not None:
-                updates.append("imagem_url = %s")
-                params.append(imagem_url)
-            
-            params.append(produto_id)
-            
-            cursor.execute(f"""
-                UPDATE produtos 
-                SET {', '.join(updates)}
-                WHERE id = %s
-            """, tuple(params))
-            
+            # Campos não informados ficam como estão; a linha só é reescrita quando algum valor muda
             cursor.execute("""
-                INSERT INTO precos_historico (produto_id, preco)
-                VALUES (%s, %s)
-            """, (produto_id, novo_preco))
+                WITH novo AS (
+                    SELECT p.id, %s::numeric(10, 2) AS preco_atual,
+                           COALESCE(%s::numeric(10, 2), p.preco_original) AS preco_original,
+                           COALESCE(%s::numeric(5, 2), p.percentual_desconto) AS percentual_desconto,
+                           COALESCE(%s, p.imagem_url) AS imagem_url
+                    FROM produtos p
+                    WHERE p.id = %s
+                )
+                UPDATE produtos p
+                SET preco_atual = n.preco_atual,
+                    preco_original = n.preco_original,
+                    percentual_desconto = n.percentual_desconto,
+                    imagem_url = n.imagem_url,
+                    ultima_atualizacao = CURRENT_TIMESTAMP
+                FROM novo n
+                WHERE p.id = n.id
+                  AND (p.preco_atual, p.preco_original, p.percentual_desconto, p.imagem_url)
+                      IS DISTINCT FROM (n.preco_atual, n.preco_original, n.percentual_desconto, n.imagem_url)
+            """, (novo_preco, preco_original, percentual_desconto, imagem_url, produto_id))
+            self._registrar_precos(cursor, [produto_id])
+            self._marcar_vistos(cursor, [produto_id])
             
             conn.commit()
             logger.info(f"💰 Produto ID {produto_id} atualizado: R$ {novo_preco}")
@@ -287,9 +798,12 @@ class DatabasePostgres:
         conn = self.get_connection()
         try:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
+            # Mais recentes pelo "visto por último" (produtos_vistos), não pela última mudança
             cursor.execute("""
-                SELECT * FROM produtos 
-                ORDER BY ultima_atualizacao DESC 
+                SELECT p.*, COALESCE(v.visto_em, p.ultima_atualizacao) AS visto_em
+                FROM produtos p
+                LEFT JOIN produtos_vistos v ON v.produto_id = p.id
+                ORDER BY visto_em DESC 
                 LIMIT %s
             """, (limite,))
             return cursor.fetchall()
@@ -311,12 +825,76 @@ class DatabasePostgres:
         finally:
             self.release_connection(conn)
     
+    def _registrar_precos(self, cursor, produto_ids: List[int]) -> Tuple[int, int]:
+        # Histórico em intervalos, em duas instruções para o lote inteiro: quem continua no mesmo
+        # preço estende o último intervalo (valido_ate/observacoes); quem mudou abre um intervalo novo
+        cursor.execute("""
+            UPDATE precos_historico h
+            SET valido_ate = CURRENT_TIMESTAMP, observacoes = h.observacoes + 1
+            FROM produtos p
+            CROSS JOIN LATERAL (
+                SELECT u.id, u.data, u.preco
+                FROM precos_historico u
+                WHERE u.produto_id = p.id
+                ORDER BY u.data DESC
+                LIMIT 1
+            ) ultimo
+            WHERE p.id = ANY(%s)
+              AND ultimo.preco = p.preco_atual
+              AND h.id = ultimo.id AND h.data = ultimo.data
+        """, (list(produto_ids),))
+        estendidos = cursor.rowcount
+        
+        cursor.execute("""
+            INSERT INTO precos_historico (produto_id, preco)
+            SELECT p.id, p.preco_atual
+            FROM produtos p
+            LEFT JOIN LATERAL (
+                SELECT h.preco
+                FROM precos_historico h
+                WHERE h.produto_id = p.id
+                ORDER BY h.data DESC
+                LIMIT 1
+            ) ultimo ON TRUE
+            WHERE p.id = ANY(%s)
+              AND p.preco_atual IS NOT NULL
+              AND ultimo.preco IS DISTINCT FROM p.preco_atual
+        """, (list(produto_ids),))
+        return cursor.rowcount, estendidos
+    
+    def _marcar_vistos(self, cursor, produto_ids: List[int]) -> int:
+        # "Visto por último" em produtos_vistos, uma linha estreita por produto e uma instrução por coleta
+        # (visto_em sem índice: update HOT); produtos só é reescrita quando algo muda. UPDATE + INSERT dos
+        # que faltam em vez de ON CONFLICT DO UPDATE, que grava no WAL um lock e um update por linha.
+        ids = list(produto_ids)
+        cursor.execute("""
+            UPDATE produtos_vistos SET visto_em = CURRENT_TIMESTAMP
+            WHERE produto_id = ANY(%s) AND visto_em < CURRENT_TIMESTAMP
+        """, (ids,))
+        marcados = cursor.rowcount
+        cursor.execute("""
+            INSERT INTO produtos_vistos (produto_id, visto_em)
+            SELECT p.id, CURRENT_TIMESTAMP FROM produtos p
+            WHERE p.id = ANY(%s)
+              AND NOT EXISTS (SELECT 1 FROM produtos_vistos v WHERE v.produto_id = p.id)
+            ON CONFLICT (produto_id) DO NOTHING
+        """, (ids,))
+        return marcados + cursor.rowcount
+    
     def finalizar_coleta(self, coleta_id: int, total_produtos: int, 
                         total_novos: int, total_atualizados: int, 
-                        sucesso: bool, erro: Optional[str] = None):
+                        sucesso: bool, erro: Optional[str] = None,
+                        produto_ids: Optional[List[int]] = None) -> int:
         conn = self.get_connection()
         try:
             cursor = conn.cursor()
+            historicos = estendidos = vistos = 0
+            if produto_ids:
+                # Garante a partição do período atual antes de gravar (caso o processo rode há muito tempo)
+                self._criar_particoes_historico(cursor)
+                historicos, estendidos = self._registrar_precos(cursor, produto_ids)
+                vistos = self._marcar_vistos(cursor, produto_ids)
+            
             status = "sucesso" if sucesso else "erro"
             cursor.execute("""
                 UPDATE coletas 
@@ -329,7 +907,13 @@ class DatabasePostgres:
                 WHERE id = %s
             """, (total_produtos, total_novos, total_atualizados, status, erro, coleta_id))
             conn.commit()
-            logger.info(f"✅ Coleta {coleta_id} finalizada: {total_produtos} produtos")
+            logger.info(f"✅ Coleta {coleta_id} finalizada: {total_produtos} produtos, "
+                        f"{historicos} preços novos no histórico, {estendidos} intervalos estendidos, "
+                        f"{vistos} produtos marcados como vistos")
+            return historicos
+        except Exception:
+            conn.rollback()
+            raise
         finally:
             self.release_connection(conn)
     
@@ -346,30 +930,37 @@ class DatabasePostgres:
             if not produto:
                 return None
             
+            # Agregado sobre o resumo diário: um registro por dia, não por observação
             cursor.execute("""
-                SELECT preco, data FROM precos_historico 
-                WHERE produto_id = %s 
-                ORDER BY data
+                SELECT MIN(minima) AS minimo,
+                       MAX(maxima) AS maximo,
+                       SUM(soma) / SUM(observacoes) AS medio,
+                       (array_agg(abertura ORDER BY dia))[1] AS primeiro,
+                       (array_agg(fechamento ORDER BY dia DESC))[1] AS ultimo,
+                       SUM(observacoes) AS total,
+                       MAX(ultima_em) AS ultima_em
+                FROM precos_diarios
+                WHERE produto_id = %s
             """, (produto_id,))
-            historico = cursor.fetchall()
+            resumo = cursor.fetchone()
             
-            if not historico:
+            if not resumo["total"]:
                 return None
             
-            precos = [h['preco'] for h in historico]
+            primeiro, ultimo = resumo["primeiro"], resumo["ultimo"]
             
             return {
                 "produto_id": produto_id,
                 "nome": produto["nome"],
                 "categoria": produto["categoria"],
-                "preco_minimo": float(min(precos)),
-                "preco_maximo": float(max(precos)),
-                "preco_medio": float(sum(precos) / len(precos)),
+                "preco_minimo": float(resumo["minimo"]),
+                "preco_maximo": float(resumo["maximo"]),
+                "preco_medio": float(resumo["medio"]),
                 "preco_atual": float(produto["preco_atual"]),
-                "variacao_percentual": float(((precos[-1] - precos[0]) / precos[0] * 100) if precos[0] > 0 else 0),
-                "total_coletas": len(historico),
+                "variacao_percentual": float(((ultimo - primeiro) / primeiro * 100) if primeiro > 0 else 0),
+                "total_coletas": int(resumo["total"]),
                 "primeira_coleta": produto["primeira_coleta"],
-                "ultima_coleta": historico[-1]["data"] if historico else None
+                "ultima_coleta": resumo["ultima_em"]
             }
         finally:
             self.release_connection(conn)
@@ -413,31 +1004,81 @@ class DatabasePostgres:
         finally:
             self.release_connection(conn)
     
-    def obter_historico_preco(self, produto_id: int, dias: int = 30) -> List[Dict]:
+    def obter_intervalos_preco(self, produto_id: int, dias: int = 30) -> List[Dict]:
+        # Intervalos que tocam a janela; utils.expandir_intervalos converte em pontos para gráficos.
+        # Sem limite em `data`: um intervalo aberto há meses ainda toca a janela, então todas as partições
+        # são consultadas, cada uma pelo índice (produto_id, data) do produto
         conn = self.get_connection()
         try:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute("""
-                SELECT preco, data FROM precos_historico 
-                WHERE produto_id = %s 
-                AND data >= CURRENT_TIMESTAMP - INTERVAL '%s days'
+                SELECT preco, data AS valido_de, valido_ate, observacoes
+                FROM precos_historico
+                WHERE produto_id = %s
+                AND valido_ate >= LOCALTIMESTAMP - make_interval(days => %s)
                 ORDER BY data ASC
             """, (produto_id, dias))
             return cursor.fetchall()
         finally:
             self.release_connection(conn)
     
-    def limpar_dados_antigos(self, dias: int = 90):
+    def obter_historico_preco(self, produto_id: int, dias: int = 30) -> List[Dict]:
         conn = self.get_connection()
         try:
-            cursor = conn.cursor()
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
             cursor.execute("""
-                DELETE FROM precos_historico 
-                WHERE data < CURRENT_TIMESTAMP - INTERVAL '%s days'
-            """, (dias,))
-            deletados = cursor.rowcount
+                SELECT dia AS data, fechamento AS preco, abertura, maxima, minima, observacoes
+                FROM precos_diarios
+                WHERE produto_id = %s
+                AND dia >= CURRENT_DATE - %s
+                ORDER BY dia ASC
+            """, (produto_id, dias))
+            return cursor.fetchall()
+        finally:
+            self.release_connection(conn)
+    
+    def limpar_dados_antigos(self, dias: int = 90) -> List[str]:
+        # Retenção por partição: só partições inteiramente mais antigas que o corte são removidas
+        # (DETACH + DROP, sem DELETE linha a linha). O corte efetivo é arredondado para a granularidade.
+        # A partição é escolhida pelo início do intervalo (`data`): uma partição antiga ainda pode ter
+        # intervalos estendidos depois do corte (preço que não mudou desde então). Esses intervalos são
+        # cortados na fronteira: passam a começar na primeira partição mantida (UPDATE da chave de
+        # partição move a linha), e a partição antiga sai inteira. O trecho anterior já fora da janela se
+        # perde, como o resto da partição; `observacoes` continua contando o intervalo inteiro.
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            # Sem escritas no histórico até o commit: nenhum intervalo é estendido entre a verificação e o DROP
+            cursor.execute("LOCK TABLE precos_historico IN SHARE ROW EXCLUSIVE MODE")
+            cursor.execute("SELECT LOCALTIMESTAMP - make_interval(days => %s)", (dias,))
+            corte = cursor.fetchone()[0]
+            
+            # Garante a partição do período atual, destino dos intervalos cortados
+            self._criar_particoes_historico(cursor)
+            particoes = self._particoes_historico(cursor)
+            antigas = [nome for nome, _, fim in particoes if fim <= corte]
+            cortados = 0
+            if antigas:
+                fronteira = next(inicio for _, inicio, fim in particoes if fim > corte)
+                cursor.execute("""
+                    UPDATE precos_historico SET data = %s
+                    WHERE data < %s AND valido_ate >= %s
+                """, (fronteira, fronteira, corte))
+                cortados = cursor.rowcount
+            
+            removidas = []
+            for nome in antigas:
+                cursor.execute(f"ALTER TABLE precos_historico DETACH PARTITION {nome}")
+                cursor.execute(f"DROP TABLE {nome}")
+                removidas.append(nome)
+            
             conn.commit()
-            logger.info(f"🗑️  Removidos {deletados} registros com mais de {dias} dias")
+            logger.info(f"🗑️  Removidas {len(removidas)} partições de histórico com mais de {dias} dias "
+                        f"({cortados} intervalos ainda vigentes cortados na fronteira)")
+            return removidas
+        except Exception:
+            conn.rollback()
+            raise
         finally:
             self.release_connection(conn)
     
@@ -459,14 +1100,27 @@ class DatabasePostgres:
             self.release_connection(conn)
 
     def close_pool(self):
-        if self.pool:
-            self.pool.closeall()
-            logger.info("✅ Pool de conexões fechado")
+        with self._lock:
+            if self.pool:
+                self.pool.closeall()
+                self.pool = None
+                logger.info("✅ Pool de conexões fechado")
 
 
-def get_database():
-    db = DatabasePostgres()
-    db.initialize_db()
-    return db
+_database: Optional[DatabasePostgres] = None
+_database_lock = threading.Lock()
 
-db = get_database()
+
+def get_database() -> DatabasePostgres:
+    global _database
+    with _database_lock:
+        if _database is None:
+            _database = DatabasePostgres()
+            atexit.register(_database.close_pool)
+        return _database
+
+
+def preparar_banco() -> DatabasePostgres:
+    db = get_database()
+    db.garantir_schema()
+    return db
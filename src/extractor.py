@@ -0,0 +1,628 @@
+import json
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse, parse_qs
+
+from bs4 import BeautifulSoup
+from lxml import etree
+import lxml.html
+
+from .utils import encoding_do_corpo, text_to_price
+from .config import EXTRACTOR, EXTRACTOR_EMBEDDED_JSON
+
+ESTADO_PRELOADED = re.compile(r'__PRELOADED_STATE__')
+ESTADO_PRELOADED_BYTES = re.compile(rb'__PRELOADED_STATE__')
+TAMANHO_BLOCO = 64 * 1024
+URL_IMAGEM_POLYCARD = "https://http2.mlstatic.com/D_Q_NP_{}-O.webp"
+CAMPOS_PRODUTO = ("nome", "preco", "preco_original", "percentual_desconto", "imagem_url", "link", "produto_id_ml")
+
+SELETOR_ITENS = "li.ui-search-layout__item, div.ui-search-result, div.poly-card"
+
+SELETORES_CSS = {
+    "titulo": "a.ui-search-link, a.poly-component__title, h3 a, h2 a, a.ui-search-link",
+    "imagem": "img.ui-search-result-image__element, img",
+    "andes_fractions": ".andes-money-amount__fraction",
+    "agora": '[aria-label^="Agora:"], span[aria-label^="Agora:"], .andes-money-amount[aria-label^="Agora:"]',
+    "inteiro": ".andes-money-amount__unit, .andes-money-amount__main-value",
+    "cents": ".andes-money-amount--cents-superscript, .andes-money-amount__fraction--cents",
+    "price_tag_fraction": ".price-tag-fraction",
+    "preco_original": ".price-tag-strike .price-tag-fraction, .price-tag__subprice .price-tag-fraction, .andes-money-amount__fraction.price-original, .andes-money-amount--original .andes-money-amount__fraction",
+}
+
+
+def _classe(nome: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {nome} ')"
+
+
+def _ancestral(nome: str) -> str:
+    return f"ancestor::*[{_classe(nome)}]"
+
+
+# Equivalentes em XPath dos seletores CSS acima, compilados uma única vez.
+# Como no soupsieve, os ancestrais de seletores descendentes podem estar fora do item.
+XPATH_ITENS = etree.XPath(
+    f"//li[{_classe('ui-search-layout__item')}] | //div[{_classe('ui-search-result')}] | //div[{_classe('poly-card')}]"
+)
+
+# Mesmas classes de XPATH_ITENS, testadas nos eventos do parser incremental
+CLASSES_ITENS = {"li": "ui-search-layout__item", "div": ("ui-search-result", "poly-card")}
+
+XPATHS = {
+    "titulo": etree.XPath(
+        f"descendant::a[{_classe('ui-search-link')} or {_classe('poly-component__title')}"
+        f" or ancestor::h3 or ancestor::h2][1]"
+    ),
+    "imagem": etree.XPath("descendant::img[1]"),
+    "andes_fractions": etree.XPath(f"descendant::*[{_classe('andes-money-amount__fraction')}]"),
+    "agora": etree.XPath('descendant::*[starts-with(@aria-label, "Agora:")][1]'),
+    "inteiro": etree.XPath(
+        f"descendant::*[{_classe('andes-money-amount__unit')} or {_classe('andes-money-amount__main-value')}][1]"
+    ),
+    "cents": etree.XPath(
+        f"descendant::*[{_classe('andes-money-amount--cents-superscript')}"
+        f" or {_classe('andes-money-amount__fraction--cents')}][1]"
+    ),
+    "price_tag_fraction": etree.XPath(f"descendant::*[{_classe('price-tag-fraction')}][1]"),
+    "preco_original": etree.XPath(
+        f"descendant::*[({_classe('price-tag-fraction')}"
+        f" and ({_ancestral('price-tag-strike')} or {_ancestral('price-tag__subprice')}))"
+        f" or ({_classe('andes-money-amount__fraction')}"
+        f" and ({_classe('price-original')} or {_ancestral('andes-money-amount--original')}))][1]"
+    ),
+}
+
+# Texto de um elemento sem o conteúdo de <script>/<style>/<template>, como o get_text do bs4
+XPATH_TEXTO = etree.XPath(".//text()[not(ancestor::script or ancestor::style or ancestor::template)]")
+
+
+class _BeautifulSoupBackend:
+    @staticmethod
+    def itens(html: str):
+        return BeautifulSoup(html, "lxml").select(SELETOR_ITENS)
+
+    @staticmethod
+    def todos(item, chave: str):
+        return item.select(SELETORES_CSS[chave])
+
+    @staticmethod
+    def primeiro(item, chave: str):
+        return item.select_one(SELETORES_CSS[chave])
+
+    @staticmethod
+    def texto(el) -> str:
+        return el.get_text(strip=True)
+
+    @staticmethod
+    def texto_bruto(el) -> str:
+        return el.get_text()
+
+    @staticmethod
+    def attr(el, nome: str):
+        return el.get(nome)
+
+
+class _LxmlBackend:
+    @staticmethod
+    def itens(html: str):
+        try:
+            doc = lxml.html.document_fromstring(html)
+        except ValueError:
+            doc = lxml.html.document_fromstring(html.encode("utf-8"))
+        except etree.ParserError:
+            return []
+        return XPATH_ITENS(doc)
+
+    @staticmethod
+    def itens_incrementais(blocos: Iterable[bytes], encoding: Optional[str] = None) -> Iterator:
+        return _itens_incrementais(blocos, encoding)
+
+    @staticmethod
+    def todos(item, chave: str):
+        return XPATHS[chave](item)
+
+    @staticmethod
+    def primeiro(item, chave: str):
+        encontrados = XPATHS[chave](item)
+        return encontrados[0] if encontrados else None
+
+    @staticmethod
+    def texto(el) -> str:
+        return "".join(t.strip() for t in XPATH_TEXTO(el) if t.strip())
+
+    @staticmethod
+    def texto_bruto(el) -> str:
+        return "".join(XPATH_TEXTO(el))
+
+    @staticmethod
+    def attr(el, nome: str):
+        return el.get(nome)
+
+
+def _eh_item(el) -> bool:
+    esperado = CLASSES_ITENS.get(el.tag)
+    if esperado is None:
+        return False
+    classes = (el.get("class") or "").split()
+    return any(c in classes for c in ((esperado,) if isinstance(esperado, str) else esperado))
+
+
+def _itens_incrementais(blocos: Iterable[bytes], encoding: Optional[str] = None) -> Iterator:
+    # Alimenta o HTMLPullParser bloco a bloco e entrega os itens assim que a subárvore fecha, na ordem
+    # do documento (itens aninhados saem junto com o item externo). Depois de consumido, o item é limpo
+    # e os irmãos anteriores removidos, para o documento nunca ficar inteiro em memória.
+    parser = etree.HTMLPullParser(events=("start", "end"), tag=("li", "div"),
+                                  encoding=encoding or "utf-8")
+    abertos: List[bool] = []
+    grupo = []
+    profundidade = 0
+
+    def eventos():
+        nonlocal profundidade, grupo
+        for evento, el in parser.read_events():
+            if evento == "start":
+                item = _eh_item(el)
+                abertos.append(item)
+                if item:
+                    grupo.append(el)
+                    profundidade += 1
+                continue
+
+            if not abertos.pop():
+                continue
+            profundidade -= 1
+            if profundidade:
+                continue
+
+            yield from grupo
+            grupo = []
+            el.clear(keep_tail=True)
+            pai = el.getparent()
+            while pai is not None and el.getprevious() is not None:
+                del pai[0]
+
+    try:
+        for bloco in blocos:
+            parser.feed(bloco)
+            yield from eventos()
+        parser.close()
+    except (etree.XMLSyntaxError, etree.ParserError):
+        return
+    yield from eventos()
+
+
+def _blocos(conteudo: bytes, tamanho: int = TAMANHO_BLOCO) -> Iterator[bytes]:
+    for inicio in range(0, len(conteudo), tamanho):
+        yield conteudo[inicio:inicio + tamanho]
+
+
+def extract_ml_id(link: str):
+    pattern = r'\b(MLB[A-Z]*-?\d{5,})\b'
+    match = re.search(pattern, link, re.IGNORECASE)
+
+    if match:
+        return match.group(1).replace("-", "")
+
+    parsed = urlparse(link)
+    params = parse_qs(parsed.query)
+
+    for values in params.values():
+        for value in values:
+            m2 = re.search(pattern, value, re.IGNORECASE)
+            if m2:
+                return m2.group(1).replace("-", "")
+
+    return None
+
+
+def _andes_fractions(item, b, ctx: dict):
+    if "andes_fractions" not in ctx:
+        ctx["andes_fractions"] = b.todos(item, "andes_fractions")
+    return ctx["andes_fractions"]
+
+
+def _preco_andes_fractions(item, b, ctx: dict):
+    andes_fractions = _andes_fractions(item, b, ctx)
+    preco = None
+    if andes_fractions:
+        try:
+            if len(andes_fractions) >= 2:
+                ctx["preco_original"] = text_to_price(b.texto(andes_fractions[0]))
+                preco = text_to_price(b.texto(andes_fractions[1]))
+            else:
+                preco = text_to_price(b.texto(andes_fractions[0]))
+        except Exception as e:
+            print(f"debug: erro ao parsear andes_fractions: {e}")
+    return preco
+
+
+def _preco_agora(item, b, ctx: dict):
+    agora_tag = b.primeiro(item, "agora")
+    if agora_tag is not None:
+        aria = b.attr(agora_tag, "aria-label") or b.texto_bruto(agora_tag)
+        aria_clean = re.sub(r'(?i)\bAgora:?\b', '', aria).replace('reais', '').strip()
+        try:
+            return text_to_price(aria_clean)
+        except Exception as e:
+            print(f"debug: falha ao parsear aria 'Agora': {e}")
+    return None
+
+
+def _preco_inteiro_cents(item, b, ctx: dict):
+    inteiro_tag = b.primeiro(item, "inteiro")
+    cents_tag = b.primeiro(item, "cents")
+    if inteiro_tag is not None and cents_tag is not None:
+        combined = f"{b.texto(inteiro_tag)},{b.texto(cents_tag)}"
+        try:
+            return text_to_price(combined)
+        except Exception as e:
+            print(f"debug: falha ao parsear inteiro+cents: {e}")
+    return None
+
+
+def _preco_price_tag_fraction(item, b, ctx: dict):
+    price_tag_frac = b.primeiro(item, "price_tag_fraction")
+    if price_tag_frac is not None:
+        try:
+            return text_to_price(b.texto(price_tag_frac))
+        except Exception as e:
+            print(f"debug: falha ao parsear price-tag-fraction: {e}")
+    return None
+
+
+# Ordem padrão da cascata de preço (A → D); a ordem efetiva se adapta por categoria/layout
+ESTRATEGIAS_PRECO = {
+    "andes_fractions": _preco_andes_fractions,
+    "agora": _preco_agora,
+    "inteiro_cents": _preco_inteiro_cents,
+    "price_tag_fraction": _preco_price_tag_fraction,
+}
+
+
+def detect_selector(html: Union[str, bytes]):
+    bruto = isinstance(html, bytes)
+    if (b"ui-search-layout__item" if bruto else "ui-search-layout__item") in html:
+        return "li.ui-search-layout__item, div.ui-search-result__wrapper"
+    if (b"poly-card--grid" if bruto else "poly-card--grid") in html:
+        return "div.poly-card.poly-card--grid.poly-card--large"
+    return None
+
+
+class EstatisticasExtracao:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados: Dict[Tuple[str, str], Dict] = {}
+
+    def _registro(self, chave: Tuple[str, str]) -> Dict:
+        if chave not in self._dados:
+            self._dados[chave] = {
+                "paginas": 0,
+                "itens": 0,
+                "acertos_primeira": 0,
+                "sem_preco": 0,
+                "tentativas": Counter(),
+                "acertos": Counter(),
+            }
+        return self._dados[chave]
+
+    def ordem(self, categoria: str, layout: str) -> List[str]:
+        with self._lock:
+            acertos = self._registro((categoria, layout))["acertos"]
+            return sorted(ESTRATEGIAS_PRECO, key=lambda nome: -acertos[nome])
+
+    def ordens(self, categoria: str) -> Dict[str, List[str]]:
+        # Fotografia da ordem por layout, para enviar junto com a página a outro processo
+        with self._lock:
+            return {
+                layout: sorted(ESTRATEGIAS_PRECO, key=lambda nome: -r["acertos"][nome])
+                for (cat, layout), r in self._dados.items()
+                if cat == categoria
+            }
+
+    def registrar_pagina(self, categoria: str, layout: str, pagina: Dict):
+        with self._lock:
+            registro = self._registro((categoria, layout))
+            taxa_anterior = registro["acertos_primeira"] / registro["itens"] if registro["itens"] else None
+
+            registro["paginas"] += 1
+            registro["itens"] += pagina["itens"]
+            registro["acertos_primeira"] += pagina["acertos_primeira"]
+            registro["sem_preco"] += pagina["sem_preco"]
+            registro["tentativas"].update(pagina["tentativas"])
+            registro["acertos"].update(pagina["acertos"])
+
+        if pagina["itens"] and taxa_anterior:
+            taxa_pagina = pagina["acertos_primeira"] / pagina["itens"]
+            if taxa_pagina < taxa_anterior * 0.5:
+                print(f"⚠️  [{categoria}] Taxa de acerto da 1ª estratégia de preço caiu de "
+                      f"{taxa_anterior:.0%} para {taxa_pagina:.0%} (layout: {layout}). O HTML pode ter mudado.")
+
+    def resumo(self, categoria: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            return [
+                {
+                    "categoria": cat,
+                    "layout": layout,
+                    "paginas": r["paginas"],
+                    "itens": r["itens"],
+                    "taxa_acerto_primeira": r["acertos_primeira"] / r["itens"] if r["itens"] else 0.0,
+                    "sem_preco": r["sem_preco"],
+                    "ordem": sorted(ESTRATEGIAS_PRECO, key=lambda nome: -r["acertos"][nome]),
+                    "acertos": dict(r["acertos"]),
+                    "falhas": {nome: r["tentativas"][nome] - r["acertos"][nome] for nome in r["tentativas"]},
+                }
+                for (cat, layout), r in self._dados.items()
+                if categoria is None or cat == categoria
+            ]
+
+
+ESTATISTICAS_EXTRACAO = EstatisticasExtracao()
+
+
+def obter_metricas_extracao(categoria: Optional[str] = None) -> List[Dict]:
+    return ESTATISTICAS_EXTRACAO.resumo(categoria)
+
+
+def _novas_metricas() -> Dict:
+    return {"itens": 0, "acertos_primeira": 0, "sem_preco": 0,
+            "tentativas": Counter(), "acertos": Counter()}
+
+
+def _extrair_itens(items: Iterable, limit: int, b, ordem: List[str], metricas: Dict):
+    produtos = []
+    for item in items:
+        if len(produtos) >= limit:
+            break
+
+        title_tag = b.primeiro(item, "titulo")
+        nome = b.texto(title_tag) if title_tag is not None else None
+        link = b.attr(title_tag, "href") if title_tag is not None else None
+
+        imagem_tag = b.primeiro(item, "imagem")
+        imagem_url = None
+        if imagem_tag is not None:
+            imagem_url = b.attr(imagem_tag, "data-src") or b.attr(imagem_tag, "src")
+
+        preco = None
+        percentual_desconto = None
+        ctx = {"preco_original": None}
+
+        metricas["itens"] += 1
+        for posicao, estrategia in enumerate(ordem):
+            metricas["tentativas"][estrategia] += 1
+            preco = ESTRATEGIAS_PRECO[estrategia](item, b, ctx)
+            if preco is not None:
+                metricas["acertos"][estrategia] += 1
+                if posicao == 0:
+                    metricas["acertos_primeira"] += 1
+                break
+        else:
+            metricas["sem_preco"] += 1
+
+        preco_original = ctx["preco_original"]
+
+        if preco_original is None:
+            orig_tag = b.primeiro(item, "preco_original")
+            if orig_tag is not None:
+                try:
+                    preco_original = text_to_price(b.texto(orig_tag))
+                except Exception as e:
+                    print(f"debug: falha ao parsear preco_original: {e}")
+
+        if preco_original is None:
+            andes_fractions = _andes_fractions(item, b, ctx)
+            if andes_fractions and len(andes_fractions) >= 2:
+                try:
+                    preco_original = text_to_price(b.texto(andes_fractions[0]))
+                    if preco is None:
+                        preco = text_to_price(b.texto(andes_fractions[1]))
+                except Exception as e:
+                    print(f"debug: erro ao recuperar preco_original de andes_fractions: {e}")
+
+        if preco_original and preco and preco_original > preco:
+            try:
+                percentual_desconto = round(((preco_original - preco) / preco_original) * 100, 1)
+            except Exception as e:
+                print(f"debug: erro ao calcular desconto: {e}")
+                percentual_desconto = None
+
+        produto_id_ml = b.attr(item, "data-id") or (extract_ml_id(link) if link else None)
+
+        if nome and preco and link:
+            produtos.append({
+                "nome": nome,
+                "preco": preco,
+                "preco_original": preco_original,
+                "percentual_desconto": percentual_desconto,
+                "imagem_url": imagem_url,
+                "link": link,
+                "produto_id_ml": produto_id_ml
+            })
+        else:
+            print(f"debug: item descartado (nome={bool(nome)}, preco={bool(preco)}, link={bool(link)})")
+
+    return produtos
+
+
+def _extrair_produtos(html: str, limit: int, b, categoria: Optional[str] = None):
+    ordem = list(ESTRATEGIAS_PRECO)
+    if categoria:
+        layout = detect_selector(html) or "desconhecido"
+        ordem = ESTATISTICAS_EXTRACAO.ordem(categoria, layout)
+    metricas = _novas_metricas()
+
+    produtos = _extrair_itens(b.itens(html), limit, b, ordem, metricas)
+
+    if categoria and metricas["itens"]:
+        ESTATISTICAS_EXTRACAO.registrar_pagina(categoria, layout, metricas)
+
+    return produtos
+
+
+def _ler_estado_preloaded(html: Union[str, bytes], encoding: Optional[str] = None):
+    if isinstance(html, bytes):
+        # Decodifica só o <script> do estado, não a página inteira
+        match = ESTADO_PRELOADED_BYTES.search(html)
+        if not match:
+            return None
+        fim = html.find(b"</script>", match.end())
+        html = html[match.end():fim if fim >= 0 else len(html)].decode(encoding or "utf-8", errors="replace")
+        inicio = html.find("{")
+    else:
+        match = ESTADO_PRELOADED.search(html)
+        if not match:
+            return None
+        inicio = html.find("{", match.end())
+    if inicio < 0:
+        return None
+    try:
+        # raw_decode lê só o objeto JSON a partir de `inicio`, sem procurar o fim do <script>
+        estado, _ = json.JSONDecoder().raw_decode(html, inicio)
+    except ValueError:
+        return None
+    return estado
+
+
+def _iterar_resultados(no):
+    pilha = [no]
+    while pilha:
+        atual = pilha.pop()
+        if isinstance(atual, dict):
+            if isinstance(atual.get("polycard"), dict):
+                yield atual["polycard"]
+                continue
+            if "permalink" in atual and "title" in atual and "price" in atual:
+                yield atual
+                continue
+            pilha.extend(reversed(list(atual.values())))
+        elif isinstance(atual, list):
+            pilha.extend(reversed(atual))
+
+
+def _valor_preco(valor):
+    if isinstance(valor, dict):
+        valor = valor.get("value", valor.get("amount"))
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return float(valor)
+    if isinstance(valor, str):
+        return text_to_price(valor)
+    return None
+
+
+def _produto_polycard(card: dict) -> dict:
+    metadata = card.get("metadata") or {}
+    componentes = {c.get("type"): c for c in card.get("components") or [] if isinstance(c, dict)}
+
+    nome = ((componentes.get("title") or {}).get("title") or {}).get("text")
+    preco_info = (componentes.get("price") or {}).get("price") or {}
+
+    link = metadata.get("url")
+    if link and not link.startswith("http"):
+        link = f"https://{link.lstrip('/')}"
+
+    pictures = (card.get("pictures") or {}).get("pictures") or []
+    imagem_url = URL_IMAGEM_POLYCARD.format(pictures[0]["id"]) if pictures and pictures[0].get("id") else None
+
+    return {
+        "nome": nome.strip() if isinstance(nome, str) else None,
+        "preco": _valor_preco(preco_info.get("current_price")),
+        "preco_original": _valor_preco(preco_info.get("previous_price")),
+        "imagem_url": imagem_url,
+        "link": link,
+        "produto_id_ml": metadata.get("id"),
+    }
+
+
+def _produto_resultado(resultado: dict) -> dict:
+    preco = resultado.get("price")
+    preco_original = preco.get("original_price") if isinstance(preco, dict) else resultado.get("original_price")
+    return {
+        "nome": resultado.get("title").strip() if isinstance(resultado.get("title"), str) else None,
+        "preco": _valor_preco(preco),
+        "preco_original": _valor_preco(preco_original),
+        "imagem_url": resultado.get("thumbnail"),
+        "link": resultado.get("permalink"),
+        "produto_id_ml": resultado.get("id"),
+    }
+
+
+def extract_products_json(html: Union[str, bytes], limit: int = 10, encoding: Optional[str] = None):
+    estado = _ler_estado_preloaded(html, encoding)
+    if estado is None:
+        return []
+
+    produtos = []
+    for resultado in _iterar_resultados(estado):
+        if len(produtos) >= limit:
+            break
+
+        produto = _produto_polycard(resultado) if "metadata" in resultado else _produto_resultado(resultado)
+        if not (produto["nome"] and produto["preco"] and produto["link"]):
+            continue
+
+        preco, preco_original = produto["preco"], produto["preco_original"]
+        produto["percentual_desconto"] = (
+            round(((preco_original - preco) / preco_original) * 100, 1)
+            if preco_original and preco_original > preco else None
+        )
+        if not produto["produto_id_ml"]:
+            produto["produto_id_ml"] = extract_ml_id(produto["link"])
+
+        produtos.append({chave: produto[chave] for chave in CAMPOS_PRODUTO})
+
+    return produtos
+
+
+def extract_products_bs4(html: str, limit: int = 10, categoria: Optional[str] = None):
+    return _extrair_produtos(html, limit, _BeautifulSoupBackend, categoria)
+
+
+def extract_products_lxml(html: str, limit: int = 10, categoria: Optional[str] = None):
+    return _extrair_produtos(html, limit, _LxmlBackend, categoria)
+
+
+def _itens_do_backend(b, html: Union[str, bytes], encoding: Optional[str]):
+    if isinstance(html, bytes):
+        if b is _LxmlBackend:
+            return b.itens_incrementais(_blocos(html), encoding)
+        html = html.decode(encoding or "utf-8", errors="replace")
+    return b.itens(html)
+
+
+def extrair_pagina(html: Union[str, bytes], limit: int = 10, ordens: Optional[Dict[str, List[str]]] = None,
+                   encoding: Optional[str] = None):
+    # Não toca em ESTATISTICAS_EXTRACAO: roda igual no processo principal e nos processos de parsing.
+    # Devolve (produtos, layout, metricas); metricas é None quando a página saiu do JSON embutido.
+    # Com bytes, o caminho lxml não decodifica a página: os blocos vão direto para o parser incremental.
+    # Bytes sem encoding conhecido (sem charset no Content-Type, registros antigos do arquivo) usam o da página.
+    if isinstance(html, bytes) and not encoding:
+        encoding = encoding_do_corpo(html)
+    layout = detect_selector(html) or "desconhecido"
+    ordem = (ordens or {}).get(layout) or list(ESTRATEGIAS_PRECO)
+
+    if EXTRACTOR_EMBEDDED_JSON:
+        produtos = extract_products_json(html, limit, encoding)
+        if produtos:
+            return produtos, layout, None
+
+    backends = [_LxmlBackend, _BeautifulSoupBackend] if EXTRACTOR == "lxml" else [_BeautifulSoupBackend]
+    for b in backends:
+        metricas = _novas_metricas()
+        produtos = _extrair_itens(_itens_do_backend(b, html, encoding), limit, b, ordem, metricas)
+        if produtos:
+            break
+    return produtos, layout, metricas
+
+
+def registrar_metricas(categoria: Optional[str], layout: str, metricas: Optional[Dict]):
+    if categoria and metricas and metricas["itens"]:
+        ESTATISTICAS_EXTRACAO.registrar_pagina(categoria, layout, metricas)
+
+
+def extract_products(html: Union[str, bytes], limit: int = 10, categoria: Optional[str] = None,
+                     encoding: Optional[str] = None):
+    ordens = ESTATISTICAS_EXTRACAO.ordens(categoria) if categoria else None
+    produtos, layout, metricas = extrair_pagina(html, limit, ordens, encoding)
+    registrar_metricas(categoria, layout, metricas)
+    return produtos
@@ -0,0 +1,183 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from .config import (
+    HEADERS,
+    REQUEST_TIMEOUT,
+    FETCH_CONCURRENCY,
+    FETCH_CONCURRENCY_PER_HOST,
+    FETCH_QUEUE_SIZE,
+    MAX_RETRIES,
+)
+from .http_client import STATUS_RETRY, PaginaHttp, calcular_backoff, encoding_da_resposta, pagina_do_cache
+from .http_cache import HttpCache, get_http_cache
+from .rate_limiter import RateLimiter, get_rate_limiter
+
+# fetch_pagina já imprime cada resposta ([HTTP] ...); o log INFO do httpx duplicaria as linhas
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+class FetchEngine:
+    def __init__(self, concorrencia: int = FETCH_CONCURRENCY,
+                 concorrencia_por_host: int = FETCH_CONCURRENCY_PER_HOST,
+                 tamanho_fila: int = FETCH_QUEUE_SIZE,
+                 timeout: float = REQUEST_TIMEOUT,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 max_retries: int = MAX_RETRIES,
+                 cache: Optional[HttpCache] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.concorrencia = concorrencia
+        self.concorrencia_por_host = concorrencia_por_host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.cache = cache or get_http_cache()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.fila: asyncio.Queue = asyncio.Queue(maxsize=tamanho_fila)
+        self.client: Optional[httpx.AsyncClient] = None
+        # Loop em que o motor roda; buscar_bloqueante agenda as buscas nele a partir de outras threads
+        self.loop = loop
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._workers = []
+
+    async def __aenter__(self):
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.fechar()
+
+    async def iniciar(self):
+        if self.client:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.client = httpx.AsyncClient(
+            headers=HEADERS,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=self.concorrencia,
+                max_keepalive_connections=self.concorrencia,
+            ),
+        )
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concorrencia)]
+
+    async def fechar(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        while not self.fila.empty():
+            _, futuro = self.fila.get_nowait()
+            if not futuro.done():
+                futuro.cancel()
+
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def buscar(self, url: str) -> PaginaHttp:
+        if not self.client:
+            await self.iniciar()
+        futuro = asyncio.get_running_loop().create_future()
+        await self.fila.put((url, futuro))
+        return await futuro
+
+    async def fetch(self, url: str) -> str:
+        return (await self.buscar(url)).texto
+
+    def buscar_bloqueante(self, url: str) -> PaginaHttp:
+        # Para as threads do pipeline de scrape_all_pages; não pode ser chamada de dentro do próprio loop
+        return asyncio.run_coroutine_threadsafe(self.buscar(url), self.loop).result()
+
+    def _semaforo_host(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.concorrencia_por_host)
+        return self._hosts[host]
+
+    async def _buscar_com_cache(self, url: str) -> PaginaHttp:
+        entrada = await asyncio.to_thread(self.cache.obter, url) if self.cache else None
+        resp = await self._get_com_retry(url, HttpCache.headers_condicionais(entrada))
+
+        if resp.status_code == 304 and entrada:
+            await asyncio.to_thread(self.cache.revalidado, url)
+            return pagina_do_cache(url, entrada)
+
+        pagina = PaginaHttp(url=url, status=resp.status_code, conteudo=resp.content,
+                            encoding=encoding_da_resposta(resp.headers, resp.content), headers=dict(resp.headers))
+        if self.cache and resp.status_code == 200:
+            await asyncio.to_thread(self.cache.salvar, url, pagina.headers, pagina.conteudo, pagina.encoding)
+        return pagina
+
+    async def _get_com_retry(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        for tentativa in range(self.max_retries + 1):
+            async with self._semaforo_host(url):
+                await self.rate_limiter.adquirir_async(url)
+                inicio = time.monotonic()
+                try:
+                    resp = await self.client.get(url, headers=headers)
+                except httpx.TransportError as e:
+                    self.rate_limiter.registrar_resposta(url, None)
+                    if tentativa >= self.max_retries:
+                        raise
+                    motivo = type(e).__name__
+                else:
+                    self.rate_limiter.registrar_resposta(
+                        url, resp.status_code, time.monotonic() - inicio, resp.headers.get("Retry-After")
+                    )
+                    if resp.status_code not in STATUS_RETRY or tentativa >= self.max_retries:
+                        return resp
+                    motivo = f"HTTP {resp.status_code}"
+
+            espera = calcular_backoff(tentativa)
+            print(f"🔁 {motivo} em {url}. Nova tentativa ({tentativa + 1}/{self.max_retries}) em {espera:.1f}s...")
+            await asyncio.sleep(espera)
+
+    async def _worker(self):
+        while True:
+            url, futuro = await self.fila.get()
+            try:
+                if futuro.cancelled():
+                    continue
+                pagina = await self._buscar_com_cache(url)
+                if not futuro.done():
+                    futuro.set_result(pagina)
+            except asyncio.CancelledError:
+                if not futuro.done():
+                    futuro.cancel()
+                raise
+            except Exception as e:
+                if not futuro.done():
+                    futuro.set_exception(e)
+            finally:
+                self.fila.task_done()
+
+
+_fetch_engine: Optional[FetchEngine] = None
+_fetch_engine_lock = threading.Lock()
+
+
+def get_fetch_engine() -> FetchEngine:
+    # Motor do processo (FETCH_ENGINE=async), com event loop próprio numa thread daemon: todas as categorias
+    # coletadas em paralelo dividem a fila e os limites por host
+    global _fetch_engine
+    with _fetch_engine_lock:
+        if _fetch_engine is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="fetch-engine", daemon=True).start()
+            _fetch_engine = FetchEngine(loop=loop)
+            atexit.register(_fechar_fetch_engine, _fetch_engine)
+        return _fetch_engine
+
+
+def _fechar_fetch_engine(engine: FetchEngine):
+    asyncio.run_coroutine_threadsafe(engine.fechar(), engine.loop).result(timeout=5)
+    engine.loop.call_soon_threadsafe(engine.loop.stop)
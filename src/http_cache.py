@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+from .config import HTTP_CACHE_DIR, HTTP_CACHE_TTL, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_ENABLED
+
+
+def canonicalizar_url(url: str) -> str:
+    parsed = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), parsed.path or "/", parsed.params, query, ""))
+
+
+def _sha256(dados: bytes) -> str:
+    return hashlib.sha256(dados).hexdigest()
+
+
+def _escrever_atomico(caminho: Path, dados: bytes):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    tmp = caminho.with_name(f".{caminho.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(dados)
+    os.replace(tmp, caminho)
+
+
+class HttpCache:
+    # Índice por URL canônica -> metadados; corpos comprimidos e endereçados pelo SHA-256 do conteúdo
+    def __init__(self, diretorio: Path = HTTP_CACHE_DIR, ttl: float = HTTP_CACHE_TTL,
+                 max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        self.diretorio = Path(diretorio)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.dir_indice = self.diretorio / "index"
+        self.dir_corpos = self.diretorio / "bodies"
+        self._lock = threading.Lock()
+        self._tamanho = None
+
+    def _caminho_indice(self, url: str) -> Path:
+        return self.dir_indice / f"{_sha256(canonicalizar_url(url).encode())}.json"
+
+    def _caminho_corpo(self, digest: str) -> Path:
+        return self.dir_corpos / digest[:2] / f"{digest}.z"
+
+    def obter(self, url: str) -> Optional[Dict]:
+        caminho = self._caminho_indice(url)
+        try:
+            entrada = json.loads(caminho.read_text())
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entrada["armazenado_em"] > self.ttl:
+            self._remover_indice(caminho)
+            return None
+
+        try:
+            entrada["conteudo"] = zlib.decompress(self._caminho_corpo(entrada["sha256"]).read_bytes())
+        except (OSError, zlib.error):
+            self._remover_indice(caminho)
+            return None
+
+        try:
+            os.utime(caminho)
+        except OSError:
+            pass
+        return entrada
+
+    @staticmethod
+    def headers_condicionais(entrada: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if entrada:
+            if entrada.get("etag"):
+                headers["If-None-Match"] = entrada["etag"]
+            if entrada.get("last_modified"):
+                headers["If-Modified-Since"] = entrada["last_modified"]
+        return headers
+
+    def salvar(self, url: str, headers: Dict[str, str], conteudo: bytes, encoding: Optional[str]):
+        etag = headers.get("ETag") or headers.get("etag")
+        last_modified = headers.get("Last-Modified") or headers.get("last-modified")
+        if not etag and not last_modified:
+            return
+
+        digest = _sha256(conteudo)
+        caminho_corpo = self._caminho_corpo(digest)
+        novos_bytes = 0
+        if not caminho_corpo.exists():
+            comprimido = zlib.compress(conteudo, 6)
+            _escrever_atomico(caminho_corpo, comprimido)
+            novos_bytes = len(comprimido)
+
+        entrada = {
+            "url": canonicalizar_url(url),
+            "sha256": digest,
+            "etag": etag,
+            "last_modified": last_modified,
+            "encoding": encoding,
+            "armazenado_em": time.time(),
+        }
+        _escrever_atomico(self._caminho_indice(url), json.dumps(entrada).encode())
+
+        with self._lock:
+            if self._tamanho is None:
+                self._tamanho = self._calcular_tamanho()
+            else:
+                self._tamanho += novos_bytes
+            if self._tamanho > self.max_bytes:
+                self._evict()
+
+    def revalidado(self, url: str):
+        caminho = self._caminho_indice(url)
+        try:
+            entrada = json.loads(caminho.read_text())
+        except (OSError, ValueError):
+            return
+        entrada["armazenado_em"] = time.time()
+        _escrever_atomico(caminho, json.dumps(entrada).encode())
+
+    def _remover_indice(self, caminho: Path):
+        try:
+            caminho.unlink()
+        except OSError:
+            pass
+
+    def _calcular_tamanho(self) -> int:
+        if not self.dir_corpos.exists():
+            return 0
+        return sum(p.stat().st_size for p in self.dir_corpos.glob("*/*.z"))
+
+    def _evict(self):
+        # LRU pelo mtime do índice (atualizado a cada leitura); corpos órfãos são apagados em seguida
+        indices = sorted(self.dir_indice.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        referenciados = {}
+        for caminho in indices:
+            try:
+                referenciados[caminho] = json.loads(caminho.read_text())["sha256"]
+            except (OSError, ValueError, KeyError):
+                self._remover_indice(caminho)
+
+        contagem = Counter(referenciados.values())
+        alvo = self.max_bytes * 0.9
+        for caminho in indices:
+            if self._tamanho <= alvo:
+                break
+            digest = referenciados.pop(caminho, None)
+            self._remover_indice(caminho)
+            if not digest:
+                continue
+            contagem[digest] -= 1
+            if contagem[digest] <= 0:
+                corpo = self._caminho_corpo(digest)
+                try:
+                    self._tamanho -= corpo.stat().st_size
+                    corpo.unlink()
+                except OSError:
+                    pass
+
+
+_http_cache: Optional[HttpCache] = None
+_http_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    global _http_cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _http_cache_lock:
+        if _http_cache is None:
+            _http_cache = HttpCache()
+        return _http_cache
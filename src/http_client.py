@@ -0,0 +1,128 @@
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from .config import HEADERS, REQUEST_TIMEOUT, MAX_RETRIES, RETRY_DELAY, FETCH_CONCURRENCY
+from .rate_limiter import RateLimiter, get_rate_limiter
+from .http_cache import HttpCache, get_http_cache
+from .utils import encoding_do_corpo
+
+STATUS_RETRY = {429, 500, 502, 503, 504}
+CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+@dataclass
+class PaginaHttp:
+    url: str
+    status: int
+    conteudo: bytes
+    encoding: Optional[str] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    do_cache: bool = False
+
+    @property
+    def texto(self) -> str:
+        return self.conteudo.decode(self.encoding or "utf-8", errors="replace")
+
+
+def charset_do_content_type(headers) -> Optional[str]:
+    match = CHARSET.search(headers.get("Content-Type") or "")
+    return match.group(1).lower() if match else None
+
+
+def encoding_da_resposta(headers, conteudo: bytes) -> Optional[str]:
+    # O charset do Content-Type vale sobre o da página; sem ele, o <meta charset> ou a detecção
+    return charset_do_content_type(headers) or encoding_do_corpo(conteudo)
+
+
+def pagina_do_cache(url: str, entrada: Dict) -> PaginaHttp:
+    return PaginaHttp(url=url, status=200, conteudo=entrada["conteudo"],
+                      encoding=entrada.get("encoding"), do_cache=True)
+
+
+def calcular_backoff(tentativa: int, base: float = RETRY_DELAY) -> float:
+    # Backoff exponencial com jitter, para não sincronizar os retries de vários workers
+    return random.uniform(base / 2, base * (2 ** tentativa))
+
+
+class HttpClient:
+    def __init__(self, pool_size: int = FETCH_CONCURRENCY,
+                 max_retries: int = MAX_RETRIES,
+                 timeout: float = REQUEST_TIMEOUT,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[HttpCache] = None):
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.cache = cache or get_http_cache()
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        self.session.headers["Connection"] = "keep-alive"
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+
+        for tentativa in range(self.max_retries + 1):
+            self.rate_limiter.adquirir(url)
+            inicio = time.monotonic()
+            try:
+                resp = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.rate_limiter.registrar_resposta(url, None)
+                if tentativa >= self.max_retries:
+                    raise
+                motivo = type(e).__name__
+            else:
+                self.rate_limiter.registrar_resposta(
+                    url, resp.status_code, time.monotonic() - inicio, resp.headers.get("Retry-After")
+                )
+                if resp.status_code not in STATUS_RETRY or tentativa >= self.max_retries:
+                    return resp
+                motivo = f"HTTP {resp.status_code}"
+
+            espera = calcular_backoff(tentativa)
+            print(f"🔁 {motivo} em {url}. Nova tentativa ({tentativa + 1}/{self.max_retries}) em {espera:.1f}s...")
+            time.sleep(espera)
+
+    def buscar(self, url: str) -> PaginaHttp:
+        entrada = self.cache.obter(url) if self.cache else None
+        resp = self.get(url, headers=HttpCache.headers_condicionais(entrada))
+
+        if resp.status_code == 304 and entrada:
+            self.cache.revalidado(url)
+            return pagina_do_cache(url, entrada)
+
+        pagina = PaginaHttp(url=url, status=resp.status_code, conteudo=resp.content,
+                            encoding=encoding_da_resposta(resp.headers, resp.content),
+                            headers=dict(resp.headers))
+        if self.cache and resp.status_code == 200:
+            self.cache.salvar(url, pagina.headers, pagina.conteudo, pagina.encoding)
+        return pagina
+
+    def close(self):
+        self.session.close()
+
+
+_http_client: Optional[HttpClient] = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = HttpClient()
+        return _http_client
@@ -0,0 +1,83 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Posições da tupla guardada por chave
+ID, PRECO, PRECO_ORIGINAL, PERCENTUAL_DESCONTO, IMAGEM_URL = range(5)
+
+
+def chave_produto(produto: Dict) -> str:
+    # Mesma chave do fingerprint da página e do conflito do upsert: produto_id_ml, ou o link sem ele
+    return produto.get("produto_id_ml") or produto["link"]
+
+
+def _mesmo_preco(a, b) -> bool:
+    # NUMERIC(10, 2) no banco: compara com duas casas
+    return round(float(a), 2) == round(float(b), 2)
+
+
+def _opcional_igual(novo, atual, preco: bool = True) -> bool:
+    # O upsert mantém o valor do banco quando a página não traz o campo (COALESCE)
+    if novo is None:
+        return True
+    if atual is None:
+        return False
+    return _mesmo_preco(novo, atual) if preco else novo == atual
+
+
+class IdentityMap:
+    # Produtos da categoria carregados uma vez por coleta: chave → (id, preco_atual, preco_original,
+    # percentual_desconto, imagem_url). Com ele o scraper separa em memória o que é novo, o que mudou
+    # e o que está igual ao banco; só os dois primeiros passam pelo upsert.
+    def __init__(self, identidades: Optional[Dict[str, Tuple]] = None):
+        self._identidades = identidades if identidades is not None else {}
+        # classificar (thread do crawler) e registrar (thread do write-behind) mexem nas mesmas tuplas
+        self._lock = threading.Lock()
+
+    @classmethod
+    def carregar(cls, db, categoria: str) -> "IdentityMap":
+        return cls(db.carregar_identidades(categoria))
+
+    def __len__(self) -> int:
+        return len(self._identidades)
+
+    def __contains__(self, chave: str) -> bool:
+        return chave in self._identidades
+
+    def get(self, chave: str) -> Optional[Tuple]:
+        return self._identidades.get(chave)
+
+    def classificar(self, produtos: Iterable[Dict]) -> Tuple[List[Dict], List[int]]:
+        # (produtos a gravar, ids inalterados). Não altera o mapa: ele só recebe o que o banco confirmou
+        # (registrar). Um produto que reaparece antes da gravação da página anterior vai de novo para o
+        # upsert, que o descarta se já estiver igual.
+        gravar, inalterados = [], []
+        with self._lock:
+            for produto in produtos:
+                atual = self._identidades.get(chave_produto(produto))
+                if atual is not None and self._inalterado(produto, atual):
+                    inalterados.append(atual[ID])
+                else:
+                    gravar.append(produto)
+        return gravar, inalterados
+
+    def registrar(self, contagens: Iterable[Dict]):
+        # Valores devolvidos por gravar_paginas depois do commit, para as linhas que o upsert gravou ou
+        # confirmou; as que ele descartou (produto inválido, chave de outro produto) ficam como estavam
+        with self._lock:
+            for contagem in contagens:
+                self._identidades.update(contagem.get("identidades", {}))
+
+    def descartar(self, paginas: Iterable[Dict]):
+        # Páginas cuja gravação falhou: os produtos saem do mapa e, se reaparecerem, vão para o upsert
+        with self._lock:
+            for pagina in paginas:
+                for produto in pagina.get("produtos", ()):
+                    self._identidades.pop(chave_produto(produto), None)
+
+    @staticmethod
+    def _inalterado(produto: Dict, atual: Tuple) -> bool:
+        return (produto.get("preco") is not None and atual[PRECO] is not None
+                and _mesmo_preco(produto["preco"], atual[PRECO])
+                and _opcional_igual(produto.get("preco_original"), atual[PRECO_ORIGINAL])
+                and _opcional_igual(produto.get("percentual_desconto"), atual[PERCENTUAL_DESCONTO])
+                and _opcional_igual(produto.get("imagem_url"), atual[IMAGEM_URL], preco=False))
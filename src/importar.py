@@ -0,0 +1,79 @@
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from .database_postgres import CAMPOS_IMPORTACAO, get_database, preparar_banco
+
+
+def ler_jsonl(stream) -> Iterator[Dict]:
+    for numero, linha in enumerate(stream, 1):
+        linha = linha.strip()
+        if not linha:
+            continue
+        try:
+            yield json.loads(linha)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Linha {numero} não é JSON válido: {e}")
+
+
+def ler_csv(stream) -> Iterator[Dict]:
+    leitor = csv.DictReader(stream)
+    desconhecidas = set(leitor.fieldnames or ()) - set(CAMPOS_IMPORTACAO)
+    if desconhecidas:
+        print(f"⚠️  Colunas ignoradas: {', '.join(sorted(desconhecidas))}")
+    yield from leitor
+
+
+def detectar_formato(caminho: str, formato: Optional[str]) -> str:
+    if formato:
+        return formato
+    sufixos = Path(caminho).suffixes
+    if ".csv" in sufixos:
+        return "csv"
+    if ".jsonl" in sufixos or ".json" in sufixos or ".ndjson" in sufixos:
+        return "jsonl"
+    raise ValueError(f"Não foi possível detectar o formato de {caminho}; use --formato")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Importa em massa um dump de produtos (JSONL ou CSV) via COPY",
+        epilog=f"Campos: {', '.join(CAMPOS_IMPORTACAO)}. Cada linha é uma observação; "
+               "visto_em ausente vale como o momento da importação.")
+    parser.add_argument("arquivo", help="Arquivo .jsonl/.csv (ou - para ler da entrada padrão)")
+    parser.add_argument("--formato", choices=["jsonl", "csv"],
+                        help="Formato do arquivo (padrão: pela extensão)")
+    parser.add_argument("--categoria",
+                        help="Categoria das linhas que não trazem uma")
+    parser.add_argument("--bloco", type=int, default=100000,
+                        help="Linhas por COPY (padrão: 100000)")
+    args = parser.parse_args()
+
+    try:
+        formato = args.formato or ("jsonl" if args.arquivo == "-" else detectar_formato(args.arquivo, None))
+        stream = sys.stdin if args.arquivo == "-" else open(args.arquivo, encoding="utf-8", newline="")
+        preparar_banco()
+
+        inicio = time.monotonic()
+        with stream:
+            linhas = ler_csv(stream) if formato == "csv" else ler_jsonl(stream)
+            resultado = get_database().importar_produtos(linhas, args.categoria, args.bloco)
+        duracao = time.monotonic() - inicio
+    except Exception as e:
+        print(f"❌ Erro na importação: {e}")
+        return 1
+
+    print(f"✅ {resultado['linhas']} linhas importadas em {duracao:.2f}s "
+          f"({resultado['linhas'] / duracao if duracao > 0 else 0:,.0f} linhas/s)")
+    print(f"   Válidas: {resultado['validas']}")
+    print(f"   Produtos novos: {resultado['novos']} | atualizados: {resultado['atualizados']}")
+    print(f"   Histórico: {resultado['historicos']} intervalos novos, {resultado['estendidos']} estendidos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
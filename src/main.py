@@ -1,18 +1,54 @@
-from .scraper import scrape_all_pages
-from urllib.parse import urlparse
+from .scraper import scrape_all_pages, replay_archive
+from .utils import extrair_categoria_da_url
+from .database_postgres import preparar_banco
+from .config import FETCH_ENGINE
 import sys
 
-def extrair_categoria_da_url(url: str) -> str:
-    path = urlparse(url).path
-    categoria = path.strip("/").split("/")[0] if path else "geral"
-    return categoria.lower()
+def main_replay(args):
+    persistir = "--sem-db" not in args
+    args = [a for a in args if a != "--sem-db"]
+    
+    if not args:
+        print("Uso: python -m src.main --replay <arquivo.warc.gz|diretorio> [categoria] [--sem-db]")
+        sys.exit(1)
+    
+    origem = args[0]
+    categoria = args[1] if len(args) > 1 else None
+    
+    print(f"⏪ Reprocessando páginas arquivadas de {origem}")
+    print(f"Categoria: {categoria if categoria else 'do arquivo'}")
+    print(f"Persistência: {'banco de dados' if persistir else 'desativada (apenas extração)'}\n")
+    
+    if persistir:
+        preparar_banco()
+    
+    resultado = replay_archive(origem, categoria, persistir)
+    
+    for resumo in resultado["resultados"].values():
+        print(f"   {resumo['categoria']}: {resumo['paginas']} páginas, {resumo['total_produtos']} produtos")
+    importacao = resultado["importacao"]
+    if importacao:
+        print(f"   Produtos novos: {importacao['novos']} | atualizados: {importacao['atualizados']}")
+        print(f"   Histórico: {importacao['historicos']} intervalos novos, {importacao['estendidos']} estendidos")
+    print(f"\n📊 {resultado['paginas']} páginas em {resultado['duracao']:.2f}s "
+          f"({resultado['paginas_por_segundo']:.1f} páginas/s)")
+    
+    if resultado["status"] != "sucesso":
+        print(f"\n❌ Erro no replay: {resultado['erro']}")
+        sys.exit(1)
+
 
 def main():
     if len(sys.argv) < 2:
         print("Uso: python -m src.main <url> [max_produtos] [max_paginas]")
+        print("     python -m src.main --replay <arquivo.warc.gz|diretorio> [categoria] [--sem-db]")
         print("Exemplo: python -m src.main 'https://lista.mercadolivre.com.br/celular' 50 3")
         sys.exit(1)
     
+    if sys.argv[1] == "--replay":
+        main_replay(sys.argv[2:])
+        return
+    
     url = sys.argv[1]
     
     max_produtos = int(sys.argv[2]) if len(sys.argv) > 2 else None
@@ -24,8 +60,10 @@ def main():
     print(f"URL: {url}")
     print(f"Categoria: {categoria}")
     print(f"Máximo de produtos: {max_produtos if max_produtos else 'Ilimitado'}")
-    print(f"Máximo de páginas: {max_paginas}\n")
+    print(f"Máximo de páginas: {max_paginas}")
+    print(f"Motor de fetch: {FETCH_ENGINE}\n")
     
+    preparar_banco()
     resultado = scrape_all_pages(url, categoria, max_produtos, max_paginas)
 
     if resultado["status"] == "sucesso":
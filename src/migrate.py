@@ -0,0 +1,178 @@
+import argparse
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Set
+
+import psycopg2
+
+from .database_postgres import DatabasePostgres
+
+logger = logging.getLogger(__name__)
+
+DIR_MIGRACOES = Path(__file__).parent / "migrations"
+ARQUIVO_MIGRACAO = re.compile(r"^(\d{4})_(\w+)\.sql$")
+# Primeira linha das migrações que precisam rodar fora de transação (ex.: CREATE INDEX CONCURRENTLY)
+MARCADOR_SEM_TRANSACAO = "-- sem-transacao"
+# Separação das instruções: ';' dentro de literais e de corpos $$...$$ (blocos DO) não encerra a instrução
+TOKEN_SQL = re.compile(r"(\$\w*\$).*?\1|'(?:[^']|'')*'|;|[^;$']+|[$']", re.S)
+# Chave do pg_advisory_lock que serializa as migrações entre processos
+CHAVE_LOCK_MIGRACOES = 4174201601
+
+
+def listar_migracoes(diretorio: Path = DIR_MIGRACOES) -> List[Dict]:
+    migracoes = []
+    for caminho in sorted(Path(diretorio).glob("*.sql")):
+        match = ARQUIVO_MIGRACAO.match(caminho.name)
+        if not match:
+            raise ValueError(f"Nome de migração inválido: {caminho.name} (esperado NNNN_nome.sql)")
+        sql = caminho.read_text(encoding="utf-8")
+        migracoes.append({
+            "versao": int(match.group(1)),
+            "nome": match.group(2),
+            "sql": sql,
+            "transacional": not sql.lstrip().startswith(MARCADOR_SEM_TRANSACAO),
+        })
+
+    versoes = [m["versao"] for m in migracoes]
+    if len(set(versoes)) != len(versoes):
+        raise ValueError("Há migrações com o mesmo número de versão")
+    return migracoes
+
+
+def _instrucoes(sql: str) -> List[str]:
+    # Em autocommit cada instrução roda sozinha; uma string com várias viraria uma transação implícita
+    sem_comentarios = "\n".join(l for l in sql.splitlines() if not l.strip().startswith("--"))
+    instrucoes, atual = [], []
+    for token in TOKEN_SQL.finditer(sem_comentarios):
+        if token.group(0) == ";":
+            instrucoes.append("".join(atual))
+            atual = []
+        else:
+            atual.append(token.group(0))
+    instrucoes.append("".join(atual))
+    return [i.strip() for i in instrucoes if i.strip()]
+
+
+def _conectar():
+    conn = psycopg2.connect(**DatabasePostgres.get_db_config())
+    conn.autocommit = True
+    return conn
+
+
+def _versoes_aplicadas(cursor) -> Set[int]:
+    cursor.execute("SELECT to_regclass('schema_version')")
+    if cursor.fetchone()[0] is None:
+        return set()
+    cursor.execute("SELECT versao FROM schema_version")
+    return {versao for (versao,) in cursor.fetchall()}
+
+
+def _adquirir_lock(cursor, intervalo: float = 0.5):
+    # pg_try_advisory_lock em laço: quem espera não fica com uma instrução aberta, o que faria
+    # um CREATE INDEX CONCURRENTLY de quem tem o lock esperar por ele (deadlock)
+    while True:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (CHAVE_LOCK_MIGRACOES,))
+        if cursor.fetchone()[0]:
+            return
+        time.sleep(intervalo)
+
+
+def _aplicar(conn, migracao: Dict):
+    cursor = conn.cursor()
+    registro = ("INSERT INTO schema_version (versao, nome) VALUES (%s, %s)",
+                (migracao["versao"], migracao["nome"]))
+
+    if not migracao["transacional"]:
+        for instrucao in _instrucoes(migracao["sql"]):
+            cursor.execute(instrucao)
+        cursor.execute(*registro)
+        return
+
+    conn.autocommit = False
+    try:
+        cursor.execute(migracao["sql"])
+        cursor.execute(*registro)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+def migracoes_pendentes() -> List[Dict]:
+    conn = _conectar()
+    try:
+        aplicadas = _versoes_aplicadas(conn.cursor())
+    finally:
+        conn.close()
+    return [m for m in listar_migracoes() if m["versao"] not in aplicadas]
+
+
+def aplicar_migracoes() -> List[int]:
+    migracoes = listar_migracoes()
+    conn = _conectar()
+    try:
+        cursor = conn.cursor()
+        # Caminho rápido sem lock: um SELECT quando o schema já está em dia
+        if {m["versao"] for m in migracoes} <= _versoes_aplicadas(cursor):
+            return []
+
+        _adquirir_lock(cursor)
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    versao INTEGER PRIMARY KEY,
+                    nome TEXT NOT NULL,
+                    aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Relido com o lock: outro processo pode ter aplicado enquanto esperávamos
+            aplicadas = _versoes_aplicadas(cursor)
+
+            novas = []
+            for migracao in migracoes:
+                if migracao["versao"] in aplicadas:
+                    continue
+                logger.info(f"🔧 Aplicando migração {migracao['versao']:04d}_{migracao['nome']}")
+                _aplicar(conn, migracao)
+                novas.append(migracao["versao"])
+            return novas
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (CHAVE_LOCK_MIGRACOES,))
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica as migrações de schema do ML Crawler")
+    parser.add_argument("--status", action="store_true",
+                        help="Apenas lista as migrações pendentes, sem aplicar")
+    args = parser.parse_args()
+
+    try:
+        if args.status:
+            pendentes = migracoes_pendentes()
+            if not pendentes:
+                print("✅ Schema em dia, nenhuma migração pendente")
+            for migracao in pendentes:
+                print(f"⏳ Pendente: {migracao['versao']:04d}_{migracao['nome']}")
+            return 0
+
+        aplicadas = aplicar_migracoes()
+    except Exception as e:
+        print(f"❌ Erro ao aplicar migrações: {e}")
+        return 1
+
+    if aplicadas:
+        print(f"✅ {len(aplicadas)} migração(ões) aplicada(s): {', '.join(f'{v:04d}' for v in aplicadas)}")
+    else:
+        print("✅ Schema em dia, nenhuma migração pendente")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
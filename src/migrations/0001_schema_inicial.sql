@@ -0,0 +1,46 @@
+-- Schema original (antes criado por initialize_db a cada início de processo).
+-- Usa IF NOT EXISTS para poder ser marcada como aplicada em bancos que já têm as tabelas.
+
+CREATE TABLE IF NOT EXISTS produtos (
+    id SERIAL PRIMARY KEY,
+    nome TEXT NOT NULL UNIQUE,
+    link TEXT NOT NULL UNIQUE,
+    categoria TEXT NOT NULL,
+    produto_id_ml TEXT,
+    preco_atual NUMERIC(10, 2),
+    preco_original NUMERIC(10, 2),
+    percentual_desconto NUMERIC(5, 2),
+    imagem_url TEXT,
+    primeira_coleta TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ultima_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE produtos
+    ADD COLUMN IF NOT EXISTS preco_original NUMERIC(10, 2),
+    ADD COLUMN IF NOT EXISTS percentual_desconto NUMERIC(5, 2),
+    ADD COLUMN IF NOT EXISTS imagem_url TEXT;
+
+CREATE TABLE IF NOT EXISTS precos_historico (
+    id SERIAL PRIMARY KEY,
+    produto_id INTEGER NOT NULL,
+    preco NUMERIC(10, 2) NOT NULL,
+    data TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (produto_id) REFERENCES produtos(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS coletas (
+    id SERIAL PRIMARY KEY,
+    categoria TEXT NOT NULL,
+    data_inicio TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_fim TIMESTAMP,
+    total_produtos INTEGER,
+    total_novos INTEGER DEFAULT 0,
+    total_atualizados INTEGER DEFAULT 0,
+    status TEXT DEFAULT 'em_progresso',
+    mensagem_erro TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_categoria ON produtos(categoria);
+CREATE INDEX IF NOT EXISTS idx_produto_id ON precos_historico(produto_id);
+CREATE INDEX IF NOT EXISTS idx_data ON precos_historico(data);
+CREATE INDEX IF NOT EXISTS idx_coleta_categoria ON coletas(categoria);
@@ -0,0 +1,47 @@
+-- sem-transacao
+-- Alvo do ON CONFLICT (produto_id_ml) de upsert_produtos.
+-- CONCURRENTLY não trava escritas na tabela produtos durante a criação.
+
+-- Duplicatas de produto_id_ml (gravadas antes do índice) fariam a criação falhar. Fica o produto
+-- atualizado por último; o histórico das cópias passa para ele e a primeira coleta é a mais antiga.
+-- Cada passo pode ser repetido se a migração parar no meio.
+UPDATE precos_historico h
+SET produto_id = d.manter
+FROM (
+    SELECT id, first_value(id) OVER (PARTITION BY produto_id_ml
+                                     ORDER BY ultima_atualizacao DESC NULLS LAST, id DESC) AS manter
+    FROM produtos
+    WHERE produto_id_ml IS NOT NULL
+) d
+WHERE h.produto_id = d.id AND d.id <> d.manter;
+
+UPDATE produtos p
+SET primeira_coleta = d.primeira_coleta
+FROM (
+    SELECT produto_id_ml, min(primeira_coleta) AS primeira_coleta
+    FROM produtos
+    WHERE produto_id_ml IS NOT NULL
+    GROUP BY produto_id_ml
+    HAVING count(*) > 1
+) d
+WHERE p.produto_id_ml = d.produto_id_ml AND p.primeira_coleta IS DISTINCT FROM d.primeira_coleta;
+
+DELETE FROM produtos p
+USING (
+    SELECT id, first_value(id) OVER (PARTITION BY produto_id_ml
+                                     ORDER BY ultima_atualizacao DESC NULLS LAST, id DESC) AS manter
+    FROM produtos
+    WHERE produto_id_ml IS NOT NULL
+) d
+WHERE p.id = d.id AND d.id <> d.manter;
+
+-- Um CREATE INDEX CONCURRENTLY que falhou deixa o índice INVALID, e o IF NOT EXISTS o aceitaria
+-- na nova tentativa: descarta antes de recriar
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_index WHERE indexrelid = to_regclass('idx_produto_id_ml') AND NOT indisvalid) THEN
+        DROP INDEX idx_produto_id_ml;
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_produto_id_ml ON produtos(produto_id_ml);
@@ -0,0 +1,12 @@
+-- Hash do corpo e dos produtos/preços de cada página (categoria, página) da última coleta
+
+CREATE TABLE IF NOT EXISTS paginas_fingerprint (
+    categoria TEXT NOT NULL,
+    pagina INTEGER NOT NULL,
+    hash_conteudo TEXT,
+    hash_produtos TEXT NOT NULL,
+    produto_ids INTEGER[] NOT NULL,
+    total_produtos INTEGER NOT NULL,
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (categoria, pagina)
+);
@@ -0,0 +1,33 @@
+-- precos_historico passa a ser particionada por faixa de `data`.
+-- Aqui só são criadas a tabela particionada e a partição padrão (DEFAULT), que recebe os dados
+-- existentes: as faixas, no tamanho de HISTORICO_PARTICAO, ficam com
+-- DatabasePostgres.garantir_particoes_historico(), que move para elas as linhas da partição padrão.
+
+ALTER TABLE precos_historico RENAME TO precos_historico_antigo;
+ALTER TABLE precos_historico_antigo RENAME CONSTRAINT precos_historico_pkey TO precos_historico_antigo_pkey;
+ALTER TABLE precos_historico_antigo RENAME CONSTRAINT precos_historico_produto_id_fkey TO precos_historico_antigo_produto_id_fkey;
+ALTER SEQUENCE precos_historico_id_seq RENAME TO precos_historico_antigo_id_seq;
+DROP INDEX IF EXISTS idx_produto_id;
+DROP INDEX IF EXISTS idx_data;
+
+-- A chave primária de uma tabela particionada precisa conter a chave de partição
+CREATE TABLE precos_historico (
+    id BIGSERIAL,
+    produto_id INTEGER NOT NULL REFERENCES produtos(id) ON DELETE CASCADE,
+    preco NUMERIC(10, 2) NOT NULL,
+    data TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, data)
+) PARTITION BY RANGE (data);
+
+CREATE TABLE precos_historico_padrao PARTITION OF precos_historico DEFAULT;
+
+INSERT INTO precos_historico (id, produto_id, preco, data)
+SELECT id, produto_id, preco, COALESCE(data, LOCALTIMESTAMP)
+FROM precos_historico_antigo;
+
+SELECT setval('precos_historico_id_seq', COALESCE((SELECT max(id) FROM precos_historico), 0) + 1, false);
+
+DROP TABLE precos_historico_antigo;
+
+CREATE INDEX idx_produto_id ON precos_historico(produto_id);
+CREATE INDEX idx_data ON precos_historico(data);
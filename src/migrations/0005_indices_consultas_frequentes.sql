@@ -0,0 +1,17 @@
+-- sem-transacao
+-- Índices das consultas quentes. Cada instrução é idempotente porque roda fora de transação.
+-- Em tabela particionada não existe CREATE INDEX CONCURRENTLY: o índice do pai é criado em
+-- cada partição (as futuras o herdam). O histórico só recebe escritas no fim de cada coleta.
+
+-- Último preço por produto (LATERAL de finalizar_coleta) e histórico de um produto:
+-- varredura só do índice, sem visitar a tabela. Substitui idx_produto_id (mesmo prefixo).
+CREATE INDEX IF NOT EXISTS idx_historico_produto_data ON precos_historico (produto_id, data DESC) INCLUDE (preco);
+DROP INDEX IF EXISTS idx_produto_id;
+
+-- data cresce junto com a ordem física das linhas: BRIN ocupa poucas páginas e atende filtros por período
+CREATE INDEX IF NOT EXISTS idx_historico_data_brin ON precos_historico USING BRIN (data);
+DROP INDEX IF EXISTS idx_data;
+
+-- Última coleta da categoria (obter_relatorio_categoria). Substitui idx_coleta_categoria.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_coleta_categoria_inicio ON coletas (categoria, data_inicio DESC);
+DROP INDEX CONCURRENTLY IF EXISTS idx_coleta_categoria;
@@ -0,0 +1,56 @@
+-- Resumo diário do histórico (abertura/máxima/mínima/fechamento por produto e dia).
+-- Mantido por trigger a cada INSERT em precos_historico, em lote por instrução: estatísticas e
+-- gráficos leem um registro por dia em vez de todas as observações. Sobrevive à retenção do histórico.
+
+CREATE TABLE IF NOT EXISTS precos_diarios (
+    produto_id INTEGER NOT NULL REFERENCES produtos(id) ON DELETE CASCADE,
+    dia DATE NOT NULL,
+    abertura NUMERIC(10, 2) NOT NULL,
+    maxima NUMERIC(10, 2) NOT NULL,
+    minima NUMERIC(10, 2) NOT NULL,
+    fechamento NUMERIC(10, 2) NOT NULL,
+    observacoes INTEGER NOT NULL,
+    soma NUMERIC(14, 2) NOT NULL,
+    primeira_em TIMESTAMP NOT NULL,
+    ultima_em TIMESTAMP NOT NULL,
+    PRIMARY KEY (produto_id, dia)
+);
+
+CREATE OR REPLACE FUNCTION atualizar_precos_diarios() RETURNS trigger AS $$
+BEGIN
+    -- abertura/fechamento só são trocados quando o lote traz uma observação anterior/posterior às já resumidas
+    INSERT INTO precos_diarios AS d (produto_id, dia, abertura, maxima, minima, fechamento,
+                                     observacoes, soma, primeira_em, ultima_em)
+    SELECT produto_id, data::date,
+           (array_agg(preco ORDER BY data))[1], max(preco), min(preco), (array_agg(preco ORDER BY data DESC))[1],
+           count(*), sum(preco), min(data), max(data)
+    FROM novos
+    GROUP BY produto_id, data::date
+    ON CONFLICT (produto_id, dia) DO UPDATE SET
+        abertura = CASE WHEN EXCLUDED.primeira_em < d.primeira_em THEN EXCLUDED.abertura ELSE d.abertura END,
+        fechamento = CASE WHEN EXCLUDED.ultima_em >= d.ultima_em THEN EXCLUDED.fechamento ELSE d.fechamento END,
+        maxima = GREATEST(d.maxima, EXCLUDED.maxima),
+        minima = LEAST(d.minima, EXCLUDED.minima),
+        observacoes = d.observacoes + EXCLUDED.observacoes,
+        soma = d.soma + EXCLUDED.soma,
+        primeira_em = LEAST(d.primeira_em, EXCLUDED.primeira_em),
+        ultima_em = GREATEST(d.ultima_em, EXCLUDED.ultima_em);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_precos_diarios ON precos_historico;
+CREATE TRIGGER trg_precos_diarios
+    AFTER INSERT ON precos_historico
+    REFERENCING NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION atualizar_precos_diarios();
+
+-- Carga inicial a partir do histórico existente
+INSERT INTO precos_diarios (produto_id, dia, abertura, maxima, minima, fechamento,
+                            observacoes, soma, primeira_em, ultima_em)
+SELECT produto_id, data::date,
+       (array_agg(preco ORDER BY data))[1], max(preco), min(preco), (array_agg(preco ORDER BY data DESC))[1],
+       count(*), sum(preco), min(data), max(data)
+FROM precos_historico
+GROUP BY produto_id, data::date
+ON CONFLICT (produto_id, dia) DO NOTHING;
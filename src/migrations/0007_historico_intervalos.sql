@@ -0,0 +1,80 @@
+-- Cada linha de precos_historico passa a ser um intervalo de preço: de `data` até `valido_ate`,
+-- com `observacoes` vezes em que o produto foi visto nesse preço. Rever o mesmo preço estende o
+-- intervalo; só uma mudança abre uma linha nova.
+
+ALTER TABLE precos_historico
+    ADD COLUMN IF NOT EXISTS valido_ate TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS observacoes INTEGER NOT NULL DEFAULT 1;
+
+-- Compactação: cada sequência de observações consecutivas com o mesmo preço vira um intervalo
+-- (mantida a primeira linha da sequência). Roda antes do trigger de UPDATE abaixo, então o
+-- resumo diário, que já contém essas observações, não é contado de novo.
+CREATE TEMP TABLE intervalos ON COMMIT DROP AS
+WITH marcado AS (
+    SELECT id, data, produto_id,
+           (lag(preco) OVER (PARTITION BY produto_id ORDER BY data, id) IS DISTINCT FROM preco)::int AS abre
+    FROM precos_historico
+), agrupado AS (
+    SELECT id, data, produto_id,
+           sum(abre) OVER (PARTITION BY produto_id ORDER BY data, id) AS grupo
+    FROM marcado
+)
+SELECT (array_agg(id ORDER BY data, id))[1] AS id, min(data) AS data, max(data) AS valido_ate, count(*) AS observacoes
+FROM agrupado
+GROUP BY produto_id, grupo;
+
+DELETE FROM precos_historico h
+WHERE NOT EXISTS (SELECT 1 FROM intervalos i WHERE i.id = h.id AND i.data = h.data);
+
+UPDATE precos_historico h
+SET valido_ate = i.valido_ate, observacoes = i.observacoes
+FROM intervalos i
+WHERE h.id = i.id AND h.data = i.data;
+
+ALTER TABLE precos_historico
+    ALTER COLUMN valido_ate SET DEFAULT CURRENT_TIMESTAMP,
+    ALTER COLUMN valido_ate SET NOT NULL;
+
+-- O resumo diário passa a contar também as observações que só estendem um intervalo (UPDATE):
+-- cada extensão é uma observação no dia do novo valido_ate
+CREATE OR REPLACE FUNCTION atualizar_precos_diarios() RETURNS trigger AS $$
+DECLARE
+    observado TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        observado := 'SELECT produto_id, data AS momento, preco, observacoes FROM novos';
+    ELSE
+        observado := 'SELECT n.produto_id, n.valido_ate AS momento, n.preco, n.observacoes - a.observacoes AS observacoes
+                      FROM novos n JOIN antigos a ON a.id = n.id AND a.data = n.data
+                      WHERE n.observacoes > a.observacoes';
+    END IF;
+
+    -- abertura/fechamento só são trocados quando o lote traz uma observação anterior/posterior às já resumidas
+    EXECUTE format($sql$
+        INSERT INTO precos_diarios AS d (produto_id, dia, abertura, maxima, minima, fechamento,
+                                         observacoes, soma, primeira_em, ultima_em)
+        SELECT produto_id, momento::date,
+               (array_agg(preco ORDER BY momento))[1], max(preco), min(preco),
+               (array_agg(preco ORDER BY momento DESC))[1],
+               sum(observacoes), sum(preco * observacoes), min(momento), max(momento)
+        FROM (%s) o
+        GROUP BY produto_id, momento::date
+        ON CONFLICT (produto_id, dia) DO UPDATE SET
+            abertura = CASE WHEN EXCLUDED.primeira_em < d.primeira_em THEN EXCLUDED.abertura ELSE d.abertura END,
+            fechamento = CASE WHEN EXCLUDED.ultima_em >= d.ultima_em THEN EXCLUDED.fechamento ELSE d.fechamento END,
+            maxima = GREATEST(d.maxima, EXCLUDED.maxima),
+            minima = LEAST(d.minima, EXCLUDED.minima),
+            observacoes = d.observacoes + EXCLUDED.observacoes,
+            soma = d.soma + EXCLUDED.soma,
+            primeira_em = LEAST(d.primeira_em, EXCLUDED.primeira_em),
+            ultima_em = GREATEST(d.ultima_em, EXCLUDED.ultima_em)
+    $sql$, observado);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_precos_diarios_extensao ON precos_historico;
+CREATE TRIGGER trg_precos_diarios_extensao
+    AFTER UPDATE ON precos_historico
+    REFERENCING OLD TABLE AS antigos NEW TABLE AS novos
+    FOR EACH STATEMENT EXECUTE FUNCTION atualizar_precos_diarios();
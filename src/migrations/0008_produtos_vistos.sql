@@ -0,0 +1,88 @@
+-- "Visto por último" sai de produtos para uma tabela estreita, atualizada uma vez por coleta para
+-- todos os produtos vistos. produtos.ultima_atualizacao passa a mudar só quando preço, desconto ou
+-- imagem mudam: um produto inalterado não gera nenhuma escrita em produtos.
+
+CREATE TABLE IF NOT EXISTS produtos_vistos (
+    produto_id INTEGER PRIMARY KEY REFERENCES produtos(id) ON DELETE CASCADE,
+    visto_em TIMESTAMP NOT NULL
+) WITH (fillfactor = 70);
+
+INSERT INTO produtos_vistos (produto_id, visto_em)
+SELECT id, ultima_atualizacao FROM produtos WHERE ultima_atualizacao IS NOT NULL
+ON CONFLICT (produto_id) DO NOTHING;
+
+-- Espaço livre nas páginas das tabelas reescritas pelas coletas, para os UPDATEs serem HOT (nova
+-- versão na mesma página, sem mexer nos índices). Nenhuma coluna atualizada tem índice. Vale para
+-- páginas novas; as existentes ganham o espaço conforme o autovacuum as libera.
+ALTER TABLE produtos SET (fillfactor = 80);
+ALTER TABLE precos_diarios SET (fillfactor = 80);
+
+-- Tabela particionada não aceita fillfactor: vai em cada partição (as novas já são criadas com ele)
+DO $$
+DECLARE
+    particao regclass;
+BEGIN
+    FOR particao IN SELECT inhrelid::regclass FROM pg_inherits WHERE inhparent = 'precos_historico'::regclass LOOP
+        EXECUTE format('ALTER TABLE %s SET (fillfactor = 90)', particao);
+    END LOOP;
+END $$;
+
+-- Resumo diário: UPDATE dos dias que já existem e INSERT só dos que faltam. O ON CONFLICT DO UPDATE
+-- para todos gravava no WAL um lock além do update de cada linha; ele fica só para a corrida com
+-- outra transação que crie o mesmo dia.
+CREATE OR REPLACE FUNCTION atualizar_precos_diarios() RETURNS trigger AS $$
+DECLARE
+    observado TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        observado := 'SELECT produto_id, data AS momento, preco, observacoes FROM novos';
+    ELSE
+        observado := 'SELECT n.produto_id, n.valido_ate AS momento, n.preco, n.observacoes - a.observacoes AS observacoes
+                      FROM novos n JOIN antigos a ON a.id = n.id AND a.data = n.data
+                      WHERE n.observacoes > a.observacoes';
+    END IF;
+
+    -- abertura/fechamento só são trocados quando o lote traz uma observação anterior/posterior às já resumidas
+    EXECUTE format($sql$
+        WITH o AS (
+            SELECT produto_id, momento::date AS dia,
+                   (array_agg(preco ORDER BY momento))[1] AS abertura, max(preco) AS maxima, min(preco) AS minima,
+                   (array_agg(preco ORDER BY momento DESC))[1] AS fechamento,
+                   sum(observacoes) AS observacoes, sum(preco * observacoes) AS soma,
+                   min(momento) AS primeira_em, max(momento) AS ultima_em
+            FROM (%s) x
+            GROUP BY produto_id, momento::date
+        ),
+        atualizados AS (
+            UPDATE precos_diarios d SET
+                abertura = CASE WHEN o.primeira_em < d.primeira_em THEN o.abertura ELSE d.abertura END,
+                fechamento = CASE WHEN o.ultima_em >= d.ultima_em THEN o.fechamento ELSE d.fechamento END,
+                maxima = GREATEST(d.maxima, o.maxima),
+                minima = LEAST(d.minima, o.minima),
+                observacoes = d.observacoes + o.observacoes,
+                soma = d.soma + o.soma,
+                primeira_em = LEAST(d.primeira_em, o.primeira_em),
+                ultima_em = GREATEST(d.ultima_em, o.ultima_em)
+            FROM o
+            WHERE d.produto_id = o.produto_id AND d.dia = o.dia
+            RETURNING d.produto_id, d.dia
+        )
+        INSERT INTO precos_diarios AS d (produto_id, dia, abertura, maxima, minima, fechamento,
+                                         observacoes, soma, primeira_em, ultima_em)
+        SELECT o.produto_id, o.dia, o.abertura, o.maxima, o.minima, o.fechamento,
+               o.observacoes, o.soma, o.primeira_em, o.ultima_em
+        FROM o
+        WHERE NOT EXISTS (SELECT 1 FROM atualizados a WHERE a.produto_id = o.produto_id AND a.dia = o.dia)
+        ON CONFLICT (produto_id, dia) DO UPDATE SET
+            abertura = CASE WHEN EXCLUDED.primeira_em < d.primeira_em THEN EXCLUDED.abertura ELSE d.abertura END,
+            fechamento = CASE WHEN EXCLUDED.ultima_em >= d.ultima_em THEN EXCLUDED.fechamento ELSE d.fechamento END,
+            maxima = GREATEST(d.maxima, EXCLUDED.maxima),
+            minima = LEAST(d.minima, EXCLUDED.minima),
+            observacoes = d.observacoes + EXCLUDED.observacoes,
+            soma = d.soma + EXCLUDED.soma,
+            primeira_em = LEAST(d.primeira_em, EXCLUDED.primeira_em),
+            ultima_em = GREATEST(d.ultima_em, EXCLUDED.ultima_em)
+    $sql$, observado);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,6 @@
+-- Partição padrão (DEFAULT) do histórico também nos bancos migrados antes de 0004 criá-la: uma
+-- gravação fora das faixas existentes cai nela em vez de falhar, e garantir_particoes_historico()
+-- move essas linhas para a faixa quando a cria.
+
+CREATE TABLE IF NOT EXISTS precos_historico_padrao PARTITION OF precos_historico DEFAULT;
+ALTER TABLE precos_historico_padrao SET (fillfactor = 90);
@@ -0,0 +1,96 @@
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .config import PARSE_WORKERS, PARSE_QUEUE_SIZE
+from .extractor import CAMPOS_PRODUTO, ESTATISTICAS_EXTRACAO, extrair_pagina, extract_products, registrar_metricas
+
+
+def _extrair_em_processo(conteudo: bytes, encoding: Optional[str], limit: int,
+                         ordens: Optional[Dict[str, List[str]]]) -> Tuple[List[tuple], str, Optional[Dict]]:
+    # Executa no processo de parsing: recebe os bytes crus e devolve só tuplas e contadores (baratos de serializar)
+    produtos, layout, metricas = extrair_pagina(conteudo, limit, ordens, encoding)
+    return [tuple(p[campo] for campo in CAMPOS_PRODUTO) for p in produtos], layout, metricas
+
+
+def _produtos_de_tuplas(tuplas: List[tuple]) -> List[Dict]:
+    return [dict(zip(CAMPOS_PRODUTO, t)) for t in tuplas]
+
+
+class ParsePool:
+    # Processos de parsing com fila limitada; o processo principal fica só com I/O e persistência
+    def __init__(self, processos: int = PARSE_WORKERS, max_pendentes: int = PARSE_QUEUE_SIZE):
+        self.processos = processos
+        self.max_pendentes = max(max_pendentes, 2)
+        # "spawn" evita herdar conexões do banco e locks de threads do processo principal
+        self._executor = ProcessPoolExecutor(max_workers=processos,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        self._vagas = threading.BoundedSemaphore(self.max_pendentes)
+
+    def submeter(self, conteudo: bytes, encoding: Optional[str] = None, limit: int = 50,
+                 categoria: Optional[str] = None) -> Future:
+        # Bloqueia quando há max_pendentes páginas na fila, segurando o fetch em vez de acumular HTML em memória
+        self._vagas.acquire()
+        ordens = ESTATISTICAS_EXTRACAO.ordens(categoria) if categoria else None
+        try:
+            futuro_worker = self._executor.submit(_extrair_em_processo, conteudo, encoding, limit, ordens)
+        except Exception:
+            self._vagas.release()
+            raise
+
+        futuro = Future()
+
+        def concluir(f: Future):
+            self._vagas.release()
+            try:
+                tuplas, layout, metricas = f.result()
+            except BaseException as e:
+                futuro.set_exception(e)
+                return
+            # As métricas da cascata de preço voltam com o resultado e são somadas aqui no processo principal
+            registrar_metricas(categoria, layout, metricas)
+            futuro.set_result(_produtos_de_tuplas(tuplas))
+
+        futuro_worker.add_done_callback(concluir)
+        return futuro
+
+    def extrair(self, conteudo: bytes, encoding: Optional[str] = None, limit: int = 50,
+                categoria: Optional[str] = None) -> List[Dict]:
+        return self.submeter(conteudo, encoding, limit, categoria).result()
+
+    def fechar(self):
+        self._executor.shutdown(wait=True)
+
+
+_parse_pool: Optional[ParsePool] = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> Optional[ParsePool]:
+    global _parse_pool
+    if PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ParsePool()
+        return _parse_pool
+
+
+def submeter_extracao(conteudo: bytes, encoding: Optional[str] = None, limit: int = 50,
+                      categoria: Optional[str] = None) -> Future:
+    pool = get_parse_pool()
+    if pool:
+        return pool.submeter(conteudo, encoding, limit, categoria)
+
+    futuro = Future()
+    try:
+        futuro.set_result(extract_products(conteudo, limit=limit, categoria=categoria, encoding=encoding))
+    except Exception as e:
+        futuro.set_exception(e)
+    return futuro
+
+
+def extrair_produtos(conteudo: bytes, encoding: Optional[str] = None, limit: int = 50,
+                     categoria: Optional[str] = None) -> List[Dict]:
+    return submeter_extracao(conteudo, encoding, limit, categoria).result()
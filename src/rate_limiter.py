@@ -0,0 +1,160 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .config import (
+    RATE_LIMIT_RATE,
+    RATE_LIMIT_MIN_RATE,
+    RATE_LIMIT_MAX_RATE,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_INCREASE,
+    RATE_LIMIT_DECREASE,
+    RATE_LIMIT_LATENCY_TARGET,
+    RATE_LIMIT_STATE_DIR,
+)
+
+STATUS_SOBRECARGA = {429, 503}
+
+
+def parse_retry_after(valor: Optional[str]) -> Optional[float]:
+    if not valor:
+        return None
+    valor = valor.strip()
+    if valor.isdigit():
+        return float(valor)
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, taxa: float = RATE_LIMIT_RATE,
+                 capacidade: float = RATE_LIMIT_BURST,
+                 taxa_minima: float = RATE_LIMIT_MIN_RATE,
+                 taxa_maxima: float = RATE_LIMIT_MAX_RATE,
+                 arquivo_estado: Optional[Path] = None):
+        self.capacidade = capacidade
+        self.taxa_minima = taxa_minima
+        self.taxa_maxima = taxa_maxima
+        self.arquivo_estado = arquivo_estado if fcntl else None
+        self._lock = threading.Lock()
+        self._estado = {
+            "taxa": taxa,
+            "tokens": capacidade,
+            "atualizado_em": self._agora(),
+            "bloqueado_ate": 0.0,
+        }
+
+    def _agora(self) -> float:
+        return time.time() if self.arquivo_estado else time.monotonic()
+
+    @contextmanager
+    def _estado_compartilhado(self):
+        with self._lock:
+            if not self.arquivo_estado:
+                yield self._estado
+                return
+
+            self.arquivo_estado.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.arquivo_estado, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    conteudo = f.read()
+                    if conteudo:
+                        self._estado = json.loads(conteudo)
+                    yield self._estado
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(self._estado))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reservar(self) -> float:
+        with self._estado_compartilhado() as estado:
+            agora = self._agora()
+            decorrido = max(0.0, agora - estado["atualizado_em"])
+            estado["tokens"] = min(self.capacidade, estado["tokens"] + decorrido * estado["taxa"])
+            estado["atualizado_em"] = agora
+
+            estado["tokens"] -= 1
+            espera = 0.0 if estado["tokens"] >= 0 else -estado["tokens"] / estado["taxa"]
+            return max(espera, estado["bloqueado_ate"] - agora)
+
+    def adquirir(self):
+        espera = self.reservar()
+        if espera > 0:
+            time.sleep(espera)
+
+    async def adquirir_async(self):
+        espera = self.reservar()
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+    def registrar_resposta(self, status: Optional[int], latencia: Optional[float] = None,
+                           retry_after: Optional[str] = None):
+        with self._estado_compartilhado() as estado:
+            if status in STATUS_SOBRECARGA or status is None:
+                estado["taxa"] = max(self.taxa_minima, estado["taxa"] * RATE_LIMIT_DECREASE)
+                pausa = parse_retry_after(retry_after)
+                if pausa:
+                    estado["bloqueado_ate"] = max(estado["bloqueado_ate"], self._agora() + pausa)
+            elif latencia is not None and latencia > RATE_LIMIT_LATENCY_TARGET:
+                estado["taxa"] = max(self.taxa_minima, estado["taxa"] * (1 + RATE_LIMIT_DECREASE) / 2)
+            elif status < 500:
+                estado["taxa"] = min(self.taxa_maxima, estado["taxa"] + RATE_LIMIT_INCREASE)
+
+    @property
+    def taxa(self) -> float:
+        with self._estado_compartilhado() as estado:
+            return estado["taxa"]
+
+
+class RateLimiter:
+    def __init__(self, diretorio_estado: Optional[Path] = RATE_LIMIT_STATE_DIR):
+        self.diretorio_estado = Path(diretorio_estado) if diretorio_estado else None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._buckets:
+                arquivo = self.diretorio_estado / f"{host}.json" if self.diretorio_estado else None
+                self._buckets[host] = TokenBucket(arquivo_estado=arquivo)
+            return self._buckets[host]
+
+    def adquirir(self, url: str):
+        self.bucket(url).adquirir()
+
+    async def adquirir_async(self, url: str):
+        await self.bucket(url).adquirir_async()
+
+    def registrar_resposta(self, url: str, status: Optional[int], latencia: Optional[float] = None,
+                           retry_after: Optional[str] = None):
+        self.bucket(url).registrar_resposta(status, latencia, retry_after)
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+        return _rate_limiter
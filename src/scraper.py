@@ -1,234 +1,322 @@
-import requests
-from bs4 import BeautifulSoup
-from .utils import text_to_price
-from .models import Produto
+from .utils import extrair_categoria_da_url
 from .database_postgres import get_database
+from .extractor import extract_ml_id, detect_selector, obter_metricas_extracao
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
-import re
+from collections import deque
+from contextlib import closing
+import asyncio
+import hashlib
+import queue
+import threading
 import time
-from .config import DELAY_BETWEEN_REQUESTS
+from .http_client import get_http_client
+from .fetcher import FetchEngine, get_fetch_engine
+from .archive import get_html_archive, ler_arquivo
+from .parse_pool import get_parse_pool, submeter_extracao, extrair_produtos
+from .write_behind import WriteBehind
+from .identity_map import IdentityMap
+from .config import PIPELINE_QUEUE_SIZE, WRITE_BEHIND_QUEUE_SIZE, IDENTITY_MAP_ENABLED, FETCH_ENGINE
 
-HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
+FIM_PAGINAS = object()
 
-def fetch_html(url: str):
-    resp = requests.get(url, headers=HEADERS, timeout=10)
-    print(f"[HTTP] {resp.status_code} - {url}")
-    return resp.text
+def arquivar_pagina(pagina_http, categoria: str = None, pagina: int = None):
+    archive = get_html_archive()
+    if archive:
+        archive.gravar(pagina_http.url, pagina_http.status, pagina_http.headers, pagina_http.conteudo,
+                       pagina_http.encoding, categoria, pagina)
 
 
-def detect_selector(html: str):
-    if "ui-search-layout__item" in html:
-        return "li.ui-search-layout__item, div.ui-search-result__wrapper"
-    if "poly-card--grid" in html:
-        return "div.poly-card.poly-card--grid.poly-card--large"
-    return None
+def buscar_pagina(url: str):
+    if FETCH_ENGINE == "async":
+        return get_fetch_engine().buscar_bloqueante(url)
+    return get_http_client().buscar(url)
 
 
-def extract_ml_id(link: str):
-    pattern = r'\b(MLB[A-Z]*-?\d{5,})\b'
-    match = re.search(pattern, link, re.IGNORECASE)
+def fetch_pagina(url: str, categoria: str = None, pagina: int = None, buscar=None):
+    # buscar: função url -> PaginaHttp; por padrão o motor escolhido em FETCH_ENGINE
+    pagina_http = (buscar or buscar_pagina)(url)
+    print(f"[HTTP] {pagina_http.status}{' (cache)' if pagina_http.do_cache else ''} - {url}")
+    # Resposta do cache (304) já foi arquivada quando foi baixada; gravar de novo duplicaria o corpo com
+    # uma data de captura que não é a dele
+    if not pagina_http.do_cache:
+        arquivar_pagina(pagina_http, categoria, pagina)
+    return pagina_http
 
-    if match:
-        return match.group(1).replace("-", "")
 
-    parsed = urlparse(link)
-    params = parse_qs(parsed.query)
+def fetch_html(url: str, categoria: str = None, pagina: int = None):
+    return fetch_pagina(url, categoria, pagina).texto
 
-    for values in params.values():
-        for value in values:
-            m2 = re.search(pattern, value, re.IGNORECASE)
-            if m2:
-                return m2.group(1).replace("-", "")
 
-    return None
+def add_pagination_to_url(url: str, page: int) -> str:
+    parsed = urlparse(url)
+    params = parse_qs(parsed.query, keep_blank_values=True)
+    
+    params = {k: v[0] if v else '' for k, v in params.items()}
+    
+    params['_Paging'] = str(page)
+    
+    new_query = urlencode(params)
+    new_url = urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, new_query, parsed.fragment))
+    
+    return new_url
 
 
-def extract_products(html: str, limit: int = 10):
-    soup = BeautifulSoup(html, "lxml")
+def fingerprint_produtos(produtos: list) -> str:
+    chaves = sorted(
+        (p.get("produto_id_ml") or p["link"], p["nome"], p["preco"],
+         p.get("preco_original"), p.get("percentual_desconto"), p.get("imagem_url"))
+        for p in produtos
+    )
+    return hashlib.sha256(repr(chaves).encode()).hexdigest()
 
-    items = soup.select("li.ui-search-layout__item, div.ui-search-result, div.poly-card")
 
-    produtos = []
-    for item in items:
-        if len(produtos) >= limit:
-            break
+def planejar_pagina(db, categoria: str, conteudo, limite: int = None, pagina: int = None,
+                    encoding: str = None, produtos_pagina: list = None, fingerprints: dict = None,
+                    identidades: IdentityMap = None):
+    # Decide o que gravar para a página sem escrever no banco; o resultado vai para db.gravar_paginas
+    # (direto ou via WriteBehind). None quando a página não tem produtos. Com `identidades`, os produtos
+    # iguais ao banco saem do upsert e só têm os ids "tocados".
+    if isinstance(conteudo, str):
+        conteudo, encoding = conteudo.encode("utf-8", "surrogatepass"), "utf-8"
+    hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+    if fingerprints is not None:
+        anterior = fingerprints.get(pagina)
+    else:
+        anterior = db.obter_fingerprint_pagina(categoria, pagina) if pagina else None
+    
+    if anterior and anterior["hash_conteudo"] == hash_conteudo and (limite is None or limite >= anterior["total_produtos"]):
+        print(f"♻️  Página {pagina} idêntica à coleta anterior, parsing e escrita ignorados.")
+        return {"tipo": "tocar", "categoria": categoria, "pagina": pagina, "hash_conteudo": hash_conteudo,
+                "total": anterior["total_produtos"]}
+    
+    if produtos_pagina is None:
+        produtos_pagina = extrair_produtos(conteudo, encoding, limit=50, categoria=categoria)
+    
+    if not produtos_pagina:
+        return None
+    
+    if limite is not None:
+        produtos_pagina = produtos_pagina[:limite]
+    
+    hash_produtos = fingerprint_produtos(produtos_pagina)
+    if anterior and anterior["hash_produtos"] == hash_produtos:
+        print(f"♻️  Produtos e preços da página {pagina} inalterados, escrita ignorada.")
+        return {"tipo": "tocar", "categoria": categoria, "pagina": pagina, "hash_conteudo": hash_conteudo,
+                "total": len(produtos_pagina)}
+    
+    plano = {"tipo": "upsert", "categoria": categoria, "pagina": pagina, "hash_conteudo": hash_conteudo,
+             "hash_produtos": hash_produtos, "produtos": produtos_pagina, "total": len(produtos_pagina)}
+    if identidades is not None:
+        plano["produtos"], plano["inalterados"] = identidades.classificar(produtos_pagina)
+        if plano["inalterados"]:
+            onde = f" da página {pagina}" if pagina else ""
+            print(f"♻️  {len(plano['inalterados'])} produtos{onde} iguais ao banco, upsert ignorado.")
+    return plano
 
-        title_tag = item.select_one("a.ui-search-link, a.poly-component__title, h3 a, h2 a, a.ui-search-link")
-        nome = title_tag.get_text(strip=True) if title_tag else None
-        link = title_tag.get("href") if title_tag else None
-
-        imagem_tag = item.select_one("img.ui-search-result-image__element, img")
-        imagem_url = None
-        if imagem_tag:
-            imagem_url = imagem_tag.get("data-src") or imagem_tag.get("src")
-
-        preco = None
-        preco_original = None
-        percentual_desconto = None
-
-        andes_fractions = item.select(".andes-money-amount__fraction")
-        if andes_fractions:
-            try:
-                if len(andes_fractions) >= 2:
-                    preco_original = text_to_price(andes_fractions[0].get_text(strip=True))
-                    preco = text_to_price(andes_fractions[1].get_text(strip=True))
-                else:
-                    preco = text_to_price(andes_fractions[0].get_text(strip=True))
-            except Exception as e:
-                print(f"debug: erro ao parsear andes_fractions: {e}")
-
-        if preco is None:
-            agora_tag = item.select_one('[aria-label^="Agora:"], span[aria-label^="Agora:"], .andes-money-amount[aria-label^="Agora:"]')
-            if agora_tag:
-                aria = agora_tag.get("aria-label") or agora_tag.get_text()
-                aria_clean = re.sub(r'(?i)\bAgora:?\b', '', aria).replace('reais', '').strip()
-                try:
-                    preco = text_to_price(aria_clean)
-                except Exception as e:
-                    print(f"debug: falha ao parsear aria 'Agora': {e}")
 
-        if preco is None:
-            inteiro_tag = item.select_one(".andes-money-amount__unit, .andes-money-amount__main-value")
-            cents_tag = item.select_one(".andes-money-amount--cents-superscript, .andes-money-amount__fraction--cents")
-            if inteiro_tag and cents_tag:
-                combined = f"{inteiro_tag.get_text(strip=True)},{cents_tag.get_text(strip=True)}"
-                try:
-                    preco = text_to_price(combined)
-                except Exception as e:
-                    print(f"debug: falha ao parsear inteiro+cents: {e}")
+def _colocar(fila: queue.Queue, item, parar: threading.Event) -> bool:
+    # put() que desiste quando o consumidor já parou, para a thread não ficar presa numa fila cheia
+    while not parar.is_set():
+        try:
+            fila.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _retirar(fila: queue.Queue, parar: threading.Event):
+    while not parar.is_set():
+        try:
+            return fila.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return FIM_PAGINAS
+
+
+def _aguardar_liberacao(liberada: threading.Semaphore, parar: threading.Event, parar_fetch: threading.Event) -> bool:
+    while not (parar.is_set() or parar_fetch.is_set()):
+        if liberada.acquire(timeout=0.1):
+            return True
+    return False
+
+
+def _etapa_fetch(base_url: str, categoria: str, max_pages: int, saida: queue.Queue,
+                 parar: threading.Event, parar_fetch: threading.Event, liberada: threading.Semaphore,
+                 prazo: float = None, buscar=None):
+    for page in range(1, max_pages + 1):
+        # A página N+1 só é pedida depois que a N foi parseada e não encerrou a paginação (vazia ou
+        # limite de produtos): nenhuma requisição além da última página útil
+        if page > 1 and not _aguardar_liberacao(liberada, parar, parar_fetch):
+            return
+        if parar.is_set() or parar_fetch.is_set():
+            return
+        if prazo is not None and time.monotonic() >= prazo:
+            print(f"⏱️  Prazo do ciclo atingido em {categoria}. Encerrando antes da página {page}.")
+            break
+        try:
+            item = (page, fetch_pagina(add_pagination_to_url(base_url, page), categoria, page, buscar), None)
+        except Exception as e:
+            item = (page, None, e)
+        if not _colocar(saida, item, parar) or item[2] is not None:
+            return
+    _colocar(saida, FIM_PAGINAS, parar)
 
-        if preco is None:
-            price_tag_frac = item.select_one(".price-tag-fraction")
-            if price_tag_frac:
-                try:
-                    preco = text_to_price(price_tag_frac.get_text(strip=True))
-                except Exception as e:
-                    print(f"debug: falha ao parsear price-tag-fraction: {e}")
 
-        if preco_original is None:
-            orig_tag = item.select_one(".price-tag-strike .price-tag-fraction, .price-tag__subprice .price-tag-fraction, .andes-money-amount__fraction.price-original, .andes-money-amount--original .andes-money-amount__fraction")
-            if orig_tag:
+def _etapa_parse(categoria: str, fingerprints: dict, entrada: queue.Queue, saida: queue.Queue,
+                 parar: threading.Event, parar_fetch: threading.Event, liberada: threading.Semaphore,
+                 max_products: int = None):
+    # Soma os produtos como a persistência soma (página "tocada" conta o total da coleta anterior)
+    total = 0
+    while True:
+        item = _retirar(entrada, parar)
+        if item is FIM_PAGINAS:
+            _colocar(saida, FIM_PAGINAS, parar)
+            return
+        
+        page, pagina_http, erro = item
+        produtos = None
+        anterior = None
+        if erro is None:
+            anterior = fingerprints.get(page)
+            # Corpo idêntico ao da coleta anterior: a persistência só "toca" a página, sem parsing
+            if not (anterior and anterior["hash_conteudo"] == hashlib.sha256(pagina_http.conteudo).hexdigest()):
                 try:
-                    preco_original = text_to_price(orig_tag.get_text(strip=True))
+                    produtos = extrair_produtos(pagina_http.conteudo, pagina_http.encoding,
+                                                limit=50, categoria=categoria)
                 except Exception as e:
-                    print(f"debug: falha ao parsear preco_original: {e}")
-
-        if preco_original is None and andes_fractions and len(andes_fractions) >= 2:
-            try:
-                preco_original = text_to_price(andes_fractions[0].get_text(strip=True))
-                if preco is None:
-                    preco = text_to_price(andes_fractions[1].get_text(strip=True))
-            except Exception as e:
-                print(f"debug: erro ao recuperar preco_original de andes_fractions: {e}")
-
-        if preco_original and preco and preco_original > preco:
-            try:
-                percentual_desconto = round(((preco_original - preco) / preco_original) * 100, 1)
-            except Exception as e:
-                print(f"debug: erro ao calcular desconto: {e}")
-                percentual_desconto = None
-
-        produto_id_ml = item.get("data-id") or (extract_ml_id(link) if link else None)
-
-        if nome and preco and link:
-            produtos.append({
-                "nome": nome,
-                "preco": preco,
-                "preco_original": preco_original,
-                "percentual_desconto": percentual_desconto,
-                "imagem_url": imagem_url,
-                "link": link,
-                "produto_id_ml": produto_id_ml
-            })
-        else:
-            print(f"debug: item descartado (nome={bool(nome)}, preco={bool(preco)}, link={bool(link)})")
+                    erro = e
+        
+        if not _colocar(saida, (page, pagina_http, produtos, erro), parar):
+            return
+        if produtos is not None:
+            total += len(produtos)
+        elif anterior:
+            total += anterior["total_produtos"]
+        if erro is not None or produtos == [] or (max_products and total >= max_products):
+            # Página vazia ou com erro encerra a paginação, como no fluxo sequencial; o limite de
+            # produtos também, sem baixar a próxima página
+            parar_fetch.set()
+            _colocar(saida, FIM_PAGINAS, parar)
+            return
+        liberada.release()
 
-    return produtos
 
-def add_pagination_to_url(url: str, page: int) -> str:
-    parsed = urlparse(url)
-    params = parse_qs(parsed.query, keep_blank_values=True)
-    
-    params = {k: v[0] if v else '' for k, v in params.items()}
+def paginas_em_pipeline(base_url: str, categoria: str, max_pages: int, fingerprints: dict,
+                        prazo: float = None, max_products: int = None, buscar=None):
+    # fetch (thread) → parse (thread/processos) → quem consome o gerador persiste, com filas limitadas
+    # entre as etapas. As páginas saem em ordem; a página N+1 baixa enquanto a N é gravada.
+    paginas = queue.Queue(PIPELINE_QUEUE_SIZE)
+    extraidas = queue.Queue(PIPELINE_QUEUE_SIZE)
+    parar = threading.Event()
+    parar_fetch = threading.Event()
+    liberada = threading.Semaphore(0)
+    etapas = [
+        threading.Thread(target=_etapa_fetch, name=f"fetch-{categoria}", daemon=True,
+                         args=(base_url, categoria, max_pages, paginas, parar, parar_fetch, liberada, prazo,
+                               buscar)),
+        threading.Thread(target=_etapa_parse, name=f"parse-{categoria}", daemon=True,
+                         args=(categoria, fingerprints, paginas, extraidas, parar, parar_fetch, liberada,
+                               max_products)),
+    ]
+    for etapa in etapas:
+        etapa.start()
     
-    params['_Paging'] = str(page)
-    
-    new_query = urlencode(params)
-    new_url = urlunparse((parsed.scheme, parsed.netloc, parsed.path, parsed.params, new_query, parsed.fragment))
-    
-    return new_url
+    try:
+        while True:
+            item = extraidas.get()
+            if item is FIM_PAGINAS:
+                return
+            yield item
+    finally:
+        # As etapas veem o sinal e saem após a operação em andamento; não esperamos um fetch já disparado
+        parar.set()
 
 
-def scrape_all_pages(base_url: str, categoria: str, max_products: int = None, max_pages: int = 10):
+def scrape_all_pages(base_url: str, categoria: str, max_products: int = None, max_pages: int = 10,
+                     prazo: float = None, buscar=None):
+    # prazo (time.monotonic): a partir dele nenhuma página nova é buscada e a coleta termina com as já obtidas
+    # buscar: função url -> PaginaHttp usada pela etapa de fetch (padrão: motor de FETCH_ENGINE)
     db = get_database()
     
     coleta_id = db.iniciar_coleta(categoria)
     total_novos = 0
     total_atualizados = 0
     total_produtos = 0
+    produto_ids = set()
+    identidades = None
+    escrita = None
+    
+    def concluir_escrita():
+        nonlocal escrita, total_produtos, total_novos, total_atualizados
+        if escrita:
+            # Solta a referência antes: se a thread de escrita morreu, fechar() levanta o erro dela uma vez só
+            atual, escrita = escrita, None
+            resumo = atual.fechar()
+            # Páginas cuja gravação falhou saem do total
+            total_produtos = resumo["total"]
+            total_novos += resumo["novos"]
+            total_atualizados += resumo["atualizados"]
+            produto_ids.update(resumo["ids"])
     
     try:
-        for page in range(1, max_pages + 1):
-            url_paginada = add_pagination_to_url(base_url, page)
-            print(f"\n📄 Página {page}...")
-            
-            try:
-                html = fetch_html(url_paginada)
-                produtos_pagina = extract_products(html, limit=50)
-                
-                if not produtos_pagina:
-                    print(f"⚠️  Nenhum produto encontrado na página {page}. Encerrando paginação.")
-                    break
+        fingerprints = db.obter_fingerprints_categoria(categoria)
+        if IDENTITY_MAP_ENABLED:
+            identidades = IdentityMap.carregar(db, categoria)
+            print(f"🗂️  {len(identidades)} produtos de {categoria} carregados para comparação em memória")
+        # Com write-behind, novos/atualizados/ids chegam da thread de escrita e só são somados no fim
+        if WRITE_BEHIND_QUEUE_SIZE > 0:
+            escrita = WriteBehind(db, ao_gravar=identidades.registrar if identidades is not None else None,
+                                  ao_falhar=identidades.descartar if identidades is not None else None)
+        
+        with closing(paginas_em_pipeline(base_url, categoria, max_pages, fingerprints, prazo,
+                                         max_products, buscar)) as paginas:
+            for page, pagina_http, produtos_pagina, erro in paginas:
+                print(f"\n📄 Página {page}...")
                 
-                for prod_data in produtos_pagina:
-                    total_produtos += 1
+                try:
+                    if erro is not None:
+                        raise erro
+                    if escrita and escrita.erro is not None:
+                        raise escrita.erro
+                    restante = max_products - total_produtos if max_products else None
+                    plano = planejar_pagina(db, categoria, pagina_http.conteudo, restante, page,
+                                            pagina_http.encoding, produtos_pagina, fingerprints, identidades)
                     
-                    if prod_data["produto_id_ml"]:
-                        existente = db.obter_produto_por_id_ml(prod_data["produto_id_ml"])
-                    else:
-                        existente = db.obter_produto_por_link(prod_data["link"])
+                    if not plano:
+                        print(f"⚠️  Nenhum produto encontrado na página {page}. Encerrando paginação.")
+                        break
                     
-                    if existente:
-                        db.atualizar_produto(
-                            existente["id"], 
-                            prod_data["preco"],
-                            preco_original=prod_data.get("preco_original"),
-                            percentual_desconto=prod_data.get("percentual_desconto"),
-                            imagem_url=prod_data.get("imagem_url")
-                        )
-                        total_atualizados += 1
+                    if escrita:
+                        escrita.enfileirar(plano)
+                        total_produtos += plano["total"]
+                        print(f"✅ {plano['total']} produtos processados (gravação em segundo plano)")
                     else:
-                        produto = Produto(
-                            nome=prod_data["nome"],
-                            preco=prod_data["preco"],
-                            preco_original=prod_data.get("preco_original"),
-                            percentual_desconto=prod_data.get("percentual_desconto"),
-                            imagem_url=prod_data.get("imagem_url"),
-                            link=prod_data["link"],
-                            categoria=categoria,
-                            produto_id_ml=prod_data.get("produto_id_ml")
-                        )
-                        db.adicionar_produto(produto)
-                        total_novos += 1
+                        try:
+                            contagem = db.gravar_paginas([plano])[0]
+                        except Exception:
+                            if identidades is not None:
+                                identidades.descartar([plano])
+                            raise
+                        if identidades is not None:
+                            identidades.registrar([contagem])
+                        total_produtos += contagem["total"]
+                        total_novos += contagem["novos"]
+                        total_atualizados += contagem["atualizados"]
+                        produto_ids.update(contagem.get("ids", ()))
+                        print(f"✅ {contagem['total']} produtos processados (novo: {total_novos}, atualizado: {total_atualizados})")
                     
                     if max_products and total_produtos >= max_products:
                         print(f"📊 Limite de {max_products} produtos atingido.")
                         break
-                
-                print(f"✅ {len(produtos_pagina)} produtos processados (novo: {total_novos}, atualizado: {total_atualizados})")
-                
-                if page < max_pages:
-                    print(f"⏳ Aguardando {DELAY_BETWEEN_REQUESTS} segundos antes da próxima página...")
-                    time.sleep(DELAY_BETWEEN_REQUESTS)
-                
-                if max_products and total_produtos >= max_products:
+                        
+                except Exception as e:
+                    print(f"❌ Erro ao fazer scraping da página {page}: {e}")
                     break
-                    
-            except Exception as e:
-                print(f"❌ Erro ao fazer scraping da página {page}: {e}")
-                break
         
-        db.finalizar_coleta(coleta_id, total_produtos, total_novos, total_atualizados, True)
+        concluir_escrita()
+        historicos = db.finalizar_coleta(coleta_id, total_produtos, total_novos, total_atualizados, True,
+                                         produto_ids=produto_ids)
         
         return {
             "coleta_id": coleta_id,
@@ -236,11 +324,18 @@ def scrape_all_pages(base_url: str, categoria: str, max_products: int = None, ma
             "total_produtos": total_produtos,
             "total_novos": total_novos,
             "total_atualizados": total_atualizados,
+            "historicos_salvos": historicos,
+            "extracao": obter_metricas_extracao(categoria),
             "status": "sucesso"
         }
         
     except Exception as e:
-        db.finalizar_coleta(coleta_id, total_produtos, total_novos, total_atualizados, False, str(e))
+        try:
+            concluir_escrita()
+        except Exception as erro_escrita:
+            print(f"❌ Escrita em segundo plano interrompida: {erro_escrita}")
+        db.finalizar_coleta(coleta_id, total_produtos, total_novos, total_atualizados, False, str(e),
+                            produto_ids=produto_ids)
         print(f"❌ Erro geral na coleta: {e}")
         return {
             "coleta_id": coleta_id,
@@ -248,3 +343,108 @@ def scrape_all_pages(base_url: str, categoria: str, max_products: int = None, ma
             "status": "erro",
             "erro": str(e)
         }
+
+
+async def scrape_all_pages_async(base_url: str, categoria: str, max_products: int = None,
+                                 max_pages: int = 10, prazo: float = None, engine: FetchEngine = None):
+    if engine is None:
+        async with FetchEngine() as engine:
+            return await scrape_all_pages_async(base_url, categoria, max_products, max_pages, prazo, engine)
+    
+    # Mesmo pipeline de scrape_all_pages (write-behind, prazo, limite de produtos) numa thread do executor;
+    # as buscas voltam para o loop do motor, que controla a concorrência global e por host
+    await engine.iniciar()
+    return await asyncio.to_thread(scrape_all_pages, base_url, categoria, max_products, max_pages, prazo,
+                                   engine.buscar_bloqueante)
+
+
+async def scrape_categorias_async(categorias: dict, prazo: float = None, engine: FetchEngine = None):
+    if engine is None:
+        async with FetchEngine() as engine:
+            return await scrape_categorias_async(categorias, prazo, engine)
+    
+    nomes = list(categorias)
+    resultados = await asyncio.gather(*(
+        scrape_all_pages_async(
+            categorias[nome]["url"],
+            nome,
+            max_products=categorias[nome].get("max_produtos_por_pagina"),
+            max_pages=categorias[nome].get("max_paginas", 10),
+            prazo=prazo,
+            engine=engine,
+        )
+        for nome in nomes
+    ), return_exceptions=True)
+    
+    return {
+        nome: resultado if isinstance(resultado, dict) else {"status": "erro", "erro": str(resultado)}
+        for nome, resultado in zip(nomes, resultados)
+    }
+
+
+def replay_archive(origem: str, categoria: str = None, persistir: bool = True):
+    # Com persistência, as observações vão para db.importar_produtos com a data de captura de cada registro
+    # (WARC-Date), não com a hora do replay: uma captura antiga não sobrescreve estado nem histórico mais
+    # novos, e o replay não abre coleta nem marca produtos como vistos agora.
+    pool = get_parse_pool()
+    # Páginas já enviadas ao parsing e ainda não consumidas; fica abaixo do limite da fila do pool
+    janela = pool.max_pendentes - 1 if pool else 1
+    pendentes = deque()
+    resultados = {}
+    paginas = 0
+    erro = None
+    inicio = time.monotonic()
+    
+    def consumir():
+        cat, registro, futuro = pendentes.popleft()
+        produtos = futuro.result()
+        resultados[cat]["total_produtos"] += len(produtos)
+        for produto in produtos:
+            yield dict(produto, categoria=cat, visto_em=registro["data"])
+    
+    def observacoes():
+        nonlocal paginas, erro
+        try:
+            for registro in ler_arquivo(origem):
+                if registro["status"] != 200:
+                    continue
+                
+                cat = categoria or registro["categoria"] or extrair_categoria_da_url(registro["url"])
+                resumo = resultados.setdefault(cat, {"categoria": cat, "paginas": 0, "total_produtos": 0})
+                
+                while len(pendentes) >= janela:
+                    yield from consumir()
+                pendentes.append((cat, registro, submeter_extracao(registro["conteudo"], registro["encoding"],
+                                                                   limit=50, categoria=cat)))
+                resumo["paginas"] += 1
+                paginas += 1
+            
+            while pendentes:
+                yield from consumir()
+        except Exception as e:
+            # Para na primeira falha de leitura ou extração; o que já foi lido ainda é importado
+            print(f"❌ Erro no replay do arquivo: {e}")
+            erro = str(e)
+            pendentes.clear()
+    
+    importacao = None
+    try:
+        if persistir:
+            importacao = get_database().importar_produtos(observacoes())
+        else:
+            for _ in observacoes():
+                pass
+    except Exception as e:
+        print(f"❌ Erro ao importar as páginas do arquivo: {e}")
+        erro = erro or str(e)
+    
+    duracao = time.monotonic() - inicio
+    return {
+        "status": "erro" if erro else "sucesso",
+        "erro": erro,
+        "paginas": paginas,
+        "duracao": duracao,
+        "paginas_por_segundo": paginas / duracao if duracao > 0 else 0.0,
+        "resultados": resultados,
+        "importacao": importacao,
+    }
@@ -5,14 +5,16 @@ PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 from prefect import flow, task, get_run_logger
-from src.config import CATEGORIAS, SCHEDULE_CRON, SCHEDULE_TIMEZONE, DELAY_BETWEEN_CATEGORIES
-from src.scraper import scrape_all_pages
-from src.database_postgres import get_database
+from prefect.futures import as_completed
+from prefect.task_runners import ThreadPoolTaskRunner
+from src.config import CATEGORIAS, SCHEDULE_CRON, SCHEDULE_TIMEZONE, CATEGORIAS_CONCORRENTES, COLETA_PRAZO, FETCH_ENGINE
+from src.scraper import scrape_all_pages, replay_archive
+from src.database_postgres import preparar_banco
 from datetime import datetime
 import time
 
 @task(name="Scrape Categoria", retries=3, retry_delay_seconds=60)
-def scrape_categoria(categoria: str, config: dict) -> dict:
+def scrape_categoria(categoria: str, config: dict, prazo: float = None) -> dict:
     logger = get_run_logger()
     logger.info(f"🔍 Iniciando scraping da categoria: {categoria}")
     
@@ -25,65 +27,18 @@ def scrape_categoria(categoria: str, config: dict) -> dict:
             base_url=base_url,
             categoria=categoria,
             max_products=max_produtos,
-            max_pages=max_paginas
+            max_pages=max_paginas,
+            prazo=prazo
         )
         
-        db = get_database()
-        historicos_salvos = 0
-        
-        try:
-            produtos_categoria = db.obter_produtos_por_categoria(categoria)
-            
-            for produto in produtos_categoria:
-                produto_id = produto.get("id")
-                preco_atual = produto.get("preco_atual")
-                
-                if produto_id and preco_atual:
-                    query = """
-                    SELECT preco, data FROM precos_historico 
-                    WHERE produto_id = %s 
-                    ORDER BY data DESC 
-                    LIMIT 1
-                    """
-                    historico_anterior = db.executar(query, (produto_id,), fetch=True)
-                    
-                    if historico_anterior:
-                        preco_anterior = historico_anterior[0][0]
-                        data_anterior = historico_anterior[0][1]
-                        
-                        if float(preco_anterior) != float(preco_atual):
-                            db.executar(
-                                """
-                                INSERT INTO precos_historico (produto_id, preco, data)
-                                VALUES (%s, %s, NOW())
-                                """,
-                                (produto_id, preco_atual)
-                            )
-                            historicos_salvos += 1
-                            diferenca = float(preco_atual) - float(preco_anterior)
-                            percentual = (diferenca / float(preco_anterior) * 100) if preco_anterior > 0 else 0
-                            logger.info(f"💾 Histórico salvo: {produto['nome']} - R${preco_anterior:.2f} → R${preco_atual:.2f} ({percentual:+.1f}%)")
-                        else:
-                            logger.debug(f"ℹ️ Produto sem variação: {produto['nome']} - R${preco_atual:.2f}")
-                    else:
-                        db.executar(
-                            """
-                            INSERT INTO precos_historico (produto_id, preco, data)
-                            VALUES (%s, %s, NOW())
-                            """,
-                            (produto_id, preco_atual)
-                        )
-                        historicos_salvos += 1
-                        logger.info(f"📝 Primeiro histórico: {produto['nome']} - R${preco_atual:.2f}")
-        
-        except Exception as e:
-            logger.warning(f"⚠️ Erro ao salvar histórico: {str(e)}")
-        
         logger.info(f"✅ Scraping concluído para {categoria}")
         logger.info(f"   - Total processados: {resultado.get('total_produtos', 0)}")
         logger.info(f"   - Novos: {resultado.get('total_novos', 0)}")
         logger.info(f"   - Atualizados: {resultado.get('total_atualizados', 0)}")
-        logger.info(f"   - Históricos salvos: {historicos_salvos}")
+        logger.info(f"   - Históricos salvos: {resultado.get('historicos_salvos', 0)}")
+        for metrica in resultado.get("extracao", []):
+            logger.info(f"   - Extração ({metrica['layout']}): {metrica['taxa_acerto_primeira']:.0%} de acerto na 1ª estratégia, "
+                        f"ordem {metrica['ordem']}, falhas {metrica['falhas']}")
         
         return resultado
         
@@ -94,7 +49,9 @@ def scrape_categoria(categoria: str, config: dict) -> dict:
 
 @flow(
     name="ML Crawler - Coleta Automática",
-    description="Coleta de dados de todas as categorias configuradas"
+    description="Coleta de dados de todas as categorias configuradas",
+    # Threads no mesmo processo: as categorias dividem o rate limiter, o cliente HTTP e o pool do banco
+    task_runner=ThreadPoolTaskRunner(max_workers=CATEGORIAS_CONCORRENTES)
 )
 def coletar_todas_categorias():
     logger = get_run_logger()
@@ -103,26 +60,34 @@ def coletar_todas_categorias():
     logger.info(f"🚀 Iniciando coleta automática em {datetime.now()}")
     logger.info("=" * 60)
     
+    preparar_banco()
+    
     resultados = {}
     total_geral = 0
     novos_geral = 0
     atualizados_geral = 0
     
-    categorias_list = list(CATEGORIAS.items())
-    total_categorias = len(categorias_list)
+    # Todas as categorias entram de uma vez; o task runner roda CATEGORIAS_CONCORRENTES por vez e o
+    # prazo faz quem ainda estiver paginando encerrar antes do próximo agendamento
+    prazo = time.monotonic() + COLETA_PRAZO
+    futuros = {
+        scrape_categoria.submit(categoria, config, prazo): categoria
+        for categoria, config in CATEGORIAS.items()
+    }
+    logger.info(f"⚙️  {len(futuros)} categorias, {CATEGORIAS_CONCORRENTES} em paralelo, prazo de {COLETA_PRAZO:.0f}s, "
+                f"motor de fetch {FETCH_ENGINE}")
     
-    for idx, (categoria, config) in enumerate(categorias_list, 1):
+    for futuro in as_completed(list(futuros)):
+        categoria = futuros[futuro]
         try:
-            resultado = scrape_categoria(categoria, config)
+            resultado = futuro.result()
             resultados[categoria] = resultado
             
             total_geral += resultado.get("total_produtos", 0)
             novos_geral += resultado.get("total_novos", 0)
             atualizados_geral += resultado.get("total_atualizados", 0)
-            
-            if idx < total_categorias:  
-                logger.info(f"⏳ Aguardando {DELAY_BETWEEN_CATEGORIES} segundos antes da próxima categoria...")
-                time.sleep(DELAY_BETWEEN_CATEGORIES)
+            logger.info(f"📦 {categoria} concluída ({len(resultados)}/{len(futuros)}): "
+                        f"{resultado.get('total_produtos', 0)} produtos")
             
         except Exception as e:
             logger.error(f"❌ Falha na coleta de {categoria}: {str(e)}")
@@ -147,5 +112,33 @@ def coletar_todas_categorias():
     }
 
 
+@flow(
+    name="ML Crawler - Replay do Arquivo HTML",
+    description="Reprocessa páginas arquivadas (extração + persistência) sem refazer o download"
+)
+def reprocessar_arquivo(origem: str, categoria: str = None, persistir: bool = True):
+    logger = get_run_logger()
+    logger.info(f"⏪ Reprocessando arquivo {origem}")
+    
+    if persistir:
+        preparar_banco()
+    
+    resultado = replay_archive(origem, categoria, persistir)
+    
+    for resumo in resultado["resultados"].values():
+        logger.info(f"   - {resumo['categoria']}: {resumo['paginas']} páginas, {resumo['total_produtos']} produtos")
+    importacao = resultado["importacao"]
+    if importacao:
+        logger.info(f"   - Produtos novos: {importacao['novos']}, atualizados: {importacao['atualizados']}, "
+                    f"intervalos de histórico: {importacao['historicos']} novos, {importacao['estendidos']} estendidos")
+    logger.info(f"📊 {resultado['paginas']} páginas em {resultado['duracao']:.2f}s "
+                f"({resultado['paginas_por_segundo']:.1f} páginas/s)")
+    
+    if resultado["status"] != "sucesso":
+        raise RuntimeError(resultado["erro"])
+    
+    return resultado
+
+
 if __name__ == "__main__":
     coletar_todas_categorias()
@@ -1,6 +1,13 @@
+import codecs
 import json
 import re
+from datetime import datetime, timedelta
 from typing import Optional, List, Dict
+from urllib.parse import urlparse
+
+import charset_normalizer
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
 
 
 def text_to_price(s: Optional[str]) -> Optional[float]:
@@ -60,3 +67,53 @@ def text_to_price(s: Optional[str]) -> Optional[float]:
         return float(s)
     except ValueError:
         return None
+
+
+def extrair_categoria_da_url(url: str) -> str:
+    path = urlparse(url).path
+    categoria = path.strip("/").split("/")[0] if path else "geral"
+    return categoria.lower()
+
+
+def expandir_intervalos(intervalos: List[Dict], passo: Optional[timedelta] = None,
+                        ate: Optional[datetime] = None) -> List[Dict]:
+    # Sem passo: dois pontos por intervalo (início e fim), para gráficos em degrau.
+    # Com passo: uma amostra a cada passo dentro de cada intervalo, para séries regulares.
+    # `ate` limita o último intervalo (ex.: agora), útil para desenhar o preço vigente até o fim do eixo.
+    pontos = []
+    for i, intervalo in enumerate(intervalos):
+        inicio, fim = intervalo["valido_de"], intervalo["valido_ate"]
+        if ate and i == len(intervalos) - 1:
+            fim = max(fim, ate)
+        
+        if passo is None:
+            momentos = [inicio, fim] if fim > inicio else [inicio]
+        else:
+            momentos = []
+            momento = inicio
+            while momento <= fim:
+                momentos.append(momento)
+                momento += passo
+        
+        pontos.extend({"data": m, "preco": intervalo["preco"]} for m in momentos)
+    return pontos
+
+
+def encoding_do_corpo(conteudo: bytes) -> Optional[str]:
+    # Para corpos sem charset no Content-Type: o <meta charset> (ou http-equiv) do início da página, como
+    # nos navegadores. Sem ele, UTF-8 se o corpo decodifica como UTF-8; só então a detecção sobre o corpo
+    # inteiro (a mesma do apparent_encoding do requests)
+    match = META_CHARSET.search(conteudo[:4096])
+    if match:
+        nome = match.group(1).decode("ascii", errors="ignore").lower()
+        try:
+            codecs.lookup(nome)
+            return nome
+        except LookupError:
+            pass
+    
+    try:
+        conteudo.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return charset_normalizer.detect(conteudo)["encoding"]
@@ -0,0 +1,152 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .config import WRITE_BEHIND_QUEUE_SIZE, WRITE_BEHIND_BATCH_PAGES, WRITE_BEHIND_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+FIM_ESCRITA = object()
+
+
+class WriteBehind:
+    # Fila limitada de páginas a gravar, drenada por uma thread com uma conexão própria.
+    # O scraper só espera o banco quando a fila enche; a thread grava em lotes por tamanho ou por tempo.
+    # `ao_gravar` recebe as contagens de cada lote gravado e `ao_falhar` as páginas que não foram gravadas,
+    # na thread de escrita (ex.: IdentityMap.registrar / IdentityMap.descartar).
+    def __init__(self, db, max_pendentes: int = WRITE_BEHIND_QUEUE_SIZE,
+                 max_lote: int = WRITE_BEHIND_BATCH_PAGES, intervalo: float = WRITE_BEHIND_INTERVAL,
+                 ao_gravar: Optional[Callable[[List[Dict]], None]] = None,
+                 ao_falhar: Optional[Callable[[List[Dict]], None]] = None):
+        self.db = db
+        self.ao_gravar = ao_gravar
+        self.ao_falhar = ao_falhar
+        self.max_lote = max(max_lote, 1)
+        self.intervalo = intervalo
+        self._fila = queue.Queue(maxsize=max(max_pendentes, 1))
+        self._lock = threading.Lock()
+        self._conn = None
+        self._fechado = False
+        self.erro: Optional[Exception] = None
+        # Exceção que derrubou a thread de escrita (as falhas de página ficam só em `erro`)
+        self._erro_fatal: Optional[BaseException] = None
+        self.resumo = {"total": 0, "novos": 0, "atualizados": 0, "ids": set(),
+                       "paginas": 0, "lotes": 0, "falhas": 0}
+        self._thread = threading.Thread(target=self._executar, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def enfileirar(self, pagina: Dict):
+        if self._fechado:
+            raise RuntimeError("WriteBehind já foi fechado")
+        # Bloqueia com a fila cheia: o banco atrasado segura o crawler em vez de acumular páginas em memória
+        if not self._colocar(pagina):
+            self._levantar_erro_fatal()
+
+    def fechar(self) -> Dict:
+        # Grava o que ainda está na fila e devolve os contadores acumulados; pode ser chamado mais de uma vez.
+        # Se a thread de escrita morreu, levanta a exceção dela.
+        if not self._fechado:
+            self._fechado = True
+            if self._colocar(FIM_ESCRITA):
+                self._thread.join()
+        self._levantar_erro_fatal()
+        with self._lock:
+            return dict(self.resumo, ids=set(self.resumo["ids"]))
+
+    def _colocar(self, item) -> bool:
+        # put() que desiste quando a thread de escrita morreu, em vez de esperar para sempre na fila cheia
+        while self._thread.is_alive():
+            try:
+                self._fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _levantar_erro_fatal(self):
+        if self._erro_fatal is not None:
+            raise self._erro_fatal
+        if not self._fechado and not self._thread.is_alive():
+            raise RuntimeError("Thread de escrita encerrada")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _executar(self):
+        lote: List[Dict] = []
+        prazo = None
+        try:
+            while True:
+                espera = None if not lote else max(prazo - time.monotonic(), 0)
+                try:
+                    item = self._fila.get(timeout=espera)
+                except queue.Empty:
+                    self._gravar(lote)
+                    lote = []
+                    continue
+
+                if item is FIM_ESCRITA:
+                    self._gravar(lote)
+                    return
+
+                if not lote:
+                    prazo = time.monotonic() + self.intervalo
+                lote.append(item)
+                if len(lote) >= self.max_lote:
+                    self._gravar(lote)
+                    lote = []
+        except BaseException as e:
+            self._erro_fatal = e
+            logger.error(f"❌ Thread de escrita encerrada por erro: {e}")
+        finally:
+            if self._conn is not None:
+                self.db.release_connection(self._conn)
+                self._conn = None
+
+    def _conexao(self):
+        # Conexão derrubada pelo servidor volta ao pool descartada e é trocada por outra
+        if self._conn is not None and self._conn.closed:
+            self.db.release_connection(self._conn)
+            self._conn = None
+        if self._conn is None:
+            self._conn = self.db.get_connection()
+        return self._conn
+
+    def _gravar(self, lote: List[Dict]):
+        if not lote:
+            return
+        try:
+            contagens = self.db.gravar_paginas(lote, self._conexao())
+        except Exception as e:
+            # O lote volta atrás inteiro; regrava página a página para perder só a que falha
+            logger.warning(f"⚠️ Lote de {len(lote)} páginas falhou ({e}), gravando uma a uma")
+            contagens = []
+            for pagina in lote:
+                try:
+                    contagens.extend(self.db.gravar_paginas([pagina], self._conexao()))
+                except Exception as e:
+                    with self._lock:
+                        self.resumo["falhas"] += 1
+                        self.erro = self.erro or e
+                    print(f"❌ Falha ao gravar a página {pagina.get('pagina')} de {pagina['categoria']}: {e}")
+                    if self.ao_falhar:
+                        self.ao_falhar([pagina])
+
+        with self._lock:
+            self.resumo["lotes"] += 1
+            for contagem in contagens:
+                self.resumo["paginas"] += 1
+                self.resumo["total"] += contagem["total"]
+                self.resumo["novos"] += contagem["novos"]
+                self.resumo["atualizados"] += contagem["atualizados"]
+                self.resumo["ids"].update(contagem.get("ids", ()))
+        if contagens and self.ao_gravar:
+            self.ao_gravar(contagens)
+        if contagens:
+            print(f"💾 Lote gravado: {len(contagens)} página(s), "
+                  f"{sum(c['novos'] for c in contagens)} novos, {sum(c['atualizados'] for c in contagens)} atualizados")